@@ -20,6 +20,8 @@ from CRABClient import __version__ as client_version
 from CRABClient.ClientMapping import parametersMapping
 from CRABClient.ClientExceptions import ClientException, RESTInterfaceException, CommandFailedException
 from CRABClient.ClientUtilities import getAvailCommands, initLoggers, setConsoleLogLevelVar, StopExecution, flushMemoryLogger, LOGFORMATTER
+from CRABClient.RestInterfaces import clearRequestMemo
+from CRABClient.Timing import resetTimings, timedPhase, reportTimings
 
 if not os.environ.get('CMSSW_VERSION',None):
     print('\nError: $CMSSW_VERSION is not defined. Make sure you do cmsenv first. Exiting...')
@@ -132,6 +134,8 @@ class CRABClient(object):
             print("'" + str(args[0]) + "' is not a valid command.")
             self.parser.print_help()
             sys.exit(-1)
+        clearRequestMemo()
+        resetTimings()
         self.cmd = sub_cmd(self.logger, args[1:])  # the crab command to be executed
 
         # Every command returns a dictionary which MUST contain the "commandStatus" key.
@@ -139,7 +143,8 @@ class CRABClient(object):
         #   and will result in 'crab' terminating with non-zero exit code
         # Additional keys may be present in the dictionary, depending on the specific command,
         #   which are used to pass information to caller when CRABAPI is used
-        returnDict = self.cmd()
+        with timedPhase('%s: execution' % self.cmd.name):
+            returnDict = self.cmd()
         if returnDict['commandStatus'] != 'SUCCESS':
             raise CommandFailedException("Command %s failed" % str(args[0]))
 
@@ -193,6 +198,7 @@ if __name__ == "__main__":
     finally:
         # the command crab --version does not have a logger instance
         if getattr(client, 'tblogger', None) and getattr(client, 'memhandler', None) and getattr(client, 'logger', None):
+            reportTimings(client.logger)
             flushMemoryLogger(client.tblogger, client.memhandler, client.logger.logfile)
 
     if getattr(client, 'cmd', None):
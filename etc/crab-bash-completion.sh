@@ -287,7 +287,7 @@ _UseCrab ()
         "status")
             case "$cur" in
                 -*)
-                    COMPREPLY=( $(compgen -W '--help -h --long --json --summary --verboseErrors --sort --jobids --proxy --dir -d --task --instance' -- $cur) )
+                    COMPREPLY=( $(compgen -W '--help -h --long --json --summary --verboseErrors --sort --top --bottom --jobids --maxrows --pager --watch --refresh --offline --staleok --export --fields --exportfile --proxy --dir -d --task --instance' -- $cur) )
                     ;;
                 *)
                     COMPREPLY=( $(compgen -f $cur) )
@@ -297,7 +297,7 @@ _UseCrab ()
         "st")
             case "$cur" in
                 -*)
-                    COMPREPLY=( $(compgen -W '--help -h --long --json --summary --verboseErrors --sort --jobids --proxy --dir -d --task --instance' -- $cur) )
+                    COMPREPLY=( $(compgen -W '--help -h --long --json --summary --verboseErrors --sort --top --bottom --jobids --maxrows --pager --watch --refresh --offline --staleok --export --fields --exportfile --proxy --dir -d --task --instance' -- $cur) )
                     ;;
                 *)
                     COMPREPLY=( $(compgen -f $cur) )
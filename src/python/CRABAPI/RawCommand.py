@@ -7,6 +7,8 @@ import CRABAPI
 import traceback
 
 from CRABClient.ClientUtilities import initLoggers, flushMemoryLogger, removeLoggerHandlers
+from CRABClient.RestInterfaces import clearRequestMemo
+from CRABClient.Timing import resetTimings, timedPhase, reportTimings
 
 
 # NOTE: Not included in unittests
@@ -47,9 +49,14 @@ def execRaw(command, args):
         raise CRABAPI.BadArgumentException( \
                                         'Could not find command "%s"' % command)
 
+    # results of REST reads are only reused within one command
+    clearRequestMemo()
+    resetTimings()
+
     try:
         cmdobj = getattr(mod, command)(logger, args)
-        res = cmdobj()
+        with timedPhase('%s: execution' % command):
+            res = cmdobj()
     except SystemExit as se:
         # most likely an error from the OptionParser in Subcommand.
         # CRABClient #4283 should make this less ugly
@@ -62,6 +69,7 @@ def execRaw(command, args):
             logger.error(traceback.format_exc())
             raise
     finally:
+        reportTimings(logger)
         flushMemoryLogger(tblogger, memhandler, logger.logfile)
         removeLoggerHandlers(tblogger)
         removeLoggerHandlers(logger)
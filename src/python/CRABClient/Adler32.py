@@ -0,0 +1,88 @@
+# pylint: disable=consider-using-f-string
+"""
+Adler32 checksums computed by the client, in the format of the checksums in the file
+metadata of the server and in Rucio, i.e. 8 lowercase hexadecimal digits.
+The checksum is updated with each block of data as it is read, so a file, or the output
+of a command like gfal-cat, is read only once and never needs to be stored whole.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import time
+import zlib
+import tempfile
+import subprocess
+
+from CRABClient.Timing import recordCommand
+
+# bytes read at a time
+BLOCK_SIZE = 1024 * 1024
+
+
+class Adler32(object):
+    """
+    running Adler32 checksum of the data given to update(), or to write(), which also
+    writes the data to the binary file `output` if there is one, e.g. while copying a file
+    """
+
+    def __init__(self, output=None):
+        self.value = 1  # Adler32 of no data
+        self.size = 0
+        self.output = output
+
+    def update(self, data):
+        self.value = zlib.adler32(data, self.value)
+        self.size += len(data)
+
+    def write(self, data):
+        self.update(data)
+        if self.output is not None:
+            self.output.write(data)
+
+    def hexdigest(self):
+        return '%08x' % (self.value & 0xffffffff)
+
+
+def sameAdler32(adler32, other):
+    """
+    whether two Adler32 checksums in hexadecimal are the same number, since they are
+    not always written with leading zeros, e.g. 'a1b2c3' is the same as '00a1b2c3'
+    """
+    return int(adler32, 16) == int(other, 16)
+
+
+def streamAdler32(stream, blockSize=BLOCK_SIZE):
+    """ the Adler32 of everything left in a binary stream, and its size in bytes """
+    checksum = Adler32()
+    while True:
+        data = stream.read(blockSize)
+        if not data:
+            break
+        checksum.update(data)
+    return checksum.hexdigest(), checksum.size
+
+
+def fileAdler32(path, blockSize=BLOCK_SIZE):
+    """ the Adler32 of a local file """
+    with open(path, 'rb') as fd:
+        return streamAdler32(fd, blockSize)[0]
+
+
+def commandAdler32(command, blockSize=BLOCK_SIZE):
+    """
+    Run a shell command and compute the Adler32 of its output while it comes, e.g. of a remote
+    file with 'gfal-cat <PFN>'. Returns (adler32, size in bytes, stderr, exit code)
+    """
+    startTime = time.time()
+    # stderr goes to a file, so that the command can never block on it while we read stdout
+    with tempfile.TemporaryFile() as errFile:
+        process = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=errFile)
+        process.stdin.close()
+        adler32, size = streamAdler32(process.stdout, blockSize)
+        process.stdout.close()
+        process.wait()
+        errFile.seek(0)
+        stderr = errFile.read().decode(encoding='UTF-8', errors='replace')
+    recordCommand(command, time.time() - startTime, process.returncode)
+    return adler32, size, stderr, process.returncode
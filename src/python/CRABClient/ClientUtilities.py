@@ -10,6 +10,7 @@ from __future__ import print_function
 import os
 import re
 import copy
+import bisect
 import datetime
 import logging
 import logging.handlers
@@ -19,6 +20,7 @@ import pkgutil
 import sys
 import pickle
 import subprocess
+import threading
 import traceback
 if sys.version_info >= (3, 0):
     from urllib.parse import urlparse  # pylint: disable=E0611
@@ -28,6 +30,7 @@ if sys.version_info < (3, 0):
 ## CRAB dependencies
 import CRABClient.Emulator
 from ServerUtilities import uploadToS3, getDownloadUrlFromS3
+from CRABClient.Timing import recordCommand
 from CRABClient.ClientExceptions import ClientException, TaskNotFoundException, CachefileNotFoundException, ConfigurationException, ConfigException, UsernameException, ProxyException, RESTCommunicationException, RucioClientException
 
 # pickle files need to be opeb in different mode in python2 or python3
@@ -185,6 +188,113 @@ def flushMemoryLogger(logger, memhandler, logfilename):
     logger.removeHandler(memhandler)
 
 
+class BackgroundCall(object):
+    """
+    Run function(*args, **kwargs) in a thread, to overlap independent network calls:
+        quota = BackgroundCall(isEnoughRucioQuota, rucioClient, site)
+        ...  # something else
+        quota.result()  # waits, then returns what the function returned or raises what it raised
+    """
+
+    def __init__(self, function, *args, **kwargs):
+        self._value = None
+        self._excInfo = None
+        self._thread = threading.Thread(target=self._run, args=(function, args, kwargs))
+        # do not keep crab alive if the user hits Ctrl-C while waiting
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, function, args, kwargs):
+        try:
+            self._value = function(*args, **kwargs)
+        except BaseException:  # pylint: disable=broad-except
+            self._excInfo = sys.exc_info()
+
+    def result(self):
+        self._thread.join()
+        if self._excInfo:
+            if sys.version_info >= (3, 0):
+                raise self._excInfo[1].with_traceback(self._excInfo[2])
+            raise self._excInfo[1]
+        return self._value
+
+
+class TableWriter(object):
+    """
+    Print a long table (e.g. one line per job) while it is being produced, instead of
+    building one huge message: the lines are logged in chunks of CHUNK lines, which gives
+    the same output on the screen and in crab.log.
+    Optionally:
+    - maxRows: print only the first maxRows lines, and then say how many were left out
+    - pager: a command (e.g. 'less -R') through which the lines go to the screen, they still go to crab.log
+    Usage:
+        writer = TableWriter(logger, header="Job  State")
+        for ...:
+            writer.write(line)
+        writer.close()
+    """
+    CHUNK = 1000
+
+    def __init__(self, logger, header=None, footer=None, level=logging.INFO, maxRows=None, pager=None):
+        self.logger = logger
+        self.footer = footer
+        self.level = level
+        self.maxRows = maxRows
+        self.numRows = 0
+        self.skipped = 0
+        self.lines = []
+        self.pagerProcess = None
+        if pager and sys.stdout.isatty():
+            try:
+                self.pagerProcess = subprocess.Popen(pager, shell=True, stdin=subprocess.PIPE,
+                                                     universal_newlines=True)
+            except OSError as ex:
+                logger.debug("Can not start pager %s: %s", pager, ex)
+        if header is not None:
+            self.lines.append(header)
+
+    def write(self, line):
+        """ add one line to the table """
+        if self.maxRows is not None and self.numRows >= self.maxRows:
+            self.skipped += 1
+            return
+        self.numRows += 1
+        self.lines.append(line)
+        if len(self.lines) >= self.CHUNK:
+            self.flush()
+
+    def flush(self):
+        if not self.lines:
+            return
+        text = "\n".join(self.lines)
+        self.lines = []
+        if not self.pagerProcess:
+            self.logger.log(self.level, text)
+            return
+        # goes to crab.log only, via the parent logger (see initLoggers)
+        logging.getLogger('CRAB3').log(self.level, text)
+        try:
+            self.pagerProcess.stdin.write(text + "\n")
+        except (IOError, OSError):
+            # the user quit the pager before the end of the table
+            pass
+
+    def close(self):
+        """ print what is left, and the footer """
+        if self.skipped:
+            self.lines.append("... %d more lines not shown" % self.skipped)
+        if self.footer is not None:
+            self.lines.append(self.footer)
+        self.flush()
+        if self.pagerProcess:
+            try:
+                self.pagerProcess.stdin.close()
+            except (IOError, OSError):
+                pass
+            self.pagerProcess.wait()
+            self.pagerProcess = None
+
+
 def removeLoggerHandlers(logger):
     for h in copy.copy(logger.handlers):
         logger.removeHandler(h)
@@ -198,6 +308,38 @@ def getColumn(dictresult, columnName):
     else:
         return value
 
+
+class TaskDBRow(object):
+    """
+    One row of a REST answer in the {'desc': {'columns': [...]}, 'result': [...]} format
+    (e.g. 'task search'), with O(1) access by column name: row['tm_username'].
+    As in getColumn, the 'None' string is returned as None.
+    If columns is given only those are kept, so that the full answer can be released.
+    """
+    __slots__ = ['_index', '_values']
+
+    def __init__(self, dictresult, columns=None):
+        allColumns = dictresult['desc']['columns']
+        values = dictresult['result']
+        if columns:
+            positions = dict((name, pos) for pos, name in enumerate(allColumns))
+            self._values = [values[positions[name]] for name in columns]
+            self._index = dict((name, pos) for pos, name in enumerate(columns))
+        else:
+            self._values = values
+            self._index = dict((name, pos) for pos, name in enumerate(allColumns))
+
+    def __getitem__(self, columnName):
+        value = self._values[self._index[columnName]]
+        return None if value == 'None' else value
+
+    def __contains__(self, columnName):
+        return columnName in self._index
+
+    def get(self, columnName, default=None):
+        return self[columnName] if columnName in self._index else default
+
+
 def uploadlogfile(logger, proxyfilename, taskname=None, logfilename=None, logpath=None, instance=None, serverurl=None, username=None):
 
     doupload = True
@@ -449,6 +591,91 @@ def loadCache(mydir, logger):
     return pickle.load(loadfile), logfile
 
 
+## Result of the last 'task search' is kept in the project directory next to .requestcache
+## so that following commands on the same task can avoid asking the server again.
+TASKINFO_CACHEFILE = '.taskinfocache'
+
+## Directory in the project directory where files downloaded from the schedd webdir are cached,
+## see UserUtilities.curlGetFileFromURL
+FILECACHE_DIR = '.filecache'
+
+## Directory in the project directory where crab status keeps what it got from the servers
+## the last time it succeeded, for crab status --offline
+STATUS_SNAPSHOT_DIR = '.statussnapshot'
+
+## Columns of the task DB which do not change after submission. Once they are filled they
+## are taken from the cache no matter how old it is, everything else is only trusted for
+## TASKINFO_TTL seconds (can be changed via the CRAB_taskInfoTTL environment variable).
+TASKINFO_IMMUTABLE_COLUMNS = ['tm_taskname', 'tm_username', 'tm_user_webdir', 'tm_start_time',
+                              'tm_job_type', 'tm_split_algo', 'tm_split_args', 'tm_user_sandbox',
+                              'tm_debug_files', 'tm_input_dataset', 'tm_output_dataset',
+                              'tm_publication', 'tm_asyncdest', 'tm_output_lfn', 'tm_save_logs',
+                              'tm_transfer_outputs', 'tm_edm_outfiles', 'tm_tfile_outfiles',
+                              'tm_outfiles', 'tm_scriptexe', 'tm_maxmemory', 'tm_maxjobruntime',
+                              'tm_numcores']
+TASKINFO_TTL = 30
+
+
+def getTaskDBInfo(crabserver, taskname, requestarea=None, columns=None, logger=None, ttl=None):
+    """
+    Same as crabserver.get(api='task', data={'subresource':'search', 'workflow':taskname})
+    but using the cache in the project directory (if requestarea is given) when possible:
+    - if all the requested columns are immutable and already filled, the cache is used regardless of its age
+    - otherwise the cache is used if it is younger than ttl seconds, by default TASKINFO_TTL.
+      ttl=0 for callers which show the mutable columns, like crab status, they always get them fresh
+    Returns the same (dictresult, status, reason) tuple as the REST call.
+    """
+    if not logger:
+        logger = logging.getLogger('CRAB3')
+    cachename = os.path.join(requestarea, TASKINFO_CACHEFILE) if requestarea else None
+    cached = None
+    if cachename and os.path.isfile(cachename):
+        try:
+            with open(cachename, PKL_R_MODE) as fd:
+                cached = pickle.load(fd)
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.debug("Ignoring unreadable task info cache %s: %s", cachename, ex)
+        if cached and cached.get('taskname') != taskname:
+            cached = None
+    if cached:
+        dictresult = cached['dictresult']
+        age = time.time() - cached['time']
+        if ttl is None:
+            ttl = float(os.getenv('CRAB_taskInfoTTL', TASKINFO_TTL))
+        if columns and all(col in TASKINFO_IMMUTABLE_COLUMNS for col in columns) and \
+           all(getColumn(dictresult, col) not in [None, ''] for col in columns):
+            logger.debug("Using cached task information for columns %s", columns)
+            return dictresult, 200, 'OK'
+        if 0 <= age < ttl:
+            logger.debug("Using task information cached %d seconds ago", age)
+            return dictresult, 200, 'OK'
+
+    dictresult, status, reason = crabserver.get(api='task', data={'subresource': 'search', 'workflow': taskname},
+                                                memoize=True)
+    if cachename and status == 200 and 'desc' in dictresult:
+        # write to a new file and move it in place, so that a concurrent reader never sees a partial file
+        tmpname = "%s.%d" % (cachename, os.getpid())
+        try:
+            with open(tmpname, PKL_W_MODE) as fd:
+                pickle.dump({'taskname': taskname, 'time': time.time(), 'dictresult': dictresult}, fd, protocol=0)
+            os.rename(tmpname, cachename)
+        except (IOError, OSError) as ex:
+            logger.debug("Could not write task info cache %s: %s", cachename, ex)
+    return dictresult, status, reason
+
+
+def invalidateTaskDBInfo(requestarea):
+    """
+    Remove the cached task information, to be called after any action which modifies the task
+    """
+    if not requestarea:
+        return
+    try:
+        os.remove(os.path.join(requestarea, TASKINFO_CACHEFILE))
+    except OSError:
+        pass
+
+
 def getUserProxy():
     """
     Retrieve the user proxy filename
@@ -606,6 +833,102 @@ def compareJobids(a, b):
     return 1 if aa[0] > bb[0] else -1
 
 
+def jobidSortKey(jobid):
+    """ Sort key giving the same order as compareJobids, to sort without cmp_to_key:
+            sorted(jobids, key=jobidSortKey)
+    """
+    parts = [int(x) for x in jobid.split('-')]
+    if len(parts) == 1:
+        return (1, parts[0], 0)
+    return (0 if parts[0] == 0 else 2, parts[0], parts[1])
+
+
+class JobidIndex(object):
+    """
+    A set of job ids like '12' or '3-7' (probe and tail jobs of automatic splitting),
+    each parsed once. Iterating gives the ids in the order of compareJobids, membership
+    is a dictionary lookup, between() selects the ids in a range of that order and
+    toRanges() writes them back in a compact form, e.g. '1-5,7; probe/tail jobs 0-1,3-2'
+    """
+
+    def __init__(self, jobids=()):
+        self._keys = {}  # jobid: jobidSortKey(jobid)
+        self._sorted = None
+        self._sortedKeys = None
+        self.update(jobids)
+
+    def update(self, jobids):
+        keys = self._keys
+        for jobid in jobids:
+            jobid = str(jobid)
+            if jobid not in keys:
+                keys[jobid] = jobidSortKey(jobid)
+                self._sorted = None
+
+    def add(self, jobid):
+        self.update([jobid])
+
+    def __contains__(self, jobid):
+        return str(jobid) in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(self.sorted())
+
+    def sorted(self):
+        """ list of the job ids in the order of compareJobids """
+        if self._sorted is None:
+            self._sorted = sorted(self._keys, key=self._keys.get)
+            self._sortedKeys = [self._keys[jobid] for jobid in self._sorted]
+        return self._sorted
+
+    def missing(self, jobids):
+        """ the ids in jobids which are not in this index """
+        return [str(jobid) for jobid in jobids if str(jobid) not in self._keys]
+
+    def between(self, first, last):
+        """ the ids from first to last included, in the order of compareJobids """
+        jobids = self.sorted()
+        start = bisect.bisect_left(self._sortedKeys, jobidSortKey(str(first)))
+        end = bisect.bisect_right(self._sortedKeys, jobidSortKey(str(last)))
+        return jobids[start:end]
+
+    def toRanges(self, separator=',', maxRanges=None):
+        """
+        The numeric ids with consecutive ids collapsed into ranges as in --jobids, e.g. '1-5,7',
+        then the ids of probe and tail jobs after a label, since they have the same form as a
+        range: '1-5,7; probe/tail jobs 0-1,1-3'. With maxRanges only so many entries are written,
+        followed by how many more jobs there are.
+        """
+        ranges = []  # [first, last] of the numeric ids
+        others = []  # ids of probe and tail jobs
+        for jobid in self.sorted():
+            group, number, _ = self._keys[jobid]
+            if group != 1:
+                others.append(jobid)
+            elif ranges and ranges[-1][1] == number - 1:
+                ranges[-1][1] = number
+            else:
+                ranges.append([number, number])
+        entries = []
+        shown = 0
+        for first, last in ranges[:maxRanges]:
+            entries.append(str(first) if first == last else '%d-%d' % (first, last))
+            shown += last - first + 1
+        if maxRanges is not None:
+            others = others[:max(0, maxRanges - len(entries))]
+        shown += len(others)
+        parts = [separator.join(entries)] if entries else []
+        if others:
+            parts.append('probe/tail jobs ' + separator.join(others))
+        text = '; '.join(parts)
+        if shown < len(self._keys):
+            text += ' ... and %d more' % (len(self._keys) - shown)
+        return text
+
+
 def validateJobids(jobids, allowLists=True):
     #check the format of jobids
     if re.match(r'^\d+((?!(-\d+-))(\,|\-)\d+)*$', jobids):
@@ -728,7 +1051,8 @@ def checkStatusLoop(logger, server, api, taskname, targetstatus, cmdname):
 
         logger.debug("Looking up status of task %s" % (taskname))
         # use same call as in Commands/status.py
-        crabDBInfo, status, reason = server.get(api='task', data={'subresource':'search', 'workflow':taskname})
+        # we are polling for a status change, make sure to really ask the server
+        crabDBInfo, status, reason = server.get(api='task', data={'subresource':'search', 'workflow':taskname}, memoize=False)
 
         if status != 200:
             msg = "Error when trying to check the task status."
@@ -788,13 +1112,14 @@ def checkStatusLoop(logger, server, api, taskname, targetstatus, cmdname):
     logger.debug("Ended %s process." % ("resubmission" if cmdname == "resubmit" else "submission"))
 
 
-def execute_command(command=None, logger=None, timeout=None, redirect=True):
+def execute_command(command=None, logger=None, timeout=None, redirect=True, inputData=None):
     """
     execute command with optional logging and timeout (in seconds).
     NOTE: TIMEOUT ONLY WORKS IF command IS A ONE WORD COMMAND
     Returns a 3-ple: stdout, stderr, rc
       rc=0 means success.
       rc=124 (SIGTERM) means that command timed out
+    inputData (a string) is written to the command stdin, e.g. curl --data @- reads the request body from there
     Redirection of std* can be turned off if the command will need to interact with caller
     writing messages and/or asking for input, like if needs to get a passphrase to access
     usercert/key for (my)proxy creation as in
@@ -811,6 +1136,7 @@ def execute_command(command=None, logger=None, timeout=None, redirect=True):
         if logger:
             logger.debug('add timeout at %s seconds', timeout)
         command = ('timeout %s ' % timeout ) + command
+    startTime = time.time()
     if redirect:
         proc = subprocess.Popen(
             command, shell=True,
@@ -821,8 +1147,12 @@ def execute_command(command=None, logger=None, timeout=None, redirect=True):
     else:
         proc = subprocess.Popen(command, shell=True)
 
-    out, err = proc.communicate()
+    if inputData is not None and redirect:
+        out, err = proc.communicate(input=inputData.encode('utf-8'))
+    else:
+        out, err = proc.communicate()
     rc = proc.returncode
+    recordCommand(command, time.time() - startTime, rc)
     if rc == 124 and timeout:
         if logger:
             logger.error('ERROR: Timeout after %s seconds in executing:\n %s' % (timeout,command))
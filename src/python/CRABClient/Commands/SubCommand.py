@@ -20,6 +20,7 @@ from CRABClient.ClientExceptions import (ConfigurationException, MissingOptionEx
 from CRABClient.ClientMapping import (renamedParams, commandsConfiguration, configParametersInfo,
                                       getParamDefaultValue, deprecatedParams)
 from CRABClient.UserUtilities import getUsername
+from CRABClient.Timing import timedPhase
 
 #if certificates in myproxy expires in less than RENEW_MYPROXY_THRESHOLD days renew them
 RENEW_MYPROXY_THRESHOLD = 15
@@ -233,17 +234,18 @@ class SubCommand(ConfigCommand):
         self.logger = logger
         self.logfile = self.logger.logfile
 
-        stdout, _, _ = execute_command(command='uname -a')
-        localSystem = stdout.strip()
-        try:
-            localOS, _, _ = execute_command('grep PRETTY_NAME /etc/os-release')
-            localOS = localOS.strip().split('=')[1].strip('"')
-        except Exception as ex:  # pylint: disable=unused-variable
+        with timedPhase('%s: system info' % self.name):
+            stdout, _, _ = execute_command(command='uname -a')
+            localSystem = stdout.strip()
             try:
-                localOS, _, _ = execute_command(command='lsb_release -d')
-                localOS = localOS.strip().split(':')[1].strip()
+                localOS, _, _ = execute_command('grep PRETTY_NAME /etc/os-release')
+                localOS = localOS.strip().split('=')[1].strip('"')
             except Exception as ex:  # pylint: disable=unused-variable
-                localOS = "Unknown Operating System"
+                try:
+                    localOS, _, _ = execute_command(command='lsb_release -d')
+                    localOS = localOS.strip().split(':')[1].strip()
+                except Exception as ex:  # pylint: disable=unused-variable
+                    localOS = "Unknown Operating System"
         self.logger.debug("CRAB Client version: %s", __version__)
         self.logger.debug("Running on: " + localSystem )
         if 'SINGULARITY_NAME' in os.environ:
@@ -274,6 +276,10 @@ class SubCommand(ConfigCommand):
         self.cmdargs = cmdargs
         (self.options, self.args) = self.parser.parse_args(cmdargs)
 
+        # with some options a command only works with local information, e.g. crab status --offline
+        if self.worksOffline():
+            self.cmdconf = dict(self.cmdconf, requiresREST=False, requiresRucio=False)
+
         self.transferringIds = None
         self.dest = None
 
@@ -362,7 +368,11 @@ class SubCommand(ConfigCommand):
         # overwrite the current proxy. If he doesn't want to overwrite it, we don't continue 
         # and ask him to provide the VO role/group as in the existing proxy. 
         # Finally, delegate the proxy to myproxy server.
-        self.handleVomsProxy(proxyOptsSetPlace)
+        # A command working offline needs no proxy, or checks it itself with checkVomsProxy() once it has to
+        # talk to a server.
+        self.proxyOptsSetPlace = proxyOptsSetPlace
+        if not self.worksOffline():
+            self.checkVomsProxy()
 
         # only if this command talks to the REST we create a CRABRest object to communicate with CRABServer
         # and check/upate credentials on myproxy
@@ -371,16 +381,15 @@ class SubCommand(ConfigCommand):
         #server = CRABClient.Emulator.getEmulator('rest')(url=serverurl, localcert=proxyfilename, localkey=proxyfilename,
         #          retry=2, logger=logger)
         if self.cmdconf['requiresREST']:
+            self.crabserver = self.createCRABServer()
             crabRest = CRABClient.Emulator.getEmulator('rest')
-            self.crabserver = crabRest(hostname=self.serverurl, localcert=self.proxyfilename, localkey=self.proxyfilename,
-                                        retry=2, logger=self.logger, verbose=False)
-            self.crabserver.setDbInstance(self.instance)
             # prepare also a test crabserver instance which will send tarballs to S3
             self.s3tester = crabRest(hostname='cmsweb-testbed.cern.ch',
                                       localcert=self.proxyfilename, localkey=self.proxyfilename,
                                       retry=0, logger=self.logger, verbose=False)
             self.s3tester.setDbInstance('preprod')
-            self.handleMyProxy()
+            with timedPhase('%s: myproxy check' % self.name):
+                self.handleMyProxy()
 
         if self.cmdconf['requiresRucio']:
             if os.environ.get('RUCIO_HOME', None):
@@ -406,7 +415,8 @@ class SubCommand(ConfigCommand):
         self.logger.debug('Command use: %s' % self.name)
         self.logger.debug('Options use: %s' % cmdargs)
         if self.cmdconf['requiresREST']:
-            self.checkversion()
+            with timedPhase('%s: version check' % self.name):
+                self.checkversion()
             self.defaultApi = 'workflow'
         self.logger.debug("Instance is %s" %(self.instance))
         self.logger.debug("Server base url is %s" %(self.serverurl))
@@ -414,6 +424,24 @@ class SubCommand(ConfigCommand):
             self.logger.debug("Command api %s" %(self.defaultApi))
 
 
+    def worksOffline(self):
+        """
+        True if, with the options given, the command does not need to talk to the CRAB server
+        and to Rucio, nor a proxy until it calls checkVomsProxy(). To be overridden by the commands
+        which have such options.
+        """
+        return False
+
+    def createCRABServer(self):
+        """
+        The CRABRest object to talk to self.serverurl, self.instance
+        """
+        crabRest = CRABClient.Emulator.getEmulator('rest')
+        crabserver = crabRest(hostname=self.serverurl, localcert=self.proxyfilename, localkey=self.proxyfilename,
+                              retry=2, logger=self.logger, verbose=False)
+        crabserver.setDbInstance(self.instance)
+        return crabserver
+
     def serverInstance(self):
         """
         Deriving the correct instance to use and the server url. Client is allowed to propagate the instance name and corresponding url
@@ -464,6 +492,13 @@ class SubCommand(ConfigCommand):
             self.logger.info(msg)
 
 
+    def checkVomsProxy(self):
+        """
+        handleVomsProxy() with the VO group/role found by the command setup
+        """
+        with timedPhase('%s: proxy check' % self.name):
+            self.handleVomsProxy(self.proxyOptsSetPlace)
+
     def handleVomsProxy(self, proxyOptsSetPlace):
         """
         Make sure that there is a valid VOMS proxy
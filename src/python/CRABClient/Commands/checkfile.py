@@ -7,12 +7,12 @@ check a file (LFN) status in DBS and Rucio and its disk replicas
 from __future__ import print_function
 
 import sys
-import tempfile
 
 from CRABClient.Commands.SubCommand import SubCommand
 from CRABClient.UserUtilities import getUsername
 from CRABClient.ClientUtilities import execute_command, colors
 from CRABClient.ClientUtilities import commandUsedInsideCrab
+from CRABClient.Adler32 import commandAdler32, sameAdler32
 from CRABClient.ClientExceptions import MissingOptionException, ConfigurationException
 
 from CRABClient.RestInterfaces import getDbsREST
@@ -95,7 +95,7 @@ class checkfile(SubCommand):
 
         if rseWithSizeOK and not self.checkChecksum:
             msg = "Disk replicas files may still be corrupted"
-            msg += "\n run again with --checksum for a thorough check. Beware: SLOW and needs GB's of disk"
+            msg += "\n run again with --checksum for a thorough check. Beware: SLOW, each replica is read in full"
             self.logger.info(msg)
             return {'commandStatus': 'SUCCESS'}
 
@@ -259,41 +259,27 @@ class checkfile(SubCommand):
 
     def checkReplicaAdler32(self, pfn):
         """
-        compute Adler32 on a remote PFN. Need to copy the file first
-        and run gfal-sum on local copy. gfal-sum accepts a remote PFN
-        but in that case it returns some value stored by remote server
-        which can be stale (the checksum when the file was written ?)
+        compute Adler32 on a remote PFN. The file is read with gfal-cat and the checksum
+        is computed while the data arrive, so nothing is written to local disk.
+        gfal-sum accepts a remote PFN but in that case it returns some value stored
+        by remote server which can be stale (the checksum when the file was written ?)
         """
-
-        f = tempfile.NamedTemporaryFile(delete=False, prefix='testFile_')
-        fname = f.name
-        execute_command("rm -f %s" % fname)
-        if commandUsedInsideCrab():
-            print("copy file...", end="", flush=True)
-        cmd = "eval `scram unsetenv -sh`; gfal-copy %s %s" % (pfn, fname)
-        out, err, ec = execute_command(cmd)
-        if ec:
-            msg = "file copy for checksum control failed.\n%s\n%s" % (out, err)
-            execute_command("rm -f %s" % fname)
-            return False, msg
-
         if commandUsedInsideCrab():
-            print("compute Adler32 checksum...", end="", flush=True)
-        cmd = "eval `scram unsetenv -sh`; gfal-sum %s ADLER32" % fname
-        out, err, ec = execute_command(cmd)
+            print("read file and compute Adler32 checksum...", end="", flush=True)
+        cmd = "eval `scram unsetenv -sh`; gfal-cat %s" % pfn
+        adler32, size, err, ec = commandAdler32(cmd)
         if ec:
-            msg = "checksum computation failed.\n%s\n%s" % (out, err)
-            execute_command("rm -f %s" % fname)
+            msg = "file read for checksum control failed.\n%s" % err
             return False, msg
         if commandUsedInsideCrab():
             print("Done")
-        adler32 = out.split()[1]
-        if not adler32 == self.fileToCheck['adler32']:
+        if size != int(self.fileToCheck['size']):
+            msg = "Remote replica read back with wrong size. %s vs. %s" % (size, self.fileToCheck['size'])
+            return False, msg
+        if not sameAdler32(adler32, self.fileToCheck['adler32']):
             msg = "Remote replica has wrong checksum. %s vs. %s" % (adler32, self.fileToCheck['adler32'])
             msg += "  Needs to be invalidated"
-            execute_command("rm -f %s" % fname)
             return False, msg
-        execute_command("rm -f %s" % fname)
         return True, ""
 
     def setOptions(self):
@@ -309,7 +295,7 @@ class checkfile(SubCommand):
         self.parser.add_option('--checksum',
                                dest='checkChecksum',
                                action="store_true",
-                               help="check checksum of all disk replicas. SLOW and needs GB's of disk !")
+                               help="check checksum of all disk replicas. SLOW, each replica is read in full !")
         self.parser.add_option('--dbs-instance', dest='dbsInstance', default='prod/global',
                                help="DBS instance. e.g. prod/global (default) or prod/phys03 or full URL."
                                     + "\nUse at your own risk only if you really know what you are doing"
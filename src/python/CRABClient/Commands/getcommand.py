@@ -4,7 +4,6 @@ from __future__ import print_function
 import os
 import sys
 import re
-import copy
 
 if sys.version_info >= (3, 0):
     from urllib.parse import urlencode # pylint: disable=E0611
@@ -15,7 +14,7 @@ from CRABClient.Commands.remote_copy import remote_copy
 from CRABClient.Commands.SubCommand import SubCommand
 from CRABClient.ClientExceptions import ConfigurationException, RESTCommunicationException,\
     ClientException
-from CRABClient.ClientUtilities import validateJobids, colors
+from CRABClient.ClientUtilities import validateJobids, colors, getTaskDBInfo, TaskDBRow, JobidIndex
 from CRABClient.UserUtilities import getMutedStatusInfo
 
 class getcommand(SubCommand):
@@ -40,15 +39,16 @@ class getcommand(SubCommand):
         transferFlag = 'unknown'
         inputlist = {'subresource': 'search', 'workflow': self.cachedinfo['RequestName']}
         server = self.crabserver
-        dictresult, status, _ = server.get(api='task', data=inputlist)
+        columns = [c for c in [taskdbparam, 'tm_split_algo', 'tm_edm_outfiles', 'tm_tfile_outfiles', 'tm_outfiles'] if c]
+        dictresult, status, _ = getTaskDBInfo(server, inputlist['workflow'], self.requestarea,
+                                              columns=columns, logger=self.logger)
         self.logger.debug('Server result: %s' % dictresult)
         splitting = None
         if status == 200:
             if 'desc' in dictresult and 'columns' in dictresult['desc']:
-                position = dictresult['desc']['columns'].index(taskdbparam)
-                transferFlag = dictresult['result'][position]  # = 'T' or 'F'
-                position = dictresult['desc']['columns'].index('tm_split_algo')
-                splitting = dictresult['result'][position]
+                taskRow = TaskDBRow(dictresult, columns=columns)
+                transferFlag = taskRow[taskdbparam]  # = 'T' or 'F'
+                splitting = taskRow['tm_split_algo']
             else:
                 self.logger.debug("Unable to locate %s in server result." % (taskdbparam))
         ## If transferFlag = False, there is nothing to retrieve.
@@ -60,12 +60,9 @@ class getcommand(SubCommand):
         ## Retrieve tm_edm_outfiles, tm_tfile_outfiles and tm_outfiles from the task database and check if they are empty.
         if argv.get('subresource') in ['data', 'data2'] and status == 200:
             if 'desc' in dictresult and 'columns' in dictresult['desc']:
-                position = dictresult['desc']['columns'].index('tm_edm_outfiles')
-                tm_edm_outfiles = dictresult['result'][position]
-                position = dictresult['desc']['columns'].index('tm_tfile_outfiles')
-                tm_tfile_outfiles = dictresult['result'][position]
-                position = dictresult['desc']['columns'].index('tm_outfiles')
-                tm_outfiles = dictresult['result'][position]
+                tm_edm_outfiles = taskRow['tm_edm_outfiles']
+                tm_tfile_outfiles = taskRow['tm_tfile_outfiles']
+                tm_outfiles = taskRow['tm_outfiles']
             if tm_edm_outfiles == '[]' and tm_tfile_outfiles == '[]' and tm_outfiles == '[]':
                 msg = "%sWarning%s:" % (colors.RED, colors.NORMAL)
                 msg += " There are no output files to retrieve, because CRAB could not detect any in the CMSSW configuration"
@@ -136,8 +133,7 @@ class getcommand(SubCommand):
                            '--checksum', self.checksum, '--command', self.command]
                 copyoutput = remote_copy(self.logger, arglist)
                 successdict, faileddict = copyoutput()
-                #need to use deepcopy because successdict and faileddict are dict that is under the a manage dict, accessed multithreadly
-                returndict = {'success': copy.deepcopy(successdict), 'failed': copy.deepcopy(faileddict)}
+                returndict = {'success': successdict, 'failed': faileddict}
         if totalfiles == 0:
             self.logger.info("No files to retrieve.")
             returndict = {'success': {}, 'failed': {}}
@@ -169,8 +165,9 @@ class getcommand(SubCommand):
         possibleJobIds = transferringIds + finishedIds
 
         if self.options.jobids:
+            possibleJobIdsIndex = JobidIndex(possibleJobIds)
             for jobid in self.options.jobids:
-                if not str(jobid[1]) in possibleJobIds:
+                if not str(jobid[1]) in possibleJobIdsIndex:
                     raise ConfigurationException("The job with id %s is not in a valid state to retrieve output files" % jobid[1])
         else:
             ## If the user does not give us jobids, set them to all possible ids.
@@ -1,7 +1,7 @@
 from __future__ import print_function
 from __future__ import division
 
-from CRABClient.ClientUtilities import colors, validateJobids, getColumn
+from CRABClient.ClientUtilities import colors, validateJobids, getColumn, getTaskDBInfo
 from CRABClient.UserUtilities import curlGetFileFromURL
 from CRABClient.Commands.getcommand import getcommand
 from CRABClient.ClientExceptions import RESTCommunicationException, MissingOptionException
@@ -24,7 +24,8 @@ class getlog(getcommand):
             inputlist = {'subresource': 'search', 'workflow': taskname}
             server = self.crabserver
             webdir = getProxiedWebDir(crabserver=self.crabserver, task=taskname, logFunction=self.logger.debug)
-            dictresult, status, reason = server.get(api='task', data=inputlist)
+            dictresult, status, reason = getTaskDBInfo(server, taskname, self.requestarea,
+                                                       columns=['tm_split_algo'], logger=self.logger)
             if not webdir:
                 webdir = dictresult['result'][0]
                 self.logger.info('Server result: %s' % webdir)
@@ -3,6 +3,7 @@ import os
 from CRABClient.Commands.SubCommand import SubCommand
 
 from CRABClient.UserUtilities import curlGetFileFromURL, getColumn
+from CRABClient.ClientUtilities import getTaskDBInfo
 
 from ServerUtilities import downloadFromS3, getProxiedWebDir
 
@@ -24,7 +25,9 @@ class getsandbox(SubCommand):
         # get information necessary for next steps
         # Get all of the columns from the database for a certain task
         self.taskname = self.cachedinfo['RequestName']
-        self.crabDBInfo, _, _ = self.crabserver.get(api='task', data={'subresource':'search', 'workflow':self.taskname})
+        self.crabDBInfo, _, _ = getTaskDBInfo(self.crabserver, self.taskname, self.requestarea,
+                                              columns=['tm_user_sandbox', 'tm_username', 'tm_user_webdir'],
+                                              logger=self.logger)
         self.logger.debug("Got information from server oracle database: %s", self.crabDBInfo)
 
         # arguments used by following functions
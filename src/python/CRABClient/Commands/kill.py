@@ -10,6 +10,7 @@ if sys.version_info < (3, 0):
 
 from CRABClient.Commands.SubCommand import SubCommand
 from CRABClient.ClientExceptions import RESTCommunicationException
+from CRABClient.ClientUtilities import invalidateTaskDBInfo
 
 class kill(SubCommand):
     """
@@ -27,6 +28,7 @@ class kill(SubCommand):
             inputs.update({'killwarning' : self.options.killwarning})
 
         dictresult, status, reason = server.delete(api=self.defaultApi, data=urlencode(inputs))
+        invalidateTaskDBInfo(self.requestarea)
         self.logger.debug("Result: %s" % dictresult)
 
         if status != 200:
@@ -11,7 +11,7 @@ import tempfile
 
 from ServerUtilities import getColumn, downloadFromS3
 
-from CRABClient.ClientUtilities import execute_command
+from CRABClient.ClientUtilities import execute_command, getTaskDBInfo
 from CRABClient.Commands.SubCommand import SubCommand
 from CRABClient.ClientExceptions import ClientException
 
@@ -63,7 +63,7 @@ class preparelocal(SubCommand):
         #Get task status from the task DB
         self.logger.debug("Getting status from he DB")
         server = self.crabserver
-        crabDBInfo, _, _ = server.get(api='task', data={'subresource': 'search', 'workflow': taskname})
+        crabDBInfo, _, _ = getTaskDBInfo(server, taskname, self.requestarea, logger=self.logger)
         status = getColumn(crabDBInfo, 'tm_task_status')
         self.destination = getColumn(crabDBInfo, 'tm_asyncdest')
         username = getColumn(crabDBInfo, 'tm_username')
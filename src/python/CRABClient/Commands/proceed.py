@@ -10,6 +10,7 @@ if sys.version_info < (3, 0):
 
 from CRABClient.Commands.SubCommand import SubCommand
 from CRABClient.ClientExceptions import RESTCommunicationException
+from CRABClient.ClientUtilities import invalidateTaskDBInfo
 
 class proceed(SubCommand):
     """
@@ -30,6 +31,7 @@ class proceed(SubCommand):
         self.logger.info("Sending the request to the server")
         self.logger.debug("Submitting %s " % str(request))
         result, status, reason = server.post(api=self.defaultApi, data=urlencode(request))
+        invalidateTaskDBInfo(self.requestarea)
         self.logger.debug("Result: %s" % (result))
         if status != 200:
             msg = "Problem continuing task submission:\ninput:%s\noutput:%s\nreason:%s" \
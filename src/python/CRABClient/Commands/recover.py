@@ -32,7 +32,7 @@ from CRABClient.JobType.BasicJobType import BasicJobType
 
 # step status
 from CRABClient.Commands.status import status
-from CRABClient.ClientUtilities import LOGLEVEL_MUTE
+from CRABClient.ClientUtilities import LOGLEVEL_MUTE, getTaskDBInfo
 
 # step getsandbox
 from CRABClient.Commands.getsandbox import getsandbox
@@ -238,7 +238,10 @@ class recover(SubCommand):
         ## - we can not recover a task that is older than 30d, because we need
         ##   files from the schedd about the status of each job
         ## - we want to recover only "analysis" tasks
-        self.failingCrabDBInfo, _, _ = self.crabserver.get(api='task', data={'subresource':'search', 'workflow':self.failingTaskName})
+        self.failingCrabDBInfo, _, _ = getTaskDBInfo(self.crabserver, self.failingTaskName, self.crabProjDir,
+                                                     columns=['tm_start_time', 'tm_job_type', 'tm_split_algo',
+                                                              'tm_publication', 'tm_username', 'tm_scriptexe'],
+                                                     logger=self.logger)
         self.logger.debug("stepRemakeAndValidate() - Got information from server oracle database: %s", self.failingCrabDBInfo)
         startTimeDb = getColumn(self.failingCrabDBInfo, 'tm_start_time')
         # 2023-10-24 10:56:26.573303
@@ -1,16 +1,26 @@
 from __future__ import division
 from __future__ import print_function
 import os
-import subprocess
-import multiprocessing
-import time
 import re
+import heapq
 from math import ceil
-import logging
-from multiprocessing import Manager
 
 from CRABClient.Commands.SubCommand import SubCommand
-from CRABClient.ClientUtilities import colors, cmd_exist, logfilter, execute_command
+from CRABClient.ClientUtilities import colors, cmd_exist
+from CRABClient.TransferScheduler import TransferScheduler, DONE, FAILED
+from CRABClient import TransferJournal
+from CRABClient.Adler32 import Adler32, fileAdler32, sameAdler32
+
+# maximum number of parallel transfers
+MAX_PARALLEL = 100
+# maximum number of files given to one gfal-copy command, which copies them one after the other
+# with a single start up and authentication. Smaller batches are used to keep all threads busy
+BULK_SIZE = 50
+# times a failed transfer is tried again, after a delay which grows at each attempt
+MAX_RETRIES = 2
+# seconds, transfer timeout in case the file size is unknown: 15min, and the shortest timeout: 1min
+SRM_TIMEOUT = 900
+MIN_SRM_TIMEOUT = 60
 
 
 class remote_copy(SubCommand):
@@ -23,7 +33,6 @@ class remote_copy(SubCommand):
 
     def __init__(self, logger, cmdargs=None):
         SubCommand.__init__(self, logger, cmdargs)
-        self.remotecpLogile = None
 
 
     def setOptions(self):
@@ -58,12 +67,16 @@ class remote_copy(SubCommand):
         """
         Copying locally files staged remotely.
          * using a subprocess to encapsulate the copy command.
-         * maximum parallel download is 10
+         * the copy commands run in parallel threads of a TransferScheduler, default is 10
+         * with gfal-copy, several files going to the same local directory are copied by one command
+         * the transfers to a local directory are recorded in a TransferJournal there, so that a new
+           command does not copy again the files retrieved by an earlier one
+         * the largest files go first, the number of parallel transfers from each site goes down when
+           they fail, the failed files are tried again later and the timeouts follow the measured speed
+         * with --checksum, the copy tool checks that each copy has the Adler32 of its source, and the files
+           copied to a local directory are compared with the Adler32 known by the server, once per batch.
+           A file copied alone with gfal is read with gfal-cat instead, computing its Adler32 while it is written
         """
-        ## This is the log gilename that is going to be used by the subprocesses that copy the file
-        ## Using the same logfile is not supported automatically, see:
-        ## https://docs.python.org/2/howto/logging-cookbook.html#logging-to-a-single-file-from-multiple-processes
-        self.remotecpLogile = "%s/remote_copy.log" % os.path.dirname(self.logger.logfile)
         dicttocopy = self.options.inputdict
 
         # taking number of parallel download to create from user, default is 10
@@ -72,47 +85,88 @@ class remote_copy(SubCommand):
         else:
             nsubprocess = int(self.options.nparallel)
 
-        if nsubprocess <= 0 or nsubprocess > 20:
-            self.logger.info("Inappropriate number of parallel download, must between 0 to 20 ")
+        if nsubprocess <= 0 or nsubprocess > MAX_PARALLEL:
+            self.logger.info("Inappropriate number of parallel download, must between 0 to %d " % MAX_PARALLEL)
             return -1
         command = ""
+        bulkSize = 1
         if cmd_exist("gfal-copy") and self.options.command not in ["LCG"]:
             self.logger.info("Will use `gfal-copy` command for file transfers")
-            command = "gfal-copy -v "
-            if self.options.checksum:
-                command += "-K %s " % self.options.checksum
-            command += " -T "
+            command = "gfal-copy -v %s -T "
+            checksumOption = "-K %s " % self.options.checksum
+            timeoutOption = " -t "
+            bulkSize = max(1, min(BULK_SIZE, int(ceil(len(dicttocopy) / nsubprocess))))
         elif cmd_exist("lcg-cp") and self.options.command not in ["GFAL"]:
             self.logger.info("Will use `lcg-cp` command for file transfers")
-            command = "lcg-cp --connect-timeout 20 --verbose -b -D srmv2"
-            if self.options.checksum:
-                command += " --checksum-type %s " % self.options.checksum
-            command += " --sendreceive-timeout "
+            command = "lcg-cp --connect-timeout 20 --verbose -b -D srmv2%s --sendreceive-timeout "
+            checksumOption = " --checksum-type %s " % self.options.checksum
+            timeoutOption = " --srm-timeout "
         else:
             # This should not happen. If it happens, Site Admin have to install GFAL2 (yum install gfal2-util gfal2-all)
             self.logger.info("%sError%s: Can`t find command `gfal-copy` or `lcg-ls`, Please contact the site administrator." % (colors.RED, colors.NORMAL))
             return [], []
 
         command += "1800" if self.options.waittime == None else str(1800 + int(self.options.waittime))
+        # better to execut grid commands in the pre-CMS environment
+        undoScram = "which scram >/dev/null 2>&1 && eval `scram unsetenv -sh`"
+        self.command = undoScram + '; ' + (command % '') + ' ' + timeoutOption
+        # the copy tool verifies the copies against their sources, the client against the server
+        self.verifyChecksum = bool(self.options.checksum)
+        self.checksumCommand = self.command
+        if self.verifyChecksum:
+            self.checksumCommand = undoScram + '; ' + (command % checksumOption) + ' ' + timeoutOption
+        # a file copied alone whose checksum is known is read once, to write it and compute its checksum together
+        self.catCommand = None
+        if self.verifyChecksum and command.startswith('gfal-copy') and cmd_exist("gfal-cat"):
+            self.catCommand = undoScram + '; gfal-cat -t '
+
+        self.journal = None
+        if not re.match(r"^[a-z]+://", self.options.destination):
+            self.journal = TransferJournal.TransferJournal(self.options.destination, self.logger)
+
+        self.logger.debug("Starting the transfers with %s parallel threads, up to %s files per command" % (nsubprocess, bulkSize))
+        scheduler = TransferScheduler(self.copyFiles, nsubprocess, maxRetries=MAX_RETRIES)
+        scheduler.start()
+        keybInt = False
+        try:
+            self.queueTransfers(scheduler, dicttocopy, bulkSize)
+            self.logger.info("Please wait")
+            scheduler.wait()
+        except KeyboardInterrupt:
+            self.logger.info("Keyboard interrupt, stopping the transfers")
+            scheduler.cancel()
+            keybInt = True
+
+        successfiles = dict((fileid, 'Successfully retrieved') for fileid, transfer in scheduler.transfers.items()
+                            if transfer.state == DONE)
+        failedfiles = dict((fileid, transfer.error) for fileid, transfer in scheduler.transfers.items()
+                           if transfer.state == FAILED and transfer.error)
+
+        self.logger.debug("Transfers tried again: %s" % scheduler.numRetries())
+        if keybInt or scheduler.count(FAILED):
+            self.logger.info("For more details about the errors please open the logfile")
+        if keybInt:
+            ## the transfers which were running have been killed
+            return [], []
+        elif len(successfiles) == 0:
+            self.logger.info("No file retrieved")
+        elif len(failedfiles) != 0:
+            self.logger.info(colors.GREEN+"Number of files successfully retrieved: %s" % len(successfiles)+colors.NORMAL)
+            self.logger.info(colors.RED+"Number of files failed to be retrieved: %s" % len(failedfiles)+colors.NORMAL)
+            #self.logger.debug("List of failed file and reason: %s" % failedfiles)
+        else:
+            self.logger.info("%sSuccess%s: All files successfully retrieved" % (colors.GREEN,colors.NORMAL))
 
-        # timeout = 20 + 240 + 60 #giving 1 extra minute: 5min20"
-        srmtimeout = 900 # default transfer timeout in case the file size is unknown: 15min
-        minsrmtimeout = 60 # timeout cannot be less then 1min
-        downspeed = float(250*1024) # default speed assumes a download of 250KB/s
-        mindownspeed = 20*1024.
-
-        manager = Manager()
-        successfiles = manager.dict()
-        failedfiles = manager.dict()
-
-
-        self.logger.debug("Starting ChildProcess with %s ChildProcess" % nsubprocess)
-        inputq, processarray = self.startchildproc(self.processWorker, nsubprocess, successfiles, failedfiles)
+        return successfiles , failedfiles
 
+    def queueTransfers(self, scheduler, dicttocopy, bulkSize=1):
+        """
+        Give the files to copy to the scheduler, the largest first, in batches of up to bulkSize
+        files with the same local directory and site, and one by one if the destination is a URL
+        or the size of the file is not known
+        """
+        toCopy = []
         for myfile in dicttocopy:
-            if downspeed < mindownspeed:
-                downspeed = mindownspeed
-
             fileid = myfile['pfn'].split('/')[-1]
 
             dirpath = os.path.join(self.options.destination, myfile['suffix'] if 'suffix' in myfile else '')
@@ -121,12 +175,21 @@ class remote_copy(SubCommand):
                 os.makedirs(dirpath)
             localFilename = os.path.join(dirpath,  str(fileid))
 
+            # with --checksum, a file recorded without checksum is verified below like one not in the journal
+            expectedAdler32 = _adler32(myfile) if self.verifyChecksum else None
+            if self.journal and self.journal.isDone(localFilename, myfile.get('size'), expectedAdler32):
+                self.logger.info("Skipping %s as it was already retrieved in %s" % (fileid, localFilename))
+                continue
+
             ##### Handling the "already existing file" use case
             if not url_input and os.path.isfile(localFilename):
                 size = os.path.getsize(localFilename)
+                # without the expected size, the journal tells whether an earlier transfer of the file did not finish
+                interrupted = 'size' not in myfile and self.journal and \
+                              self.journal.state(localFilename) in [TransferJournal.STARTED, TransferJournal.FAILED]
 
                 # delete the file if its size is zero or its size is not the expected size
-                if size == 0 or ('size' in myfile and myfile['size'] != size):
+                if size == 0 or ('size' in myfile and myfile['size'] != size) or interrupted:
                     try:
                         self.logger.info("Removing %s as it is not complete: current size %s, expected size %s" % (fileid, size, \
                                                                                 myfile['size'] if 'size' in myfile else 'unknown'))
@@ -134,201 +197,208 @@ class remote_copy(SubCommand):
                     except OSError as ex:
                         self.logger.info("%sError%s: Cannot remove the file because of: %s" % (colors.RED, colors.NORMAL, ex))
 
+            # a file copied without the journal, or recorded there without checksum, is checked once,
+            # then it is in the journal with its checksum
+            adler32 = None
+            if not url_input and os.path.isfile(localFilename) and self.verifyChecksum and _adler32(myfile):
+                adler32 = fileAdler32(localFilename)
+                if not sameAdler32(adler32, _adler32(myfile)):
+                    self.logger.info("Removing %s as its Adler32 checksum %s is not the expected %s" % (fileid, adler32, _adler32(myfile)))
+                    try:
+                        os.remove(localFilename)
+                    except OSError as ex:
+                        self.logger.info("%sError%s: Cannot remove the file because of: %s" % (colors.RED, colors.NORMAL, ex))
+
             # if the file still exists skip it
             if not url_input and os.path.isfile(localFilename):
                 self.logger.info("Skipping %s as file already exists in %s" % (fileid, localFilename))
+                if self.journal:
+                    self.journal.record(localFilename, TransferJournal.DONE, os.path.getsize(localFilename), adler32)
                 continue
 
-            ##### Creating the command
-            # better to execut grid commands in the pre-CMS environment
-            undoScram = "which scram >/dev/null 2>&1 && eval `scram unsetenv -sh`"
-
-            # timeout based on file size and download speed * 2
-            maxtime = srmtimeout if not 'size' in myfile or myfile['size'] == 0 else int(ceil(2*myfile['size']/downspeed))
-            localsrmtimeout = minsrmtimeout if maxtime < minsrmtimeout else maxtime # do not want a too short timeout
-            timeout = " --srm-timeout "
-            if cmd_exist("gfal-copy") and self.options.command not in ["LCG"]:
-                timeout = " -t "
-            cmd = undoScram + '; %s %s %s %%s' % (command, timeout + str(localsrmtimeout) + ' ', myfile['pfn'])
-            if url_input:
-                cmd = cmd % localFilename
+            destination = localFilename if url_input else "file://%s" % localFilename
+            site = myfile.get('pnn') or myfile['pfn'].split('/')[2]
+            # only the size tells whether each file of a batch was copied in full, see _isComplete
+            batchKey = None if url_input or not myfile.get('size') else (dirpath, site)
+            toCopy.append((batchKey, site, (fileid, (myfile, localFilename, destination), myfile.get('size') or 0)))
+
+        # the largest first, so that the last transfers to finish are short ones
+        toCopy.sort(key=lambda f: f[2][2], reverse=True)
+        groups = {}
+        batches = []  # (bytes, site, files)
+        for batchKey, site, file_ in toCopy:
+            if batchKey is None or bulkSize == 1:
+                batches.append((file_[2], site, [file_]))
             else:
-                cmd = cmd % ("file://%s" % localFilename)
-
-            self.logger.info("Placing file '%s' in retrieval queue " % fileid)
-            inputq.put((myfile, cmd))
-
-        self.logger.info("Please wait")
-
-        keybInt = self.stopchildproc(inputq, processarray, nsubprocess)
-
-        self.saveSubprocessesOut(failedfiles, keybInt)
-
-        if keybInt:
-            ## if ctrl-C was hit we wont find anything interesting in the subprocesses out
-            ## that means that successfiles and failedfiles will not be dict as normally expected
-            return [], []
-        elif len(successfiles) == 0:
-            self.logger.info("No file retrieved")
-        elif len(failedfiles) != 0:
-            self.logger.info(colors.GREEN+"Number of files successfully retrieved: %s" % len(successfiles)+colors.NORMAL)
-            self.logger.info(colors.RED+"Number of files failed to be retrieved: %s" % len(failedfiles)+colors.NORMAL)
-            #self.logger.debug("List of failed file and reason: %s" % failedfiles)
+                groups.setdefault(batchKey, []).append(file_)
+        for (_, site), files in groups.items():
+            batches.extend((sum(f[2] for f in batch), site, batch) for batch in packBatches(files, bulkSize))
+        batches.sort(key=lambda b: b[0], reverse=True)
+        for _, site, batch in batches:
+            for fileid, _, _ in batch:
+                self.logger.info("Placing file '%s' in retrieval queue " % fileid)
+            scheduler.submitBatch(batch, site)
+
+    def _verified(self, myfile, destination):
+        """ whether the copy of a file is compared with the checksum known by the server """
+        return bool(self.verifyChecksum and _adler32(myfile) and destination.startswith('file://'))
+
+    def copyFiles(self, scheduler, transfers):
+        """
+        Run the copy command of one file, or of a batch of files going to the same directory,
+        called by the TransferScheduler threads.
+        Returns the transfers which were copied, the error of the others is in transfer.error.
+        """
+        speed = scheduler.speed(transfers[0].site)
+        # files going to a URL can not be read here
+        verified = [transfer for transfer in transfers if self._verified(transfer.info[0], transfer.info[2])]
+        # a batch is checked by gfal-copy -K and once it is over, a single file while gfal-cat reads it
+        streamed = bool(self.catCommand and len(transfers) == 1 and verified)
+        if streamed:
+            # gfal-cat SOURCE, its output is written to the local file below
+            myfile = transfers[0].info[0]
+            command = "%s%s %s" % (self.catCommand, transferTimeout(transfers[0].size, speed), myfile['pfn'])
+        elif len(transfers) == 1:
+            myfile, localFilename, destination = transfers[0].info
+            command = "%s%s %s %s" % (self.checksumCommand, transferTimeout(transfers[0].size, speed), myfile['pfn'], destination)
         else:
-            self.logger.info("%sSuccess%s: All files successfully retrieved" % (colors.GREEN,colors.NORMAL))
+            # gfal-copy SOURCE... DIRECTORY, the timeout is for the whole command
+            timeout = sum(transferTimeout(transfer.size, speed) for transfer in transfers)
+            sources = ' '.join(transfer.info[0]['pfn'] for transfer in transfers)
+            destination = "file://%s/" % os.path.dirname(transfers[0].info[1])
+            command = "%s%s %s %s" % (self.checksumCommand, timeout, sources, destination)
+        for transfer in transfers:
+            self.logger.info("Retrieving %s " % transfer.fileid)
+            if self.journal:
+                self.journal.record(transfer.info[1], TransferJournal.STARTED)
+        self.logger.debug("Executing %s" % command)
+        checksums, corrupted = {}, []
+        if streamed:
+            with open(transfers[0].info[1], 'wb') as fd:
+                checksum = Adler32(output=fd)
+                stdout, stderr, returncode = scheduler.runCommand(transfers, command, output=checksum)
+            checksums[transfers[0].fileid] = checksum.hexdigest()
+        else:
+            stdout, stderr, returncode = scheduler.runCommand(transfers, command)
+        if scheduler.cancelled():
+            # the journal keeps these files as started, i.e. incomplete
+            return []
+        self.logger.debug("Finish executing for file(s) %s" % ', '.join(transfer.fileid for transfer in transfers))
+
+        if len(transfers) == 1:
+            copied = transfers if returncode == 0 else []
+        else:
+            # the exit code of gfal-copy only tells whether all files were copied, look at each of them
+            copied = [transfer for transfer in transfers if _isComplete(*transfer.info[:2])]
+        for transfer in copied:
+            if transfer not in verified:
+                continue
+            myfile, localFilename = transfer.info[:2]
+            if transfer.fileid not in checksums:
+                # just written, the file is normally still in the page cache
+                checksums[transfer.fileid] = fileAdler32(localFilename)
+            if not sameAdler32(checksums[transfer.fileid], _adler32(myfile)):
+                corrupted.append(transfer)
+        copied = [transfer for transfer in copied if transfer not in corrupted]
+        for transfer in transfers:
+            if transfer in copied:
+                self.logger.info("%sSuccess%s: Success in retrieving %s " % (colors.GREEN, colors.NORMAL, transfer.fileid))
+            if self.journal:
+                localFilename = transfer.info[1]
+                if transfer in copied and os.path.isfile(localFilename):
+                    self.journal.record(localFilename, TransferJournal.DONE, os.path.getsize(localFilename),
+                                        checksums.get(transfer.fileid))
+                else:
+                    self.journal.record(localFilename, TransferJournal.FAILED)
+        if len(copied) == len(transfers):
+            return copied
+
+        for transfer in transfers:
+            if transfer in copied:
+                continue
+            myfile, localFilename = transfer.info[:2]
+            self.logger.info("%sWarning%s: Failed retrieving %s" % (colors.RED, colors.NORMAL, transfer.fileid))
+            if transfer in corrupted:
+                transfer.error = "wrong Adler32 checksum %s, expected %s" % (checksums[transfer.fileid], _adler32(myfile))
+                self.logger.info(colors.RED + "\t %s" % transfer.error + colors.NORMAL)
+                try:
+                    os.remove(localFilename)
+                except OSError as ex:
+                    self.logger.debug("%sWarning%s: Cannot remove the file because of: %s" % (colors.RED, colors.NORMAL, ex))
+                if transfer.attempts <= scheduler.maxRetries:
+                    self.logger.info("Will try again to retrieve %s later" % transfer.fileid)
+                continue
+            # with several files, use the error messages about this one if there are any
+            ownLines = [line for line in stderr.split('\n') if transfer.fileid in line]
+            error = simpleOutputCheck('\n'.join(ownLines)) if len(transfers) > 1 and ownLines else simpleOutputCheck(stderr)
+            if len(error) > 0:
+                for x in error:
+                    self.logger.info(colors.RED +"\t %s" % x + colors.NORMAL)
+                transfer.error = str(error)
+            elif len(transfers) > 1:
+                transfer.error = "not copied, gfal-copy exit code %s" % returncode
+            transfer.retry = not isPermanentError(error)
+            if transfer.retry and transfer.attempts <= scheduler.maxRetries:
+                self.logger.info("Will try again to retrieve %s later" % transfer.fileid)
+            if os.path.isfile(localFilename) and os.path.getsize(localFilename) != myfile.get('size'):
+                self.logger.debug("File %s has the wrong size, deleting it" % transfer.fileid)
+                try:
+                    os.remove(localFilename)
+                except OSError as ex:
+                    self.logger.debug("%sWarning%s: Cannot remove the file because of: %s" % (colors.RED, colors.NORMAL, ex))
+        self.logger.debug("Full stderr follows:\n%s" % stderr)
 
-        return successfiles , failedfiles
+        if "timed out" in stderr or "timed out" in stdout:
+            self.logger.info("%sWarning%s: Failed due to connection timeout" % (colors.RED, colors.NORMAL ))
+            self.logger.info("Please use the '--wait=<#seconds>' option to increase the connection timeout")
 
-    def startchildproc(self, childprocess, nsubprocess, successfiles, failedfiles):
-        """
-        starting sub process and creating the queue
-        """
-        inputq  = multiprocessing.Queue()
-        subprocessarray = []
+        if "checksum" in stderr:
+            self.logger.info("%sWarning%s: as of 3.3.1510 CRAB3 is using an option to validate the checksum with lcg-cp/gfal-cp commands."
+                             " You might get false positives since for some site this is not working."
+                             " In that case please use the option --checksum=no"% (colors.RED, colors.NORMAL ))
 
-        for i in range(nsubprocess):
-            p = multiprocessing.Process(target = childprocess, args = (inputq, successfiles, failedfiles))
-            subprocessarray.append(p)
-            subprocessarray[i].start()
+        return copied
 
-        return inputq, subprocessarray
 
+def transferTimeout(size, speed):
+    """ seconds, twice the time needed to copy size bytes at speed bytes/second, within limits """
+    if not size:
+        return SRM_TIMEOUT
+    return max(MIN_SRM_TIMEOUT, int(ceil(2 * size / speed)))
 
-    def stopchildproc(self, inputq, processarray, nsubprocess):
-        """ Simply sending a STOP message to the sub process
-            Return True if ctrl-C has been hit
-        """
-        result = False #using variable instead of direct return to make pylint happy. See W0150
-        self.logger.debug("stopchildproc() method has been called")
-        try:
-            for _ in range(nsubprocess):
-                inputq.put(('-1', 'STOP'))
-        #except Exception, ex:
-        #   pass
-        finally:
-            # giving the time to the sub-process to exit
-            for process in processarray:
-                try:
-                    process.join()
-                except KeyboardInterrupt:
-                    self.logger.info("Master process keyboard interrupted while waiting")
-                    result = True
-        return result
-
-    def saveSubprocessesOut(self, failedfiles, keybInt):
-        """ Get the logfile produced by the subprocesses and put it into
-            the usual crab.log file
-        """
-        if os.path.isfile(self.remotecpLogile):
-            self.logger.debug("The output of the transfer subprocesses follows:")
-            with open(self.remotecpLogile) as fp:
-                for line in fp:
-                    self.logger.debug("\t" + line[:-1]) #-1 is to remove the newline at the end
 
-            os.remove(self.remotecpLogile)
+def packBatches(files, bulkSize):
+    """
+    Split (fileid, info, size) tuples, sorted by decreasing size, in the fewest batches of up to
+    bulkSize files, each time adding the file to the batch with the least bytes so far, so that
+    the batches take about the same time to copy
+    """
+    numBatches = int(ceil(len(files) / bulkSize))
+    batches = [[] for _ in range(numBatches)]
+    heap = [(0, i) for i in range(numBatches)]
+    for file_ in files:
+        numBytes, i = heapq.heappop(heap)
+        batches[i].append(file_)
+        if len(batches[i]) < bulkSize:
+            heapq.heappush(heap, (numBytes + file_[2], i))
+    return batches
 
-            if keybInt or failedfiles: # N.B. failed files cannot be read if keybInt
-                self.logger.info("For more details about the errors please open the logfile")
-        else:
-            self.logger.debug("Cannot find %s" % self.remotecpLogile)
 
-    def setSubprocessLog(self):
-        """ Set the logger for the subprocess workers so that everything that
-            is debug get logged to a file, and everything that is info get logged
-            to both screen and file.
+def isPermanentError(error):
+    """ whether the errors found by simpleOutputCheck mean that trying again would not help """
+    permanent = ["no such file", "does not exist", "not found", "permission", "file exists",
+                 "unknown option", "unrecognized option", "invalid option"]
+    return any(text in line for line in error for text in permanent)
 
-            See https://docs.python.org/2/howto/logging-cookbook.html#logging-to-a-single-file-from-multiple-processes
-            for the reason we need to do that.
 
-            The file will be put into the "main" crab.log file and removed by
-            the master process by saveSubprocessesOut
-        """
-        logger = logging.getLogger('remotecopy')
-        logger.setLevel(logging.DEBUG)
-        formatter = logging.Formatter('%(levelname)s %(asctime)s: \t %(message)s')
-        consolehandler = logging.StreamHandler()
-        consolehandler.setLevel(logging.INFO) #            consolehandler.setFormatter(formatter)
-        logger.addHandler(consolehandler)
-        filehandler = logging.FileHandler(self.remotecpLogile)
-        filehandler.setFormatter(formatter)
-        filehandler.setLevel(logging.DEBUG)
-        filehandler.addFilter(logfilter())
-        logger.addHandler(filehandler)
-        return logger
-
-
-    def processWorker(self, input_, successfiles, failedfiles):
-        """
-        _processWorker_
+def _adler32(myfile):
+    """ the adler32 checksum of a file from the server, None if not known """
+    return (myfile.get('checksum') or {}).get('adler32')
 
-        Runs a subprocessed command.
-        """
-        logger = self.setSubprocessLog()
-        # Get this started
-        while True:
-            try:
-                myfile, work = input_.get()
-            except (EOFError, IOError):
-                crashMessage = "Hit EOF/IO in getting new work\n"
-                crashMessage += "Assuming this is a graceful break attempt."
-                print(crashMessage)
-                break
-
-            if work == 'STOP':
-                break
-            else:
-                fileid = myfile['pfn'].split('/')[-1]
-                dirpath = os.path.join(self.options.destination, myfile['suffix'] if 'suffix' in myfile else '')
-                url_input = bool(re.match(r"^[a-z]+://", dirpath))
-                if not os.path.isdir(dirpath) and not url_input:
-                    os.makedirs(dirpath)
-                localFilename = os.path.join(dirpath,  str(fileid))
-                command = work
-
-            logger.info("Retrieving %s " % fileid)
-            logger.debug("Executing %s" % command)
-            try:
-                stdout, stderr, returncode = execute_command(command=command)
-            except KeyboardInterrupt:
-                logger.info("Subprocess exit due to keyboard interrupt")
-                break
-            error = simpleOutputCheck(stderr)
-
-            logger.debug("Finish executing for file %s" % fileid)
-
-            if returncode != 0:
-                logger.info("%sWarning%s: Failed retrieving %s" % (colors.RED, colors.NORMAL, fileid))
-                #logger.debug(colors.RED +"Stderr: %s " %stderr+ colors.NORMAL)
-                if len(error) > 0:
-                    for x in error:
-                        logger.info(colors.RED +"\t %s" % x + colors.NORMAL)
-                    failedfiles[fileid] = str(error)
-                logger.debug("Full stderr follows:\n%s" % stderr)
-
-                if "timed out" in stderr or "timed out" in stdout:
-                    logger.info("%sWarning%s: Failed due to connection timeout" % (colors.RED, colors.NORMAL ))
-                    logger.info("Please use the '--wait=<#seconds>' option to increase the connection timeout")
-
-                if "checksum" in stderr:
-                    logger.info("%sWarning%s: as of 3.3.1510 CRAB3 is using an option to validate the checksum with lcg-cp/gfal-cp commands."
-                                " You might get false positives since for some site this is not working."
-                                " In that case please use the option --checksum=no"% (colors.RED, colors.NORMAL ))
-
-                if os.path.isfile(localFilename) and os.path.getsize(localFilename) != myfile['size']:
-                    logger.debug("File %s has the wrong size, deleting it" % fileid)
-                    try:
-                        os.remove(localFilename)
-                    except OSError as ex:
-                        logger.debug("%sWarning%s: Cannot remove the file because of: %s" % (colors.RED, colors.NORMAL, ex))
-                try:
-                    time.sleep(60)
-                except KeyboardInterrupt:
-                    logger.info("Subprocess exit due to keyboard interrupt")
-                    break
-            else:
-                logger.info("%sSuccess%s: Success in retrieving %s " % (colors.GREEN, colors.NORMAL, fileid))
-                successfiles[fileid] = 'Successfully retrieved'
-        return
+
+def _isComplete(myfile, localFilename):
+    """ whether the local copy of a file of known size is there with this size """
+    return os.path.isfile(localFilename) and os.path.getsize(localFilename) == myfile['size']
 
 
 def simpleOutputCheck(outlines):
@@ -11,7 +11,7 @@ if sys.version_info < (3, 0):
 from CRABClient.Commands.SubCommand import SubCommand
 from CRABClient.ClientExceptions import ConfigurationException
 from CRABClient.UserUtilities import getMutedStatusInfo, getColumn
-from CRABClient.ClientUtilities import validateJobids, colors
+from CRABClient.ClientUtilities import validateJobids, colors, getTaskDBInfo, invalidateTaskDBInfo, JobidIndex
 
 class resubmit(SubCommand):
     """
@@ -70,6 +70,7 @@ class resubmit(SubCommand):
         configreq_encoded = self._encodeRequest(configreq)
 
         dictresult, _, _ = self.crabserver.post(api=self.defaultApi, data=configreq_encoded)
+        invalidateTaskDBInfo(self.requestarea)
         self.logger.debug("Result: %s" % (dictresult))
         self.logger.info("Resubmit request sent to the server.")
         if dictresult['result'][0]['result'] != 'ok':
@@ -123,20 +124,11 @@ class resubmit(SubCommand):
                 return False
             return True
 
-        # Build a dictionary from the jobList
-        jobStatusDict = {}
-        for jobStatus, jobId in jobList:
-            if consider(jobId):
-                jobStatusDict[jobId] = jobStatus
-
         failedJobStatus = 'failed'
 
-        possibleToResubmitJobIds = []
-        for jobStatus, jobId in jobList:
-            if jobStatus == failedJobStatus and consider(jobId):
-                possibleToResubmitJobIds.append(jobId)
+        possibleToResubmitJobIds = [jobId for jobStatus, jobId in jobList
+                                    if jobStatus == failedJobStatus and consider(jobId)]
 
-        allowedJobStates = [failedJobStatus]
         if self.jobids:
             # Automatic splitting does not work with lists... probe- and
             # tail-job ids have a '-' in them, so re-split the joblist.
@@ -145,14 +137,12 @@ class resubmit(SubCommand):
                 self.jobids = [str(jobid) for (_, jobid) in jobidstuple]
             msg = "Requesting resubmission of jobs %s in task %s" % (self.jobids, self.cachedinfo['RequestName'])
             self.logger.debug(msg)
-            # Go through the jobids and check if it's possible to resubmit them
-            for jobId in self.jobids:
-                if (jobId not in jobStatusDict) or (jobStatusDict[jobId] not in allowedJobStates):
-                    possibleAndWantedJobIds = list(set(possibleToResubmitJobIds) & set(self.jobids))
-                    notPossibleAndWantedJobIds = list(set(self.jobids) - set(possibleAndWantedJobIds))
-                    msg = "Not possible to resubmit the following jobs:\n%s\n" % notPossibleAndWantedJobIds
-                    msg += "Only jobs in status %s can be resubmitted. " % failedJobStatus
-                    raise ConfigurationException(msg)
+            # Check if it's possible to resubmit all the jobids
+            notPossibleAndWantedJobIds = JobidIndex(possibleToResubmitJobIds).missing(self.jobids)
+            if notPossibleAndWantedJobIds:
+                msg = "Not possible to resubmit the following jobs:\n%s\n" % notPossibleAndWantedJobIds
+                msg += "Only jobs in status %s can be resubmitted. " % failedJobStatus
+                raise ConfigurationException(msg)
             return self.jobids
         else:
             msg = "Requesting resubmission of failed jobs in task %s" % (self.cachedinfo['RequestName'])
@@ -244,7 +234,8 @@ class resubmit(SubCommand):
         """
         SubCommand.validateOptions(self)
 
-        crabDBInfo, _, _ = self.crabserver.get(api='task', data={'subresource': 'search', 'workflow': self.cachedinfo['RequestName']})
+        crabDBInfo, _, _ = getTaskDBInfo(self.crabserver, self.cachedinfo['RequestName'], self.requestarea,
+                                         columns=['tm_split_algo'], logger=self.logger)
         self.splitting = getColumn(crabDBInfo, 'tm_split_algo')
 
         if self.options.publication:
@@ -4,31 +4,57 @@ from __future__ import print_function
 
 import os
 import pickle
+import shutil
+import logging
 import sys
 import math
 import json
 import time
 import calendar
+import heapq
+import hashlib
 import tempfile
 from ast import literal_eval
 from datetime import datetime
-from functools import cmp_to_key
+from operator import itemgetter
 
 if sys.version_info >= (3, 0):
     from urllib.parse import quote  # pylint: disable=E0611
 if sys.version_info < (3, 0):
     from urllib import quote
 
-from CRABClient.ClientUtilities import (colors, getRucioClientFromLFN, validateJobids, compareJobids)
-from CRABClient.ClientUtilities import PKL_R_MODE
-from CRABClient.UserUtilities import curlGetFileFromURL, getColumn
+from CRABClient.ClientUtilities import (colors, getRucioClientFromLFN, validateJobids, jobidSortKey, JobidIndex)
+from CRABClient.ClientUtilities import PKL_R_MODE, PKL_W_MODE, FILECACHE_DIR, getTaskDBInfo, TaskDBRow, TableWriter
+from CRABClient.ClientUtilities import STATUS_SNAPSHOT_DIR
+from CRABClient.ClientUtilities import invalidateTaskDBInfo, BackgroundCall
+from CRABClient.RestInterfaces import clearRequestMemo
+from CRABClient.UserUtilities import curlGetFileFromURL, linkCachedFile
 from CRABClient.Commands.SubCommand import SubCommand
 from CRABClient.ClientExceptions import ConfigurationException
 from CRABClient.ClientMapping import parametersMapping
+from CRABClient.Timing import timedPhase
+from CRABClient.StatusSummary import StatusSummary, translateJobStatus, percentiles, PERCENTILES
+from CRABClient.JobStates import JobStates
+from CRABClient.StatusExport import EXPORT_FORMATS, EXPORT_FIELDS, DEFAULT_EXPORT_FIELDS, parseExportFields, exportStatus
+from CRABClient.ErrorClusters import ErrorClusters, TOP_CLUSTERS, jobidRanges
 
 from ServerUtilities import (getEpochFromDBTime, TASKDBSTATUSES_TMP, TASKLIFETIME,
                              FEEDBACKMAIL, getProxiedWebDir, isEnoughRucioQuota)
 
+NO_WEBDIR_MSG = "Schedd has not reported back the webdir (yet)"
+
+# files of the status snapshot in STATUS_SNAPSHOT_DIR, see saveSnapshot
+SNAPSHOT_INFO = 'info.pkl'
+SNAPSHOT_STATUS_CACHE = 'status_cache.pkl'
+SNAPSHOT_NEW_STATUS_CACHE = 'status_cache.pkl.new'
+
+# crab status --watch: seconds between two looks at the status_cache, and DAG states after which it stops
+WATCH_MIN_INTERVAL = 60
+WATCH_MAX_INTERVAL = 900
+WATCH_FINAL_DAG_STATUSES = ['COMPLETED', 'FAILED', 'KILLED']
+# task states in which the task may still reach the schedd
+WATCH_WAIT_STATUSES = ['NEW', 'HOLDING', 'QUEUED', 'SUBMITTED']
+
 PUBLICATION_STATES = {
     'not_published': 'idle',
     'publication_failed': 'failed',
@@ -46,29 +72,63 @@ class status(SubCommand):
     def __init__(self, logger, cmdargs=None):
         self.jobids = None
         self.proxiedWebDir = None
+        self.fileCacheDir = None
         self.indentation = '\t\t'
+        # what the last status printed, used by --watch
+        self.summary = None
+        self.dagStatus = None
+        self.statusCacheDigest = None
+        # fields written by --export, set by validateOptions
+        self.exportFields = DEFAULT_EXPORT_FIELDS
+        # name: BackgroundCall started by showStatus, see _fetched
+        self.prefetched = {}
+        # name: what _fetched returned, saved in the status snapshot
+        self.fetchedResults = {}
+        # the snapshot which crab status --offline/--staleok prints, see loadSnapshot
+        self.snapshot = None
+        # set by SubCommand, unless the servers are not contacted
+        self.rucio = None
         SubCommand.__init__(self, logger, cmdargs)
 
     def __call__(self):
+        if self.options.offline or self.options.staleok:
+            return self.offlineStatus()
+        if self.options.watch:
+            return self.watch()
+        return self.showStatus()
+
+    def worksOffline(self):
+        return bool(self.options.offline or self.options.staleok)
+
+    def showStatus(self):
+        """ print the status of the task once, this is crab status without --watch.
+            With self.snapshot set, print it instead of what is on the servers.
+        """
         # Get all of the columns from the database for a certain task
         taskname = self.cachedinfo['RequestName']
-        server = self.crabserver
-        crabDBInfo, _, _ = server.get(api='task', data={'subresource':'search', 'workflow':taskname})
-        self.logger.debug("Got information from server oracle database: %s", crabDBInfo)
+        # files from the schedd webdir are kept here and only downloaded again when modified
+        self.fileCacheDir = os.path.join(self.requestarea, FILECACHE_DIR)
+        if self.snapshot is None:
+            dictresult, _, _ = getTaskDBInfo(self.crabserver, taskname, self.requestarea, logger=self.logger, ttl=0)
+        else:
+            dictresult = self.snapshot['dictresult']
+        self.logger.debug("Got information from server oracle database: %s", dictresult)
+        # many columns are looked up below, index them by name once
+        crabDBInfo = TaskDBRow(dictresult)
 
         # Until the task lands on a schedd we'll show the status from the DB
-        dbStatus = getColumn(crabDBInfo, 'tm_task_status')
-
-        user = getColumn(crabDBInfo, 'tm_username')
-        webdir = getColumn(crabDBInfo, 'tm_user_webdir')
-        rootDagId = getColumn(crabDBInfo, 'clusterid') #that's the condor id from the TW
-        publicationEnabled = True if getColumn(crabDBInfo, 'tm_publication') == 'T' else False
-        maxMemory = int(getColumn(crabDBInfo, 'tm_maxmemory'))
-        maxJobRuntime = int(getColumn(crabDBInfo, 'tm_maxjobruntime'))
-        numCores = int(getColumn(crabDBInfo, 'tm_numcores'))
-        splitting = getColumn(crabDBInfo, 'tm_split_algo')
-        outputLfn = getColumn(crabDBInfo, 'tm_output_lfn')
-        outputDestinationSite = getColumn(crabDBInfo, 'tm_asyncdest')
+        dbStatus = crabDBInfo['tm_task_status']
+
+        user = crabDBInfo['tm_username']
+        webdir = crabDBInfo['tm_user_webdir']
+        rootDagId = crabDBInfo['clusterid'] #that's the condor id from the TW
+        publicationEnabled = True if crabDBInfo['tm_publication'] == 'T' else False
+        maxMemory = int(crabDBInfo['tm_maxmemory'])
+        maxJobRuntime = int(crabDBInfo['tm_maxjobruntime'])
+        numCores = int(crabDBInfo['tm_numcores'])
+        splitting = crabDBInfo['tm_split_algo']
+        outputLfn = crabDBInfo['tm_output_lfn']
+        outputDestinationSite = crabDBInfo['tm_asyncdest']
 
         #Print information from the database
         self.printTaskInfo(crabDBInfo, user)
@@ -80,7 +140,7 @@ class status(SubCommand):
         self.logger.debug("The CRAB server submitted your task to the Grid scheduler (cluster ID: %s)" % rootDagId)
 
         # check if task is too old to get information from WEB_DIR
-        startTime = getColumn(crabDBInfo, 'tm_start_time')
+        startTime = crabDBInfo['tm_start_time']
         # from "YYYY-MM-DD HH:MM:SS.xxxxxx" to struct_time to seconds since Epoch
         struct = time.strptime(startTime, '%Y-%m-%d %H:%M:%S.%f')
         submissionTime = calendar.timegm(struct)
@@ -99,14 +159,26 @@ class status(SubCommand):
             # if the dag is submitted and the webdir is not there we have to wait that AdjustSites runs
             # and uploads the webdir location to the server
             self.logger.info("Waiting for the Grid scheduler to bootstrap your task")
-            failureMsg = "Schedd has not reported back the webdir (yet)"
+            failureMsg = NO_WEBDIR_MSG
             self.logger.debug(failureMsg)
             combinedStatus = "UNKNOWN"
             return self.makeStatusReturnDict(crabDBInfo, combinedStatus, statusFailureMsg=failureMsg)
 
         self.logger.debug("Webdir is located at %s", webdir)
 
-        proxiedWebDir = getProxiedWebDir(crabserver=self.crabserver, task=taskname, logFunction=self.logger.debug)
+        # the publication status, the Rucio quota, the webdir files do not depend on each other:
+        # fetch them at the same time, the views below wait for the result when printing it
+        usingRucio = outputLfn.startswith('/store/user/rucio') or outputLfn.startswith('/store/group/rucio')
+        self.prefetched = {}
+        self.fetchedResults = {}
+        if self.snapshot is None:
+            if publicationEnabled:
+                self.prefetched['publication'] = BackgroundCall(self.publicationStatus, taskname, user)
+            if usingRucio:
+                self.prefetched['rucioQuota'] = BackgroundCall(self.rucioQuota, outputLfn, outputDestinationSite)
+            proxiedWebDir = getProxiedWebDir(crabserver=self.crabserver, task=taskname, logFunction=self.logger.debug)
+        else:
+            proxiedWebDir = self.snapshot['proxiedWebDir']
 
         if not proxiedWebDir:
             msg = "Failed to get the proxied webdir from CRABServer. "
@@ -116,20 +188,17 @@ class status(SubCommand):
             proxiedWebDir = webdir
         self.logger.debug("Proxied webdir is located at %s", proxiedWebDir)
         self.proxiedWebDir = proxiedWebDir
+        if splitting == 'Automatic' and self.snapshot is None:
+            self.prefetched['probeJobsLog'] = BackgroundCall(self.fetchProbeJobsLog)
 
-        # Download status_cache file, prepare a temp file name
-        fh, local_status_cache = tempfile.mkstemp(dir='/tmp', prefix='crab_status-cache-', suffix='.pkl')
-        os.close(fh)  # no need for a handle, curl will write using file name
         url = self.proxiedWebDir + "/status_cache.pkl"
-        self.logger.debug("Retrieving 'status_cache' file from %s", url)
         try:
-            httpCode = curlGetFileFromURL(url, local_status_cache,
-                                                 self.proxyfilename, logger=self.logger)
-            if httpCode != 200:
-                raise Exception("failed to retrieve %s" % url)
-            with open(local_status_cache, PKL_R_MODE) as fp:
-                statusCache = pickle.load(fp)
-            os.remove(local_status_cache)
+            if self.snapshot is None:
+                statusCache, self.statusCacheDigest = self.fetchStatusCache(keepAs=self._snapshotPath(SNAPSHOT_NEW_STATUS_CACHE))
+            else:
+                url = self._snapshotPath(SNAPSHOT_STATUS_CACHE)
+                with open(url, PKL_R_MODE) as fp:
+                    statusCache = pickle.load(fp)
             if 'bootstrapTime' in statusCache :
                 statusCacheInfo = None
                 bootstrapMsg = "Task bootstrapped at %s" % statusCache['bootstrapTime']['date']
@@ -138,7 +207,8 @@ class status(SubCommand):
                 bootstrapMsg += ". %d seconds ago" % bootingTime
             else:
                 bootstrapMsg = None
-                statusCacheInfo = statusCache['nodes']
+                with timedPhase('status: convert status_cache to job states'):
+                    statusCacheInfo = JobStates.fromNodes(statusCache['nodes'])
         except Exception as e:  # pylint: disable=unused-variable
             self.logger.error("%s not found or corrupted", url)
             return {'commandStatus': 'FAILED'}
@@ -167,7 +237,6 @@ class status(SubCommand):
         self.logger.info(msg)
         #combinedStatus = dagStatus = self.printDAGStatus(dbStatus, statusCacheInfo)
         combinedStatus = dagStatus
-        usingRucio = outputLfn.startswith('/store/user/rucio') or outputLfn.startswith('/store/group/rucio')
 
         if dagStatus != 'COMPLETED' and usingRucio:
             self.printRucioQuotaInfo(outputLfn, outputDestinationSite)
@@ -175,43 +244,290 @@ class status(SubCommand):
         container = None
         if usingRucio:
             containerInfo = {
-                'transferContainerName': getColumn(crabDBInfo, 'tm_transfer_container'),
-                'transferRuleID': getColumn(crabDBInfo, 'tm_transfer_rule'),
-                'publishRuleID': getColumn(crabDBInfo, 'tm_publish_rule'),
+                'transferContainerName': crabDBInfo['tm_transfer_container'],
+                'transferRuleID': crabDBInfo['tm_transfer_rule'],
+                'publishRuleID': crabDBInfo['tm_publish_rule'],
             }
             if containerInfo['transferRuleID']:
                 container = containerInfo
 
-        shortResult = self.printOverview(statusCacheInfo, automaticSplitt, container)
+        # all the views below are computed from one walk over the jobs
+        with timedPhase('status: aggregate job information'):
+            summary = StatusSummary(statusCacheInfo, automaticSplitt, numCores)
+        shortResult = self.printOverview(summary, container)
         pubStatus = self.printPublication(publicationEnabled, shortResult, taskname, user, crabDBInfo, container=container)
-        self.printErrors(statusCacheInfo, automaticSplitt)
+        self.printErrors(summary)
 
         if not self.options.long and not self.options.sort:  # already printed for these options
-            self.printDetails(statusCacheInfo, automaticSplitt, self.jobids, True, maxMemory, maxJobRuntime, numCores)
+            self.printDetails(summary, self.jobids, True, maxMemory, maxJobRuntime, numCores)
 
         if self.options.summary:
-            self.printSummary(statusCacheInfo)
+            self.printSummary(summary)
+        # If user correctly passed some jobid CSVs to use in the status --long, self.jobids
+        # will be a list of strings already parsed from the input by the validateOptions()
+        if self.jobids:
+            # Check the format of the jobids option.
+            if self.options.jobids:
+                jobidstuple = validateJobids(self.options.jobids, not automaticSplitt)
+                self.jobids = [str(jobid) for (_, jobid) in jobidstuple]
+            self.checkUserJobids(statusCacheInfo, self.jobids)
         if self.options.long or self.options.sort:
-            # If user correctly passed some jobid CSVs to use in the status --long, self.jobids
-            # will be a list of strings already parsed from the input by the validateOptions()
-            if self.jobids:
-                # Check the format of the jobids option.
-                if self.options.jobids:
-                    jobidstuple = validateJobids(self.options.jobids, not automaticSplitt)
-                    self.jobids = [str(jobid) for (_, jobid) in jobidstuple]
-                self.checkUserJobids(statusCacheInfo, self.jobids)
-            sortdict = self.printDetails(statusCacheInfo, automaticSplitt, self.jobids, not self.options.long, maxMemory, maxJobRuntime, numCores)
+            self.printDetails(summary, self.jobids, not self.options.long, maxMemory, maxJobRuntime, numCores)
             if self.options.sort:
-                self.printSort(sortdict, self.options.sort)
+                self.printSort(summary, self.jobids, self.options.sort)
         if self.options.json:
-            self.logger.info(json.dumps(statusCacheInfo))
+            self.logger.info(json.dumps(statusCacheInfo.toDict()))
+        if self.options.export:
+            self.exportJobs(summary, self.jobids)
 
         statusDict = self.makeStatusReturnDict(crabDBInfo, combinedStatus, dagStatus,
                                                '', shortResult, statusCacheInfo,
                                                pubStatus)
+        self.summary = summary
+        self.dagStatus = dagStatus
+        if self.snapshot is None:
+            self.saveSnapshot(dictresult, self.fetchedResults)
+
+        return statusDict
+
+    def fetchStatusCache(self, previousDigest=None, proxiedWebDir=None, keepAs=None):
+        """ Download the status_cache of the task from the schedd webdir and unpickle it.
+            Returns (statusCache, digest of the file). statusCache is None if the digest is
+            previousDigest, i.e. the file did not change since it was last read.
+            Raises an exception if the file can not be retrieved.
+            proxiedWebDir: where to download from, default self.proxiedWebDir
+            keepAs: if given, the downloaded file is kept there instead of being removed, as a hard link
+                    to its copy in the file cache when there is one
+        """
+        # Download status_cache file, prepare a temp file name
+        fh, local_status_cache = tempfile.mkstemp(dir='/tmp', prefix='crab_status-cache-', suffix='.pkl')
+        os.close(fh)  # no need for a handle, curl will write using file name
+        url = (proxiedWebDir or self.proxiedWebDir) + "/status_cache.pkl"
+        self.logger.debug("Retrieving 'status_cache' file from %s", url)
+        statusCache = None
+        try:
+            httpCode = curlGetFileFromURL(url, local_status_cache, self.proxyfilename,
+                                          logger=self.logger, cacheDir=self.fileCacheDir)
+            if httpCode != 200:
+                raise Exception("failed to retrieve %s" % url)
+            with open(local_status_cache, PKL_R_MODE) as fp:
+                digest = hashlib.sha1()
+                for chunk in iter(lambda: fp.read(1024*1024), b''):
+                    digest.update(chunk)
+                digest = digest.hexdigest()
+                if digest == previousDigest:
+                    return None, digest
+                fp.seek(0)
+                with timedPhase('status: unpickle status_cache'):
+                    statusCache = pickle.load(fp)
+        finally:
+            if keepAs and statusCache is not None and \
+               not linkCachedFile(self.fileCacheDir, url, local_status_cache, keepAs):
+                shutil.move(local_status_cache, keepAs)
+            if os.path.exists(local_status_cache):
+                os.remove(local_status_cache)
+        return statusCache, digest
+
+    def _snapshotPath(self, name):
+        """ path of a file of the status snapshot in the project directory """
+        snapshotDir = os.path.join(self.requestarea, STATUS_SNAPSHOT_DIR)
+        if not os.path.isdir(snapshotDir):
+            os.makedirs(snapshotDir)
+        return os.path.join(snapshotDir, name)
+
+    def saveSnapshot(self, dictresult, fetched):
+        """ Keep the status_cache just downloaded (see fetchStatusCache keepAs), with the task
+            information and the other results got from the servers, for crab status --offline.
+              dictresult: the answer of the server to the task search
+              fetched: the results of _fetched
+        """
+        snapshot = {'taskname': self.cachedinfo['RequestName'], 'time': time.time(), 'dictresult': dictresult,
+                    'proxiedWebDir': self.proxiedWebDir, 'fetched': fetched}
+        try:
+            os.rename(self._snapshotPath(SNAPSHOT_NEW_STATUS_CACHE), self._snapshotPath(SNAPSHOT_STATUS_CACHE))
+            # written last and moved in place, so that the snapshot is never older than its status_cache
+            infoFile = self._snapshotPath(SNAPSHOT_INFO)
+            tmpname = "%s.%d" % (infoFile, os.getpid())
+            with open(tmpname, PKL_W_MODE) as fd:
+                pickle.dump(snapshot, fd, protocol=0)
+            os.rename(tmpname, infoFile)
+        except (IOError, OSError) as ex:
+            # the snapshot is only a convenience
+            self.logger.debug("Could not save the status snapshot: %s", ex)
+
+    def loadSnapshot(self):
+        """ the snapshot saved by the last successful crab status of this task, None if there is none """
+        infoFile = os.path.join(self.requestarea, STATUS_SNAPSHOT_DIR, SNAPSHOT_INFO)
+        try:
+            with open(infoFile, PKL_R_MODE) as fd:
+                snapshot = pickle.load(fd)
+        except Exception as ex:
+            self.logger.debug("No usable status snapshot %s: %s", infoFile, ex)
+            return None
+        if snapshot.get('taskname') != self.cachedinfo['RequestName']:
+            return None
+        return snapshot
+
+    def offlineStatus(self):
+        """ crab status --offline: print the status saved by the last crab status, without contacting the servers.
+            crab status --staleok: the same, while the current status is fetched in the background,
+            then print the jobs which changed state since and update the snapshot.
+        """
+        self.snapshot = self.loadSnapshot()
+        self.fileCacheDir = os.path.join(self.requestarea, FILECACHE_DIR)
+        # the command setup did not look at the server, still it is the one of the task (see loadLocalCache)
+        port = ':' + self.cachedinfo['Port'] if self.cachedinfo['Port'] else ''
+        self.instance = self.cachedinfo['instance']
+        self.serverurl = self.cachedinfo['Server'] + port
+        if self.snapshot is None:
+            if self.options.offline:
+                msg = "No status of this task is saved in the project directory yet."
+                msg += " Run crab status without --offline first."
+                self.logger.error(msg)
+                return {'commandStatus': 'FAILED'}
+            self.logger.info("No status of this task is saved in the project directory yet, asking the server.")
+            self.connectServer()
+            return self.showStatus()
+
+        refresh = None
+        if self.options.staleok:
+            self.connectServer()
+            refresh = BackgroundCall(self.fetchCurrentStatus)
+        snapshotTime = self.snapshot['time']
+        msg = "%sStatus as of %s (%s ago)%s, as saved in the project directory by crab status" % \
+              (colors.RED, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshotTime)),
+               _formatAge(time.time() - snapshotTime), colors.NORMAL)
+        self.logger.info(msg)
+        statusDict = self.showStatus()
+        statusDict['snapshotTime'] = snapshotTime
+        if refresh is None or self.summary is None:
+            return statusDict
+
+        self.logger.info("\nGetting the current status from the server (Ctrl-C to stop)")
+        try:
+            dictresult, proxiedWebDir, statusCache = refresh.result()
+            jobStates = JobStates.fromNodes(statusCache['nodes'])
+        except KeyboardInterrupt:
+            self.logger.info("")
+            return statusDict
+        except Exception as ex:
+            self.logger.warning("Could not get the current status, the status above is still the saved one: %s", ex)
+            return statusDict
+        summary = StatusSummary(jobStates, self.summary.automaticSplitt, self.summary.numCores)
+        dagStatus = statusCache['overallDagStatus']
+        if not self.printChanges(self.summary, summary, self.dagStatus, dagStatus):
+            self.logger.info("No change since the saved status.")
+        self.summary, self.dagStatus = summary, dagStatus
+        self.proxiedWebDir = proxiedWebDir
+        # publication and Rucio quota are not asked again, keep the saved ones
+        self.saveSnapshot(dictresult, self.snapshot['fetched'])
+        statusDict.update({'status': dagStatus, 'dagStatus': dagStatus, 'jobs': jobStates.toDict(),
+                           'jobsPerStatus': summary.jobsPerStatus, 'jobList': summary.jobList,
+                           'snapshotTime': None})
+        return statusDict
+
+    def connectServer(self):
+        """ with --offline/--staleok the command setup did not check the proxy nor connect to the server, do it now """
+        self.checkVomsProxy()
+        self.crabserver = self.createCRABServer()
 
+    def fetchCurrentStatus(self):
+        """ for --staleok, run in the background: (task search answer, proxied webdir, status_cache)
+            as they are now on the servers. The status_cache file is kept for saveSnapshot.
+        """
+        taskname = self.cachedinfo['RequestName']
+        dictresult, _, _ = getTaskDBInfo(self.crabserver, taskname, self.requestarea, logger=self.logger, ttl=0)
+        webdir = TaskDBRow(dictresult)['tm_user_webdir']
+        if not webdir:
+            raise Exception(NO_WEBDIR_MSG)
+        proxiedWebDir = getProxiedWebDir(crabserver=self.crabserver, task=taskname, logFunction=self.logger.debug) or webdir
+        statusCache, _ = self.fetchStatusCache(proxiedWebDir=proxiedWebDir, keepAs=self._snapshotPath(SNAPSHOT_NEW_STATUS_CACHE))
+        if 'nodes' not in statusCache:
+            raise Exception("no job information in the status_cache")
+        return dictresult, proxiedWebDir, statusCache
+
+    def watch(self):
+        """ crab status --watch: print the status once, then keep looking at the status_cache
+            and print only the jobs which changed state, until the DAG is done or Ctrl-C.
+            Task information, proxy and webdir are looked up only once. The status_cache is
+            downloaded only if modified (see curlGetFileFromURL cacheDir) and only parsed if
+            its content changed. The time between two looks halves while many jobs change
+            state and doubles while nothing happens, between --refresh and WATCH_MAX_INTERVAL seconds.
+        """
+        interval = self.options.refresh
+        statusDict = self.showStatus()
+        try:
+            # until the task is on the schedd there is no status_cache to look at
+            while self.summary is None:
+                if statusDict.get('commandStatus') != 'SUCCESS':
+                    return statusDict
+                if statusDict['status'] not in WATCH_WAIT_STATUSES and statusDict['statusFailureMsg'] != NO_WEBDIR_MSG:
+                    return statusDict
+                self.logger.info("\nWill look again in %d seconds (Ctrl-C to stop)", interval)
+                time.sleep(interval)
+                # the task information is expected to change, do not reuse what was read before
+                clearRequestMemo()
+                invalidateTaskDBInfo(self.requestarea)
+                statusDict = self.showStatus()
+
+            summary = self.summary
+            dagStatus = self.dagStatus
+            while dagStatus not in WATCH_FINAL_DAG_STATUSES:
+                self.logger.debug("Will look at the status_cache again in %d seconds", interval)
+                time.sleep(interval)
+                try:
+                    statusCache, digest = self.fetchStatusCache(self.statusCacheDigest)
+                except Exception as ex:
+                    self.logger.warning("Could not get the status of the jobs, will retry: %s", ex)
+                    interval = min(interval * 2, WATCH_MAX_INTERVAL)
+                    continue
+                if statusCache is None or 'bootstrapTime' in statusCache:
+                    self.logger.debug("status_cache did not change")
+                    interval = min(interval * 2, WATCH_MAX_INTERVAL)
+                    continue
+                self.statusCacheDigest = digest
+                jobStates = JobStates.fromNodes(statusCache['nodes'])
+                newSummary = StatusSummary(jobStates, summary.automaticSplitt, summary.numCores)
+                newDagStatus = statusCache['overallDagStatus']
+                numChanged = self.printChanges(summary, newSummary, dagStatus, newDagStatus)
+                if not numChanged:
+                    interval = min(interval * 2, WATCH_MAX_INTERVAL)
+                elif numChanged * 100 >= newSummary.numJobs:
+                    # more than 1% of the jobs moved, look more often
+                    interval = max(interval // 2, self.options.refresh)
+                summary, dagStatus = newSummary, newDagStatus
+                statusDict.update({'status': dagStatus, 'dagStatus': dagStatus, 'jobs': jobStates.toDict(),
+                                   'jobsPerStatus': summary.jobsPerStatus, 'jobList': summary.jobList})
+            self.logger.info("\nStatus on the scheduler is %s, stop watching.", dagStatus)
+        except KeyboardInterrupt:
+            self.logger.info("")
         return statusDict
 
+    def printChanges(self, previous, summary, previousDagStatus, dagStatus):
+        """ print what changed between two StatusSummary of the task, return the number of jobs which changed state """
+        previousStates = dict((jobid, state) for state, jobid in previous.jobList)
+        changed = [jobid for state, jobid in summary.jobList if previousStates.get(jobid) != state]
+        if not changed and dagStatus == previousDagStatus:
+            return 0
+        msg = "\n%s  Status on the scheduler:\t%s" % (time.strftime('%Y-%m-%d %H:%M:%S'), dagStatus)
+        if dagStatus != previousDagStatus:
+            msg += " (was %s)" % previousDagStatus
+        self.logger.info(msg)
+        counts = ", ".join("%s %d" % (self._printState(state, 0), summary.jobsPerStatus[state])
+                           for state in sorted(summary.jobsPerStatus))
+        self.logger.info("Jobs:\t\t\t\t%s (%d in total)", counts, summary.numJobs)
+        if changed:
+            automaticSplitt = summary.automaticSplitt
+            header = "\n%d jobs changed state:\n%4s %-12s %-12s" % (len(changed), "Job", "Was", "Now")
+            table = TableWriter(self.logger, header=header, maxRows=self.options.maxrows)
+            for jobid in sorted(changed, key=jobidSortKey):
+                before = previousStates.get(jobid)
+                before = translateJobStatus(jobid, before, automaticSplitt) if before else 'new'
+                table.write("%4s %-12s %s" % (jobid, before,
+                                              self._printState(translateJobStatus(jobid, summary.jobStates[jobid]['State'], automaticSplitt), 12)))
+            table.close()
+        return len(changed)
+
     def makeStatusReturnDict(self, crabDBInfo, combinedStatus, dagStatus='',
                              statusFailureMsg='', shortResult=None,
                              statusCacheInfo=None, pubStatus=None):
@@ -228,20 +544,20 @@ class status(SubCommand):
 
         statusDict = {}
         statusDict['status'] = combinedStatus
-        statusDict['dbStatus'] = getColumn(crabDBInfo, 'tm_task_status')
+        statusDict['dbStatus'] = crabDBInfo['tm_task_status']
         statusDict['dagStatus'] = dagStatus
-        statusDict['username'] = getColumn(crabDBInfo, 'tm_username')
-        statusDict['taskFailureMsg'] = getColumn(crabDBInfo, 'tm_task_failure')
-        statusDict['taskWarningMsg'] = getColumn(crabDBInfo, 'tm_task_warnings')
-        statusDict['outdatasets'] = getColumn(crabDBInfo, 'tm_output_dataset')
-        statusDict['schedd'] = getColumn(crabDBInfo, 'tm_schedd')
-        statusDict['collector'] = getColumn(crabDBInfo, 'tm_collector')
-        statusDict['command'] = getColumn(crabDBInfo, 'tm_task_command')
-        statusDict['publicationEnabled'] = True if getColumn(crabDBInfo, 'tm_publication') == 'T' else False
-        statusDict['userWebDirURL'] = getColumn(crabDBInfo, 'tm_user_webdir')
-        statusDict['inputDataset'] = getColumn(crabDBInfo, 'tm_input_dataset')
-
-        dbStartTime = getColumn(crabDBInfo, 'tm_start_time')
+        statusDict['username'] = crabDBInfo['tm_username']
+        statusDict['taskFailureMsg'] = crabDBInfo['tm_task_failure']
+        statusDict['taskWarningMsg'] = crabDBInfo['tm_task_warnings']
+        statusDict['outdatasets'] = crabDBInfo['tm_output_dataset']
+        statusDict['schedd'] = crabDBInfo['tm_schedd']
+        statusDict['collector'] = crabDBInfo['tm_collector']
+        statusDict['command'] = crabDBInfo['tm_task_command']
+        statusDict['publicationEnabled'] = True if crabDBInfo['tm_publication'] == 'T' else False
+        statusDict['userWebDirURL'] = crabDBInfo['tm_user_webdir']
+        statusDict['inputDataset'] = crabDBInfo['tm_input_dataset']
+
+        dbStartTime = crabDBInfo['tm_start_time']
         statusDict['submissionTime'] = getEpochFromDBTime(
             datetime.strptime(dbStartTime, '%Y-%m-%d %H:%M:%S.%f'))
 
@@ -251,7 +567,8 @@ class status(SubCommand):
         statusDict['jobList'] = shortResult.get('jobList', {})
         statusDict['publication'] = pubStatus.get('status', {})
         statusDict['publicationFailures'] = pubStatus.get('failure_reasons', {})
-        statusDict['jobs'] = statusCacheInfo
+        # the plain dictionary jobid -> job information of the CRABAPI, JobStates stay internal
+        statusDict['jobs'] = statusCacheInfo.toDict() if isinstance(statusCacheInfo, JobStates) else statusCacheInfo
         statusDict['commandStatus'] = 'SUCCESS'
         return statusDict
 
@@ -276,6 +593,17 @@ class status(SubCommand):
         else:
             return colors.NORMAL
 
+    def _fetched(self, name, function, *args):
+        """ the result of the call started in advance by showStatus, or of function(*args) if there is none.
+            When printing a snapshot, the result saved in it.
+        """
+        if self.snapshot is not None:
+            return self.snapshot['fetched'].get(name)
+        call = self.prefetched.pop(name, None)
+        result = call.result() if call else function(*args)
+        self.fetchedResults[name] = result
+        return result
+
     def publicationStatus(self, workflow, user):
         """Gets some information about the state of publication of jobs from the server.
         """
@@ -296,15 +624,15 @@ class status(SubCommand):
         """ Print general information like project directory, task name, scheduler, task status (in the database),
             dashboard URL, warnings and failire messages in the database.
         """
-        schedd = getColumn(crabDBInfo, 'tm_schedd')
+        schedd = crabDBInfo['tm_schedd']
         if not schedd: schedd = 'N/A yet'
-        twname = getColumn(crabDBInfo, 'tw_name')
+        twname = crabDBInfo['tw_name']
         if not twname: twname = 'N/A yet'
-        statusToPr = getColumn(crabDBInfo, 'tm_task_status')
-        command = getColumn(crabDBInfo, 'tm_task_command')
-        warnings = literal_eval(getColumn(crabDBInfo, 'tm_task_warnings'))
-        failure = getColumn(crabDBInfo, 'tm_task_failure')
-        dbStartTime = getColumn(crabDBInfo, 'tm_start_time')
+        statusToPr = crabDBInfo['tm_task_status']
+        command = crabDBInfo['tm_task_command']
+        warnings = literal_eval(crabDBInfo['tm_task_warnings'])
+        failure = crabDBInfo['tm_task_failure']
+        dbStartTime = crabDBInfo['tm_start_time']
 
         self.logger.info("CRAB project directory:\t\t%s" % (self.requestarea))
         self.logger.info("Task name:\t\t\t%s" % self.cachedinfo['RequestName'])
@@ -358,133 +686,75 @@ class status(SubCommand):
             msg += "\t%s" % (failure.replace('\n', '\n\t\t\t\t'))
             self.logger.error(msg)
 
+    def exportJobs(self, summary, jobids=None):
+        """ write one record per job to the --exportfile, or to stdout """
+        if jobids:
+            jobids = JobidIndex(jobids).sorted()
+        fileName = self.options.exportfile
+        with timedPhase('status: export job information'):
+            if fileName in [None, '-']:
+                numJobs = exportStatus(sys.stdout, self.options.export, summary, self.exportFields, jobids)
+            else:
+                with open(fileName, 'w') as fd:
+                    numJobs = exportStatus(fd, self.options.export, summary, self.exportFields, jobids)
+                self.logger.info("Status of %d jobs written in %s format to %s" % (numJobs, self.options.export, fileName))
+
     def checkUserJobids(self, statusCacheInfo, userJobids):
         """ Checks that the job information taken from the status_cache file on the schedd
             contains all of the jobids passed by the user.
         """
-        wrongJobIds = [uJobid for uJobid in userJobids if uJobid not in statusCacheInfo.keys()]
+        wrongJobIds = [uJobid for uJobid in userJobids if uJobid not in statusCacheInfo]
         if wrongJobIds:
             raise ConfigurationException("The following jobids were not found in the task: %s" % wrongJobIds)
 
-    def printDetails(self, dictresult, automaticSplitt, jobids=None, quiet=False,
+    def printDetails(self, summary, jobids=None, quiet=False,
                      maxMemory=parametersMapping['on-server']['maxmemory']['default'],
                      maxJobRuntime=parametersMapping['on-server']['maxjobruntime']['default'],
                      numCores=parametersMapping['on-server']['numcores']['default']):
         """ Print detailed information about a task and each job.
+            summary is the StatusSummary of the task, which already has one JobRow per job.
         """
-        sortdict = {}
-        outputMsg = "\nExtended Job Status Table:\n"
-        outputMsg += "\n%4s %-12s %-20s %10s %9s %5s %8s %9s %10s %14s" \
-                   % ("Job", "State", "Most Recent Site", "Runtime", "Mem (MB)", "CPU %", "Retries", "Restarts", "Waste", "Last ExitCode")
-        mem_cnt = 0
-        mem_min = -1
-        mem_max = 0
-        mem_sum = 0
-        run_cnt = 0
-        run_min = -1
-        run_max = 0
-        run_sum = 0
-        cpu_min = -1
-        cpu_max = 0
-        cpu_sum = 0
-        wall_sum = 0
-
-        def translateJobStatus(jobid):
-            statusToTr = dictresult[jobid]['State']
-            if statusToTr == 'cooloff':
-                statusToTr = 'toRetry'
-            if not automaticSplitt:
-                return statusToTr
-            if jobid.startswith('0-') and statusToTr in ('finished', 'failed'):
-                return 'no output'
-            elif automaticSplitt and '-' not in jobid and statusToTr == 'failed':
-                return 'rescheduled'
-            return statusToTr
-
+        automaticSplitt = summary.automaticSplitt
         # Chose between the jobids passed by the user or all jobids that are in the task
-        jobidsToUse = jobids if jobids else dictresult.keys()
-        for jobid in sorted(jobidsToUse, key=cmp_to_key(compareJobids)):
-            info = dictresult[str(jobid)]
-            state = translateJobStatus(jobid)
-            jobForMetrics = False
-            if (state not in ['idle', 'running', 'unsubmitted']) and (not jobid.startswith('0-')): # exclude not-run and probe jobs from metric
-                jobForMetrics = True
-            site = ''
-            if info.get('SiteHistory'):
-                site = info['SiteHistory'][-1]
-            wall = 0
-            if info.get('WallDurations'):
-                wall = info['WallDurations'][-1]
-                if (run_min == -1) or (wall < run_min): run_min = wall
-                if jobForMetrics:
-                    if wall > run_max: run_max = wall
-            if jobForMetrics:
-                run_sum += wall
-                run_cnt += 1
-            wall_str = to_hms(wall)
-            waste = 0
-            if info.get('WallDurations'):
-                for run in info['WallDurations'][:-1]:
-                    waste += run
-            if jobForMetrics: wall_sum += waste + wall
-            waste = to_hms(waste)
-            mem = 'Unknown'
-            if info.get('ResidentSetSize'):
-                mem = info['ResidentSetSize'][-1]/1024
-                if (mem_min == -1) or (wall < mem_min): mem_min = mem
-                if jobForMetrics:
-                    if mem > mem_max: mem_max = mem
-                    mem_sum += mem
-                    mem_cnt += 1
-                mem = '%d' % mem
-            cpu = 'Unknown'
-            if (state in ['toRetry', 'failed', 'finished']) and not wall:
-                cpu = 0
-                if (cpu_min == -1) or cpu < cpu_min: cpu_min = cpu
-                if cpu > cpu_max: cpu_max = cpu
-                cpu = "%.0f" % cpu
-            elif wall and ('TotalSysCpuTimeHistory' in info) and ('TotalUserCpuTimeHistory' in info):
-                cpu = info['TotalSysCpuTimeHistory'][-1] + info['TotalUserCpuTimeHistory'][-1]
-                if jobForMetrics: cpu_sum += cpu / float(numCores)
-                cpu = (cpu / float(wall*numCores)) * 100
-                if jobForMetrics:
-                    if (cpu_min == -1) or cpu < cpu_min: cpu_min = cpu
-                    if cpu > cpu_max: cpu_max = cpu
-                cpu = "%.0f" % cpu
-            ec = 'Unknown'
-            if info['State'] in ['finished']:
-                ec = '0'
-            elif 'Error' in info:
-                ec = str(info['Error'][0]) # exit code of this failed job
-            sortdict[str(jobid)] = {'state': state, 'site': site, 'runtime': wall_str, 'memory': mem, 'cpu': cpu, \
-                                    'retries': info.get('Retries', 0), 'restarts': info.get('Restarts', 0), 'waste': waste, 'exitcode': ec}
-            outputMsg += "\n%4s %-12s %-20s %10s %9s %5s %8s %9s %10s %14s" \
-                       % (jobid, state, site, wall_str, mem, cpu, info.get('Retries', 0),
-                          info.get('Restarts', 0), waste, ' Postprocessing failed' if ec == '90000' else ec)
-        if not quiet:
-            self.logger.info(outputMsg)
+        if jobids:
+            jobidsToUse = JobidIndex(jobids).sorted()
+            resources = summary.resourcesOf(jobidsToUse)
+        else:
+            jobidsToUse = summary.sortedJobids()
+            resources = summary.resources
 
-        # Print (to the log file) a table with the HTCondor cluster id for each job.
-        msg = "\n%4s %-10s" % ("Job", "Cluster Id")
-        for jobid in jobidsToUse:
-            info = dictresult[str(jobid)]
-            clusterid = str(info.get('JobIds', 'Unknown'))
-            msg += "\n%4s %10s" % (jobid, clusterid)
         if not quiet:
-            self.logger.debug(msg)
-
-        if mem_cnt or run_cnt:
+            header = "\nExtended Job Status Table:\n"
+            header += "\n%4s %-12s %-20s %10s %9s %5s %8s %9s %10s %14s" \
+                    % ("Job", "State", "Most Recent Site", "Runtime", "Mem (MB)", "CPU %", "Retries", "Restarts", "Waste", "Last ExitCode")
+            table = TableWriter(self.logger, header=header, maxRows=self.options.maxrows,
+                                pager=self._pager())
+            for jobid in jobidsToUse:
+                row = summary.row(jobid)
+                table.write("%4s %-12s %-20s %10s %9s %5s %8s %9s %10s %14s"
+                            % (jobid, row.state, row.site, to_hms(row.wall), _formatMemory(row), _formatCpu(row),
+                               row.retries, row.restarts, to_hms(row.waste),
+                               ' Postprocessing failed' if row.exitcode == '90000' else row.exitcode))
+            table.close()
+
+            # Print (to the log file) a table with the HTCondor cluster id for each job.
+            table = TableWriter(self.logger, header="\n%4s %-10s" % ("Job", "Cluster Id"), level=logging.DEBUG)
+            for jobid in jobidsToUse:
+                table.write("%4s %10s" % (jobid, str(summary.row(jobid).clusterIds)))
+            table.close()
+
+        if resources.memCount or resources.runCount:
             # Print a summary with memory/cpu usage.
             hint = "improve the jobs splitting (e.g. config.Data.splitting = 'Automatic') in a new task"
-            usage = {'memory':[mem_max, maxMemory, 0.7, parametersMapping['on-server']['maxmemory']['default'], 'MB'],
-                     'runtime':[run_max/60, maxJobRuntime, 0.3, 0, 'min']}
+            usage = {'memory':[resources.memMax, maxMemory, 0.7, parametersMapping['on-server']['maxmemory']['default'], 'MB'],
+                     'runtime':[resources.runMax/60, maxJobRuntime, 0.3, 0, 'min']}
             if not automaticSplitt:  # let's not blame user for our shortcomings
                 for param, values in usage.items():
                     if values[0] and values[1] > values[3]:
                         if values[0] < values[2]*values[1]:
                             self.logger.info("\n%sWarning%s: the max jobs %s is less than %d%% of the task requested value (%d %s), please consider to request a lower value for failed jobs (allowed through crab resubmit) and/or %s." % (colors.RED, colors.NORMAL, param, values[2]*100, values[1], values[4], hint))
-            if run_sum:
-                cpu_ave = (cpu_sum / run_sum)
+            if resources.runSum:
+                cpu_ave = (resources.cpuSum / resources.runSum)
                 cpu_thr = 0.5
                 cpu_thr_multiThread = 0.3
                 if cpu_ave < cpu_thr and not automaticSplitt:  # let's not blame user for our shortcomings
@@ -494,63 +764,38 @@ class status(SubCommand):
                     self.logger.info(cpuMsg+hint)
 
             summaryMsg = "\nSummary of run jobs:"
-            if mem_cnt:
-                summaryMsg += "\n * Memory: %dMB min, %dMB max, %.0fMB ave" % (mem_min, mem_max, mem_sum/mem_cnt)
-            if run_cnt:
-                summaryMsg += "\n * Runtime: %s min, %s max, %s ave" % (to_hms(run_min), to_hms(run_max), to_hms(run_sum/run_cnt))
-            if run_sum and cpu_min >= 0:
-                summaryMsg += "\n * CPU eff: %.0f%% min, %.0f%% max, %.0f%% ave" % (cpu_min, cpu_max, cpu_ave*100)
-            if wall_sum or run_sum:
-                waste = wall_sum - run_sum
-                summaryMsg += "\n * Waste: %s (%.0f%% of total)" % (to_hms(waste), (waste / float(wall_sum))*100)
+            if resources.memCount:
+                summaryMsg += "\n * Memory: %dMB min, %dMB max, %.0fMB ave" % (resources.memMin, resources.memMax, resources.memSum/resources.memCount)
+            if resources.runCount:
+                summaryMsg += "\n * Runtime: %s min, %s max, %s ave" % (to_hms(resources.runMin), to_hms(resources.runMax), to_hms(resources.runSum/resources.runCount))
+            if resources.runSum and resources.cpuMin >= 0:
+                summaryMsg += "\n * CPU eff: %.0f%% min, %.0f%% max, %.0f%% ave" % (resources.cpuMin, resources.cpuMax, cpu_ave*100)
+            if resources.wallSum or resources.runSum:
+                waste = resources.wallSum - resources.runSum
+                summaryMsg += "\n * Waste: %s (%.0f%% of total)" % (to_hms(waste), (waste / float(resources.wallSum))*100)
             summaryMsg += "\n"
             self.logger.info(summaryMsg)
 
-        return sortdict
-
-    def printOverview(self, statusCacheInfo, automaticSplitt, container):
+    def printOverview(self, summary, container):
         """ Give a summary of the job statuses, keeping in mind that:
                 - If there is a job with id 0 then this is the probe job for the estimation
                   This is the so called 'Automatic' splitting
                 - Then you have normal jobs
                 - Jobs that are line 1-1, 1-2 and so on are completing
+            The counts come from the StatusSummary of the task.
         """
-
-        # This record is no longer necessary and makes parsing more difficult.
-        if 'DagStatus' in statusCacheInfo:
-            del statusCacheInfo['DagStatus']
-
-        jobsPerStatus = {}
-        jobList = []
+        automaticSplitt = summary.automaticSplitt
         result = {}
-        for job, info in statusCacheInfo.items():
-            jobStatus = info['State']
-            jobsPerStatus.setdefault(jobStatus, 0)
-            jobsPerStatus[jobStatus] += 1
-            jobList.append([jobStatus, job])
-        result['jobsPerStatus'] = jobsPerStatus
-        result['jobList'] = jobList
-
-        # Collect information about probe and tail jobs
-        # Create dictionaries like {'finished' : 1, 'running' : 3}
-        states = {}
-        statesPJ = {}
-        statesTJ = {}
-        failedProcessing = 0
-        for jobid, statusDict in statusCacheInfo.items():
-            jobStatus = statusDict['State'] if statusDict['State'] != 'cooloff' else 'toRetry'
-            if jobid.startswith('0-'):
-                statesPJ[jobStatus] = statesPJ.setdefault(jobStatus, 0) + 1
-            elif '-' in jobid:
-                statesTJ[jobStatus] = statesTJ.setdefault(jobStatus, 0) + 1
-            else:
-                states[jobStatus] = states.setdefault(jobStatus, 0) + 1
-                if jobStatus == 'failed':
-                    failedProcessing += 1
-        result['numProbes'] = sum(statesPJ.values())
-        result['numUnpublishable'] = 0
-        if result['numProbes'] > 0:
-            result['numUnpublishable'] = failedProcessing
+        result['jobsPerStatus'] = summary.jobsPerStatus
+        result['jobList'] = summary.jobList
+        result['numProbes'] = summary.numProbes
+        result['numUnpublishable'] = summary.numUnpublishable
+
+        # Dictionaries like {'finished' : 1, 'running' : 3} for probe, main and tail jobs,
+        # copied since they are modified below for printing
+        states = dict(summary.states)
+        statesPJ = dict(summary.statesPJ)
+        statesTJ = dict(summary.statesTJ)
 
         def terminate(states, jobStatus, target='no output'):
             if jobStatus in states:
@@ -603,25 +848,30 @@ class status(SubCommand):
                                                         self._percentageString(jobStatus, currStates[jobStatus],
                                                                                total)))
 
-    def printProbeJobsThroughput(self):
-        """ print evnt/sec and bytes/event from probe jobs"""
-        msg = "Estimated application throughput from probe jobs"
-
+    def fetchProbeJobsLog(self):
+        """ content of the log of the splitting done after the probe jobs, None if not available """
         preDagLog = 'DagLog0.txt'
         preDagLogUrl =  self.proxiedWebDir + "/AutomaticSplitting/" + preDagLog
         tmpDir = tempfile.mkdtemp()
         preDagLogFile = os.path.join(tmpDir, preDagLog)
         httpCode = curlGetFileFromURL(url=preDagLogUrl, filename=preDagLogFile,
-                                      proxyfilename=self.proxyfilename, logger=self.logger)
-        logIsAvailable = httpCode == 200
+                                      proxyfilename=self.proxyfilename, logger=self.logger,
+                                      cacheDir=self.fileCacheDir)
+        if httpCode != 200:
+            return None
+        with open(preDagLogFile) as fp:
+            return fp.read()
+
+    def printProbeJobsThroughput(self):
+        """ print evnt/sec and bytes/event from probe jobs"""
+        msg = "Estimated application throughput from probe jobs"
 
-        if not logIsAvailable:
+        content = self._fetched('probeJobsLog', self.fetchProbeJobsLog)
+        if content is None:
             msg += " is not available yet"
             self.logger.info(msg)
         else:
             # grab and print relevant lines from preDag.0.txt (lines 2, 4 and 5)
-            with open(preDagLogFile) as fp:
-                content = fp.read()
             if 'Ended TaskManagerBootstrap with code 4' in content:  # PreDag is waiting for probes to complete
                 msg += " is not available yet"
                 self.logger.info(msg)
@@ -633,54 +883,13 @@ class status(SubCommand):
                     msg += '\n '+ line.split('PreDAG')[1]
                 self.logger.info(msg)
 
-    def printErrors(self, dictresult, automaticSplitt):
-        """ Iterate over dictresult['jobs'] if present, which is a dictionary like:
-                {'10': {'State': 'running'}, '1': {'State': 'failed', 'Error' : [10,'error message']}, '3': {'State': 'failed', 'Error' : [10,'error message']} ...
-            and group the errors per exit code counting how many jobs exited with a certain exit code, and print the summary
+    def printErrors(self, summary):
+        """ Group the failed jobs of the StatusSummary, a list like:
+                [('1', 10, 'error message'), ('3', 10, 'error message'), ('4', None, None) ...
+            per exit code, and per exit code in clusters of similar error messages (see ErrorClusters),
+            and print the summary
         """
-        # In general, there are N_{ec}_{em} jobs that failed with exit code ec and
-        # error message em.
-        # Since there may be different error messages for a given exit code, we use a
-        # map containing the exit code as key and as value a list with the different
-        # exit messages. For example:
-        # ec_errors = { '1040' : ["Failed due to bla", "Failed due to blabla"],
-        #              '60302' : ["File X does not exist", "File Y does not exist"]
-        #             }
-        ec_errors = {}
-        # We also want a map containing again the exit code as key, but as value a list
-        # with the lists of job ids that failed with given exit code and error message.
-        # For example:
-        # ec_jobids = { '1040' : [[1, 2, 3, 4, 5], [10, 12, 14]],
-        #              '60302' : [[6, 7, 8, 9, 10], [11, 13, 15]]
-        #             }
-        # where jobs [1, 2, 3, 4, 5] failed with error message "Failed due to bla",
-        # jobs [10, 12, 14] with "Failed due to blabla", jobs [6, 7, 8, 9, 10] with
-        # "File X does not exist" and jobs [11, 13, 15] with "File Y does not exist".
-        ec_jobids = {}
-        # We also want a map containing again the exit code as key, but as value a list
-        # with the numbers N_{ec}_{em}. For example:
-        # ec_numjobs = { '1040' : [N_{1040}_{"Failed due to bla"}, N_{1040}_{"Failed due to blabla"}],
-        #               '60302' : [N_{60302}_{"File X does not exist"}, N_{60302}_{"File Y does not exist"}]
-        #              }
-        # Actually, for later convenience when sorting by most frequent error messages
-        # for each exit code (i.e. sorting by N_{ec}_{em}), we add a second number
-        # representing the position of the error message em in the corresponding list
-        # in ec_errors[ec]. For example:
-        # ec_numjobs = { '1040' : [(N_{1040}_{"Failed due to bla"}, 1), (N_{1040}_{"Failed due to blabla"}, 2)],
-        #               '60302' : [(N_{60302}_{"File X does not exist"}, 1), (N_{60302}_{"File Y does not exist"}, 2)]
-        #              }
-        # We will later sort ec_numjobs[ec], which sorts according to the first number
-        # in the 2-tuples. So the sorted ec_numjobs dictionary could be for example:
-        # ec_numjobs = { '1040' : [(N_{1040}_{"Failed due to bla"}, 1), (N_{1040}_{"Failed due to blabla"}, 2)],
-        #               '60302' : [(N_{60302}_{"File Y does not exist"}, 2), (N_{60302}_{"File X does not exist"}, 1)]
-        #              }
-        # The second number in the 2-tuples allows to get the error message from
-        # ec_errors[ec]: given the sorted ec_numjobs dictionary, for each exit code
-        # (i.e. for each key) ec in the dictionary, the most frequent error messages
-        # are ec_errors[ec][ec_numjobs[ec][0][1]], ec_errors[ec][ec_numjobs[ec][1][1]], etc.
-        ec_numjobs = {}
-        unknown = 0
-        are_failed_jobs = False
+        automaticSplitt = summary.automaticSplitt
 
         def consider(jobid):
             if self.options.long:
@@ -688,142 +897,62 @@ class status(SubCommand):
             if automaticSplitt and (jobid.startswith('0-') or '-' not in jobid):
                 return False
             return True
-        for jobid, jobStatus in dictresult.items():
-            if jobStatus['State'] == 'failed' and consider(jobid):
-                are_failed_jobs = True
-                if 'Error' in jobStatus:
-                    ec = jobStatus['Error'][0] #exit code of this failed job
-                    em = jobStatus['Error'][1] #exit message of this failed job
-                    if ec not in ec_errors:
-                        ec_errors[ec] = []
-                    if ec not in ec_jobids:
-                        ec_jobids[ec] = []
-                    if ec not in ec_numjobs:
-                        ec_numjobs[ec] = []
-                    if em not in ec_errors[ec]:
-                        ec_numjobs[ec].append((1, len(ec_errors[ec])))
-                        ec_errors[ec].append(em)
-                        ec_jobids[ec].append([jobid])
-                    else:
-                        i = ec_errors[ec].index(em)
-                        ec_jobids[ec][i].append(jobid)
-                        ec_numjobs[ec][i] = (ec_numjobs[ec][i][0] + 1, ec_numjobs[ec][i][1])
-                else:
-                    unknown += 1
-        if are_failed_jobs:
-            # If option --sort=exitcodes was specified, show the error summary with the
-            # exit codes sorted. Otherwise show it sorted from most frequent exit code to
-            # less frequent.
-            exitCodes = []
-            if self.options.sort == "exitcode":
-                for ec in ec_numjobs.keys():
-                    if ec not in exitCodes:
-                        exitCodes.append(ec)
-                exitCodes.sort()
+        with timedPhase('status: cluster error messages'):
+            errors = ErrorClusters(failed for failed in summary.failedJobs if consider(failed[0]))
+        if not errors:
+            return
+        # If option --sort=exitcodes was specified, show the error summary with the
+        # exit codes sorted. Otherwise show it sorted from most frequent exit code to
+        # less frequent.
+        exitCodes = errors.exitCodes(byCode=self.options.sort == "exitcode")
+        # Error summary header.
+        msg = "\nError Summary:"
+        if not self.options.verboseErrors:
+            msg += " (use crab status --verboseErrors for details about the errors)"
+        # Auxiliary variable for the layout of the error summary messages.
+        totnumjobs = summary.numJobs
+        ndigits = int(math.ceil(math.log(totnumjobs+1, 10)))
+        # For each exit code:
+        for ec in exitCodes:
+            count = errors.count(ec)
+            # Exit code 90000 means failure in postprocessing stage.
+            if ec == 90000:
+                msg += ("\n\n%" + str(ndigits) + "s jobs failed in postprocessing step%s") \
+                     % (count, ":" if self.options.verboseErrors else "")
             else:
-                numjobsec = []
-                for ec, numjobs in ec_numjobs.items():
-                    count = 0
-                    for nj, _ in numjobs:
-                        count += nj
-                    numjobsec.append((count, ec))
-                numjobsec.sort()
-                numjobsec.reverse()
-                for _, ec in numjobsec:
-                    if ec not in exitCodes:
-                        exitCodes.append(ec)
-            # Sort the job ids in ec_jobids. Remember that ec_jobids[ec] is a list of lists
-            # of job ids, and that each job id is a string.
-            for ec in ec_jobids.keys():
-                for i in range(len(ec_jobids[ec])):
-                    ec_jobids[ec][i] = [str(y) for y in sorted([x for x in ec_jobids[ec][i]], key=cmp_to_key(compareJobids))]
-            # Error summary header.
-            msg = "\nError Summary:"
-            if not self.options.verboseErrors:
-                msg += " (use crab status --verboseErrors for details about the errors)"
-            # Auxiliary variable for the layout of the error summary messages.
-            totnumjobs = len(dictresult)
-            ndigits = int(math.ceil(math.log(totnumjobs+1, 10)))
-            # For each exit code:
-            for i, ec in enumerate(exitCodes):
-                # Sort the error messages for this exit code from most frequent one to less
-                # frequent one.
-                numjobs = sorted(ec_numjobs[ec])
-                numjobs.reverse()
-                # Count the total number of failed jobs with this exit code.
-                count = 0
-                for nj, _ in numjobs:
-                    count += nj
-                # Exit code 90000 means failure in postprocessing stage.
-                if ec == 90000:
-                    msg += ("\n\n%" + str(ndigits) + "s jobs failed in postprocessing step%s") \
-                         % (count, ":" if self.options.verboseErrors else "")
-                else:
-                    msg += ("\n\n%" + str(ndigits) + "s jobs failed with exit code %s%s") \
-                         % (count, ec, ":" if self.options.verboseErrors else "")
-                if self.options.verboseErrors:
-                    # Costumize the message depending on whether there is only one error message or
-                    # more than one.
-                    if len(ec_errors[ec]) == 1:
-                        error_msg = ec_errors[ec][0]
-                        msg += ("\n\n\t%" + str(ndigits) + "s jobs failed with following error message:") % (nj)
-                        msg += " (for example, job %s)" % (ec_jobids[ec][0][0])
-                        msg += "\n\n\t\t" + "\n\t\t".join([line for line in error_msg.split('\n') if line])
-                    else:
-                        # Show up to three different error messages.
-                        remainder = count
-                        if len(ec_errors[ec]) > 3:
-                            msg += "\n\t(Showing only the 3 most frequent errors messages for this exit code)"
-                        for nj, ne in numjobs[:3]:
-                            error_msg = ec_errors[ec][ne]
-                            msg += ("\n\n\t%" + str(ndigits) + "s jobs failed with following error message:") % (nj)
-                            msg += " (for example, job %s)" % (ec_jobids[ec][ne][0])
-                            msg += "\n\n\t\t" + "\n\t\t".join([line for line in error_msg.split('\n') if line])
-                            remainder -= nj
-                        if remainder > 0:
-                            msg += "\n\n\tFor the error messages of the other %s jobs," % (remainder)
-                            msg += " please have a look at the dashboard task monitoring web page."
-            if unknown:
-                msg += "\n\nCould not find exit code details for %s jobs." % (unknown)
-            msg += "\n\nHave a look at https://twiki.cern.ch/twiki/bin/viewauth/CMSPublic/JobExitCodes for a description of the exit codes."
-            self.logger.info(msg)
+                msg += ("\n\n%" + str(ndigits) + "s jobs failed with exit code %s%s") \
+                     % (count, ec, ":" if self.options.verboseErrors else "")
+            if self.options.verboseErrors:
+                # Show the most frequent kinds of error message, messages which only differ
+                # by file names, numbers ... are shown once with placeholders for these parts.
+                remainder = count
+                if errors.numClusters(ec) > TOP_CLUSTERS:
+                    msg += "\n\t(Showing only the %d most frequent errors messages for this exit code)" % TOP_CLUSTERS
+                for cluster in errors.topClusters(ec):
+                    nj = len(cluster.jobids)
+                    msg += ("\n\n\t%" + str(ndigits) + "s jobs failed with following error message:") % (nj)
+                    msg += " (for example, job %s)" % (cluster.jobids[0])
+                    msg += "\n\n\t\t" + "\n\t\t".join([line for line in cluster.message().split('\n') if line])
+                    if nj > 1:
+                        msg += "\n\t\tjobs: %s" % jobidRanges(cluster.jobids)
+                    remainder -= nj
+                if remainder > 0:
+                    msg += "\n\n\tFor the error messages of the other %s jobs," % (remainder)
+                    msg += " please have a look at the dashboard task monitoring web page."
+        if errors.unknown:
+            msg += "\n\nCould not find exit code details for %s jobs." % (errors.unknown)
+        msg += "\n\nHave a look at https://twiki.cern.ch/twiki/bin/viewauth/CMSPublic/JobExitCodes for a description of the exit codes."
+        self.logger.info(msg)
 
-    def printSummary(self, dictresult):
+    def printSummary(self, summary):
         """ Print the information about jobs on each site:
                 - How many jobs are or were running on the site and in which state,
                 - Runtime for each site.
+            The per-site counters come from the StatusSummary of the task.
         """
 
-        sites = {}
-        default_info = {"Runtime": 0, "Waste": 0, "Running": 0, "Success": 0, "Failed": 0, "Stageout": 0}
-        siteHistory_retrieved = False
-        for job in dictresult:
-            info = dictresult[job]
-            state = info['State']
-            site_history = info.get("SiteHistory")
-            if not site_history:
-                continue
-            siteHistory_retrieved = True
-            walls = info['WallDurations']
-            cur_site = info['SiteHistory'][-1]
-            cur_info = sites.setdefault(cur_site, dict(default_info))
-            for site, wall in zip(site_history[:-1], walls[:-1]):
-                info = sites.setdefault(site, dict(default_info))
-                info['Failed'] += 1
-                info['Waste'] += wall
-            if state in ['failed', 'cooloff', 'held', 'killed'] or (state == 'idle' and cur_site != 'Unknown'):
-                cur_info['Failed'] += 1
-                cur_info['Waste'] += walls[-1]
-            elif state == 'transferring':
-                cur_info['Stageout'] += 1
-                cur_info['Runtime'] += walls[-1]
-            elif state == 'running':
-                cur_info['Running'] += 1
-                cur_info['Runtime'] += walls[-1]
-            elif state == 'finished':
-                cur_info['Success'] += 1
-                cur_info['Runtime'] += walls[-1]
-
+        sites = summary.sites
+        siteHistory_retrieved = summary.siteHistoryRetrieved
         # avoid printing header only
         if not siteHistory_retrieved:
             self.logger.info("No SiteHistory retrieved for any job\n")
@@ -842,85 +971,127 @@ class status(SubCommand):
 
         self.logger.info("")
 
-    def printSort(self, sortdict, sortby):
+    def printSort(self, summary, jobids, sortby):
         """ Print information about jobs sorted by a certain attribute.
+            jobids restricts the list to some jobs, all jobs are listed if it is empty.
         """
         sortmatrix = []
         valuedict = {}
         self.logger.info('')
-        for jobid in sortdict:
+        if jobids:
+            jobidsToUse = JobidIndex(jobids).sorted()
+        else:
+            jobidsToUse = summary.sortedJobids()
+        for jobid in jobidsToUse:
+            row = summary.row(jobid)
             if sortby in ['exitcode']:
-                if sortdict[jobid][sortby] != 'Unknown':
-                    value = int(sortdict[jobid][sortby])
-                else:
-                    value = 999999
-                if value not in sortmatrix:
-                    sortmatrix.append(value)
-                sortmatrix.sort()
+                value = int(row.exitcode) if row.exitcode != 'Unknown' else 999999
                 if value not in valuedict:
                     valuedict[value] = [jobid]
                 else:
                     valuedict[value].append(jobid)
             elif sortby in ['state', 'site']:
-                value = sortdict[jobid][sortby]
+                value = getattr(row, sortby)
                 if value not in valuedict:
                     valuedict[value] = [jobid]
                 else:
                     valuedict[value].append(jobid)
             elif sortby in ['memory', 'cpu', 'retries']:
-                if sortdict[jobid][sortby] != 'Unknown':
-                    value = int(sortdict[jobid][sortby])
-                else:
+                value = getattr(row, sortby)
+                if value is None:
                     value = 999999
+                elif sortby in ['memory', 'cpu']:
+                    # as shown in the job table
+                    value = int(round(value)) if sortby == 'cpu' else int(value)
                 sortmatrix.append((value, jobid))
-                sortmatrix.sort()
             elif sortby in ['runtime', 'waste']:
-                value = sortdict[jobid][sortby]
-                realvaluematrix = value.split(':')
-                realvalue = 3600*int(realvaluematrix[0]) + 60*int(realvaluematrix[1]) + int(realvaluematrix[2])
-                sortmatrix.append((realvalue, value, jobid))
-                sortmatrix.sort()
+                realvalue = int(row.wall if sortby == 'runtime' else row.waste)
+                sortmatrix.append((realvalue, to_hms(realvalue), jobid))
+        numericSort = sortby in ['memory', 'cpu', 'retries', 'runtime', 'waste']
+        numUnknown = 0
+        if numericSort:
+            # of the known values only, 999999 stands for Unknown
+            ranked = percentiles([entry[0] for entry in sortmatrix if entry[0] != 999999])
+        if sortby in ['exitcode']:
+            sortmatrix = sorted(valuedict)
+        elif self.options.top or self.options.bottom:
+            # partial selection, the jobs with unknown value are left out
+            known = [entry for entry in sortmatrix if entry[0] != 999999]
+            numUnknown = len(sortmatrix) - len(known)
+            if self.options.top:
+                sortmatrix = heapq.nlargest(self.options.top, known, key=itemgetter(0))
+            else:
+                sortmatrix = heapq.nsmallest(self.options.bottom, known, key=itemgetter(0))
+        else:
+            sortmatrix.sort()
+        # valuedict lists are already in job order, since jobidsToUse is
+        pager = self._pager()
         if sortby in ['exitcode']:
-            msg = "Jobs sorted by exit code:\n"
-            msg += "\n%-20s %-20s\n" % ('Exit Code', 'Job Id(s)')
+            header = "Jobs sorted by exit code:\n"
+            header += "\n%-20s %-20s\n" % ('Exit Code', 'Job Id(s)')
+            table = TableWriter(self.logger, header=header, maxRows=self.options.maxrows, pager=pager)
             for value in sortmatrix:
                 if value == 999999:
                     esignvalue = 'Unknown'
                 else:
                     esignvalue = str(value)
-                jobids = sorted(valuedict[value], key=cmp_to_key(compareJobids))
-                msg += "\n%-20s %-s" % (esignvalue, ", ".join(jobids))
-            self.logger.info(msg)
+                table.write("%-20s %-s" % (esignvalue, ", ".join(valuedict[value])))
+            table.close()
         elif sortby in ['state', 'site']:
-            msg = "Jobs sorted by %s:\n" % (sortby)
-            msg += "\n%-20s %-20s\n" % (sortby.title(), 'Job Id(s)')
+            header = "Jobs sorted by %s:\n" % (sortby)
+            header += "\n%-20s %-20s\n" % (sortby.title(), 'Job Id(s)')
+            table = TableWriter(self.logger, header=header, maxRows=self.options.maxrows, pager=pager)
             for value in valuedict:
-                msg += "\n%-20s %-s" % (value, ", ".join(valuedict[value]))
-            self.logger.info(msg)
+                table.write("%-20s %-s" % (value, ", ".join(valuedict[value])))
+            table.close()
         elif sortby in ['memory', 'cpu', 'retries']:
-            msg = "Jobs sorted by %s used:\n" % (sortby)
+            header = "Jobs sorted by %s used%s:\n" % (sortby, self._extremesTitle())
             if sortby == 'memory':
-                msg += "%-10s %-10s\n" % ("Memory (MB)".center(10), "Job Id".center(10))
+                header += "%-10s %-10s" % ("Memory (MB)".center(10), "Job Id".center(10))
             elif sortby == 'cpu':
-                msg += "%-10s %-10s\n" % ("CPU".center(10), "Job Id".center(10))
+                header += "%-10s %-10s" % ("CPU".center(10), "Job Id".center(10))
             elif sortby == 'retries':
-                msg += "%-10s %-10s\n" % ("Retries".center(10), "Job Id".center(10))
+                header += "%-10s %-10s" % ("Retries".center(10), "Job Id".center(10))
+            table = TableWriter(self.logger, header=header, footer='', maxRows=self.options.maxrows, pager=pager)
             for value in sortmatrix:
                 if value[0] == 999999:
                     esignvalue = 'Unknown'
                 else:
                     esignvalue = value[0]
-                msg += "%10s %10s\n" % (str(esignvalue).center(10), value[1].center(10))
-            self.logger.info(msg)
+                table.write("%10s %10s" % (str(esignvalue).center(10), value[1].center(10)))
+            table.close()
         elif sortby in ['runtime', 'waste']:
-            msg = "Jobs sorted by %s used:\n" % (sortby)
-            msg += "%-10s %-5s\n" % (sortby.title(), "Job Id")
+            header = "Jobs sorted by %s used%s:\n" % (sortby, self._extremesTitle())
+            header += "%-10s %-5s" % (sortby.title(), "Job Id")
+            table = TableWriter(self.logger, header=header, footer='', maxRows=self.options.maxrows, pager=pager)
             for value in sortmatrix:
-                msg += "%-10s %-5s\n" % (value[1], value[2].center(5))
+                table.write("%-10s %-5s" % (value[1], value[2].center(5)))
+            table.close()
+        if numUnknown:
+            self.logger.info("%d job(s) with unknown %s not included" % (numUnknown, sortby))
+        if numericSort and ranked:
+            units = {'memory': ' MB', 'cpu': '%'}
+            formatValue = to_hms if sortby in ['runtime', 'waste'] else lambda value: '%s%s' % (value, units.get(sortby, ''))
+            msg = "Percentiles of %s over %d jobs: " % (sortby, ranked['count'])
+            msg += ", ".join("p%d %s" % (rank, formatValue(ranked[rank])) for rank in PERCENTILES)
             self.logger.info(msg)
 
         self.logger.info('')
 
+    def _extremesTitle(self):
+        """ how the --top/--bottom selection is described in the --sort header """
+        if self.options.top:
+            return " (the %d highest)" % self.options.top
+        if self.options.bottom:
+            return " (the %d lowest)" % self.options.bottom
+        return ""
+
+    def _pager(self):
+        """ the command to page long tables through, if requested """
+        if not self.options.pager:
+            return None
+        return os.environ.get('PAGER', 'less -R')
+
     def printRucioInfo(self, container):
         if not container:
             return
@@ -971,7 +1142,7 @@ class status(SubCommand):
                 if job[0] == 'finished':
                     finishedJobs += 1
         if (publicationEnabled and finishedJobs):
-            pubStatus = self.publicationStatus(taskname, user)
+            pubStatus = self._fetched('publication', self.publicationStatus, taskname, user)
         elif not publicationEnabled:
             pubStatus['status'] = {'disabled': []}
         pubInfo = {}
@@ -980,7 +1151,7 @@ class status(SubCommand):
 
         # The output datasets are written into the Task DB by the post-job
         # when uploading the output files metadata.
-        outdatasets = literal_eval(getColumn(crabDBInfo, 'tm_output_dataset') if getColumn(crabDBInfo, 'tm_output_dataset') else 'None')
+        outdatasets = literal_eval(crabDBInfo['tm_output_dataset'] if crabDBInfo['tm_output_dataset'] else 'None')
         pubInfo['outdatasets'] = outdatasets
         pubInfo['jobsPerStatus'] = jobsPerStatus
 
@@ -1055,16 +1226,22 @@ class status(SubCommand):
 
         return pubStatus
 
-    def printRucioQuotaInfo(self, lfn, site):
+    def rucioQuota(self, lfn, site):
+        """ the isEnoughRucioQuota answer for the output site, None if it does not apply """
         if not self.rucio:
-            return
+            return None
         if site == 'T3_CERN_CERNBOX':
-            return
+            return None
         # We need to switch to group account when needed untils CMS Rucio fix
         # the permission issue.
         # See https://mattermost.web.cern.ch/cms-o-and-c/pl/ej7zwkr747rifezzcyyweisx9r
         rucioClient = getRucioClientFromLFN(self.rucio, lfn, self.logger)
-        quotaCheck = isEnoughRucioQuota(rucioClient, site)
+        return isEnoughRucioQuota(rucioClient, site)
+
+    def printRucioQuotaInfo(self, lfn, site):
+        quotaCheck = self._fetched('rucioQuota', self.rucioQuota, lfn, site)
+        if not quotaCheck:
+            return
         self.logger.info("You have %d/%d GBytes available as Rucio quota at site %s" % (quotaCheck['free'], quotaCheck['total'], site))
         if not quotaCheck['isEnough']:
             msg = "%sALARM: Not enough space at ASO destination %s" % (colors.RED, colors.NORMAL)
@@ -1095,6 +1272,16 @@ class status(SubCommand):
                                dest="sort",
                                default=None,
                                help="Sort failed jobs by 'state', 'site', 'runtime', 'memory', 'cpu', 'retries', 'waste' or 'exitcode'.")
+        self.parser.add_option("--top",
+                               dest="top",
+                               default=None,
+                               type="int",
+                               help="With --sort by 'memory', 'cpu', 'retries', 'runtime' or 'waste', list only the N jobs with the highest values.")
+        self.parser.add_option("--bottom",
+                               dest="bottom",
+                               default=None,
+                               type="int",
+                               help="With --sort by 'memory', 'cpu', 'retries', 'runtime' or 'waste', list only the N jobs with the lowest values.")
         self.parser.add_option("--json",
                                dest="json",
                                default=False,
@@ -1115,6 +1302,53 @@ class status(SubCommand):
                                default=None,
                                help="The ids of jobs to print in crab status --long or --sort." + \
                                     " Comma separated list of integers.")
+        self.parser.add_option("--maxrows",
+                               dest="maxrows",
+                               default=None,
+                               type="int",
+                               help="Print at most this number of lines in the crab status --long table and --sort list.")
+        self.parser.add_option("--pager",
+                               dest="pager",
+                               default=False,
+                               action="store_true",
+                               help="Show the crab status --long table and --sort list through a pager ($PAGER or less).")
+        self.parser.add_option("--watch",
+                               dest="watch",
+                               default=False,
+                               action="store_true",
+                               help="Keep running and print the jobs which change state, until the task is done (Ctrl-C to stop).")
+        self.parser.add_option("--refresh",
+                               dest="refresh",
+                               default=WATCH_MIN_INTERVAL,
+                               type="int",
+                               help="Minimum number of seconds between two looks at the task in crab status --watch." + \
+                                    " Default %d." % WATCH_MIN_INTERVAL)
+        self.parser.add_option("--offline",
+                               dest="offline",
+                               default=False,
+                               action="store_true",
+                               help="Do not contact the servers, print the status saved by the last crab status in the project directory.")
+        self.parser.add_option("--staleok",
+                               dest="staleok",
+                               default=False,
+                               action="store_true",
+                               help="Print the status saved by the last crab status right away, then get the current" + \
+                                    " status from the server and print the jobs which changed state since.")
+        self.parser.add_option("--export",
+                               dest="export",
+                               default=None,
+                               help="Write one record per job, in format %s, to stdout or to the --exportfile." % \
+                                    " or ".join("'%s'" % fmt for fmt in EXPORT_FORMATS) + \
+                                    " Use crab --quiet status to get only the records on stdout.")
+        self.parser.add_option("--fields",
+                               dest="fields",
+                               default=None,
+                               help="Comma separated fields of the --export records, among %s." % ", ".join(sorted(EXPORT_FIELDS)) + \
+                                    " Default %s." % ",".join(DEFAULT_EXPORT_FIELDS))
+        self.parser.add_option("--exportfile",
+                               dest="exportfile",
+                               default=None,
+                               help="File where crab status --export writes the records. Default stdout.")
 
 
     def validateOptions(self):
@@ -1127,13 +1361,72 @@ class status(SubCommand):
                 msg += " Only the following values are accepted for --sort option: %s" % (sortOpts)
                 raise ConfigurationException(msg)
 
+        for option in ['top', 'bottom']:
+            value = getattr(self.options, option)
+            if value is None:
+                continue
+            if value < 1:
+                raise ConfigurationException("Parameter --%s must be a positive number." % option)
+            if self.options.sort not in ["memory", "cpu", "retries", "runtime", "waste"]:
+                raise ConfigurationException("Parameter --%s can only be used in combination with --sort by "
+                                             "'memory', 'cpu', 'retries', 'runtime' or 'waste'." % option)
+        if self.options.top and self.options.bottom:
+            raise ConfigurationException("Parameters --top and --bottom can not be used together.")
+
         if self.options.jobids:
             jobidstuple = validateJobids(self.options.jobids)
             self.jobids = [str(jobid) for (_, jobid) in jobidstuple]
 
-        if self.options.jobids and not (self.options.long or self.options.sort):
+        if self.options.maxrows is not None and self.options.maxrows < 1:
+            raise ConfigurationException("Parameter --maxrows must be a positive number.")
+
+        if self.options.refresh < 1:
+            raise ConfigurationException("Parameter --refresh must be a positive number.")
+
+        if self.options.offline and self.options.staleok:
+            raise ConfigurationException("Parameters --offline and --staleok can not be used together.")
+        if self.options.watch and (self.options.offline or self.options.staleok):
+            raise ConfigurationException("Parameter --watch can not be used in combination with --offline or --staleok.")
+
+        if self.options.watch and self.options.json:
+            raise ConfigurationException("Parameter --watch can not be used in combination with --json.")
+
+        if self.options.export is not None:
+            if self.options.export not in EXPORT_FORMATS:
+                raise ConfigurationException("Only the following values are accepted for --export option: %s" % EXPORT_FORMATS)
+            if self.options.watch:
+                raise ConfigurationException("Parameter --watch can not be used in combination with --export.")
+        elif self.options.fields or self.options.exportfile:
+            raise ConfigurationException("Parameters --fields and --exportfile can only be used in combination "
+                                         "with --export option.")
+        if self.options.fields:
+            try:
+                self.exportFields = parseExportFields(self.options.fields)
+            except ValueError as ex:
+                raise ConfigurationException("Parameter --fields: %s" % ex)
+            if not self.exportFields:
+                raise ConfigurationException("Parameter --fields must name at least one field.")
+
+        if self.options.jobids and not (self.options.long or self.options.sort or self.options.export):
             raise ConfigurationException("Parameter --jobids can only be used in combination "
-                                         "with --long or --sort options.")
+                                         "with --long, --sort or --export options.")
+
+def _formatMemory(row):
+    """ memory of a JobRow as shown in the job table """
+    return 'Unknown' if row.memory is None else '%d' % row.memory
+
+
+def _formatCpu(row):
+    """ CPU efficiency of a JobRow as shown in the job table """
+    return 'Unknown' if row.cpu is None else "%.0f" % row.cpu
+
+
+def _formatAge(seconds):
+    """ e.g. '0:12:05' or '3 days' """
+    if seconds < 86400:
+        return to_hms(max(seconds, 0))
+    return "%d days" % (seconds // 86400)
+
 
 def to_hms(val):
     s = val % 60
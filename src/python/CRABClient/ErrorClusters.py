@@ -0,0 +1,118 @@
+# pylint: disable=consider-using-f-string
+"""
+Grouping of the error messages of failed jobs for the error summary of crab status.
+Messages which only differ by file names, hosts, numbers ... e.g.
+    FileReadError: could not open /store/data/Run2024A/file_12.root on host node7.cern.ch
+    FileReadError: could not open /store/data/Run2024A/file_95.root on host node3.cern.ch
+end up in the same cluster, keyed by the message with those parts replaced by placeholders:
+    FileReadError: could not open <path> on host <host>
+Each distinct message is normalized once and clusters are dictionary buckets, so the
+work is linear in the number of failed jobs.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import re
+import heapq
+
+from CRABClient.ClientUtilities import JobidIndex, jobidSortKey
+
+# (placeholder, regular expression) applied in this order, so that e.g. the numbers
+# inside a path do not become separate placeholders
+NORMALIZATIONS = [
+    ('<url>', re.compile(r'\b[a-zA-Z][a-zA-Z0-9+.-]*://[^\s\'"<>]+')),
+    ('<path>', re.compile(r'(?<![\w.<>])/[^\s:;,\'"()\[\]<>]+')),
+    ('<host>', re.compile(r'\b[a-zA-Z][\w-]*(?:\.[\w-]+){2,}\b')),
+    ('<uuid>', re.compile(r'\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b')),
+    ('<hex>', re.compile(r'\b0x[0-9a-fA-F]+\b')),
+    ('<n>', re.compile(r'\b\d+(?:\.\d+)?')),
+]
+
+# how many clusters are shown per exit code, and how many job ranges per cluster
+TOP_CLUSTERS = 3
+MAX_RANGES = 10
+
+
+def normalizeErrorMessage(message):
+    """ the message with its job specific parts replaced by placeholders """
+    for placeholder, regex in NORMALIZATIONS:
+        message = regex.sub(placeholder, message)
+    return message
+
+
+def jobidRanges(jobids, maxRanges=MAX_RANGES):
+    """ compact list of job ids in the order of the job table, e.g. '1-5, 7, 10-12; probe/tail jobs 0-1, 3-2 ... and 12 more' """
+    return JobidIndex(jobids).toRanges(separator=', ', maxRanges=maxRanges)
+
+
+class ErrorCluster(object):
+    """ jobs failed with the same exit code and similar error messages """
+
+    __slots__ = ['pattern', 'example', 'varying', 'jobids']
+
+    def __init__(self, pattern, message):
+        self.pattern = pattern
+        self.example = message
+        self.varying = False  # True if not all the messages are the same
+        self.jobids = []
+
+    def message(self):
+        """ the message to show: the actual one if all jobs have it, the normalized one otherwise """
+        return self.pattern if self.varying else self.example
+
+
+class ErrorClusters(object):
+    """
+    The failed jobs of a task grouped by exit code, and per exit code in clusters of similar messages.
+      failedJobs: iterable of (jobid, exit code, error message), exit code and message None if not known
+      numFailed   number of jobs in the clusters, i.e. with an exit code
+      unknown     number of jobs without exit code
+    """
+
+    def __init__(self, failedJobs):
+        self._clusters = {}  # exit code: {pattern: ErrorCluster}
+        self._normalized = {}  # message: pattern, each distinct message is normalized once
+        self.numFailed = 0
+        self.unknown = 0
+        for jobid, exitCode, message in failedJobs:
+            if exitCode is None:
+                self.unknown += 1
+                continue
+            self.numFailed += 1
+            message = message or ''
+            pattern = self._normalized.get(message)
+            if pattern is None:
+                pattern = self._normalized[message] = normalizeErrorMessage(message)
+            clusters = self._clusters.setdefault(exitCode, {})
+            cluster = clusters.get(pattern)
+            if cluster is None:
+                cluster = clusters[pattern] = ErrorCluster(pattern, message)
+            elif not cluster.varying and message != cluster.example:
+                cluster.varying = True
+            cluster.jobids.append(jobid)
+
+    def __bool__(self):
+        return bool(self.numFailed or self.unknown)
+
+    __nonzero__ = __bool__
+
+    def count(self, exitCode):
+        """ number of jobs failed with this exit code """
+        return sum(len(cluster.jobids) for cluster in self._clusters[exitCode].values())
+
+    def exitCodes(self, byCode=False):
+        """ the exit codes, from the most to the least frequent, or in numerical order """
+        if byCode:
+            return sorted(self._clusters)
+        return [ec for _, ec in sorted(((self.count(ec), ec) for ec in self._clusters), reverse=True)]
+
+    def numClusters(self, exitCode):
+        return len(self._clusters[exitCode])
+
+    def topClusters(self, exitCode, top=TOP_CLUSTERS):
+        """ the largest clusters of this exit code, largest first, with their jobids sorted """
+        clusters = heapq.nlargest(top, self._clusters[exitCode].values(), key=lambda cluster: len(cluster.jobids))
+        for cluster in clusters:
+            cluster.jobids.sort(key=jobidSortKey)
+        return clusters
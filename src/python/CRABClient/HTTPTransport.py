@@ -0,0 +1,336 @@
+# pylint: disable=consider-using-f-string
+"""
+In-process HTTPS transport used by HTTPRequests.
+Authenticated connections (X509 proxy as client certificate) are kept alive in a
+process-wide pool and reused by all HTTPRequests objects talking to the same host
+with the same credentials (CRABRest, the DBS clients from getDbsREST, the S3 helpers ...),
+so that the process spawn, the TLS handshake and the CA lookup are paid once per host
+rather than once per request.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import os
+import ssl
+import zlib
+import gzip
+import socket
+import threading
+
+try:
+    # Python 2.X
+    import httplib as httpClient
+except ImportError:
+    # Python 3+
+    import http.client as httpClient
+
+# curl exit codes used to report connection level failures, so that callers can keep
+# using the same retry logic (see RestInterfaces.retriableError) for both transports
+CURL_COULDNT_CONNECT = 7
+CURL_OPERATION_TIMEDOUT = 28
+CURL_SSL_CONNECT_ERROR = 35
+CURL_RECV_ERROR = 56
+CURL_SSL_CERTPROBLEM = 58
+
+# seconds to wait for the server when connecting or reading
+DEFAULT_TIMEOUT = 600
+
+# idle connections kept per (host, credentials)
+MAX_IDLE_PER_HOST = 4
+
+# requests which can be sent again after a failure without changing anything on the server
+IDEMPOTENT_VERBS = ('GET', 'HEAD')
+
+# request bodies smaller than this (bytes) are never worth compressing
+COMPRESS_MIN_SIZE = 16 * 1024
+
+# bytes read at a time when a response body is written to a file
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+
+class TransportError(Exception):
+    """
+    Raised when the HTTP exchange could not be completed (no HTTP status available).
+    exitCode is the curl exit code corresponding to the failure.
+    """
+    def __init__(self, msg, exitCode):
+        Exception.__init__(self, msg)
+        self.exitCode = exitCode
+
+
+def nativeTransportEnabled(url=None):
+    """
+    The in-process transport is the default. Forking curl can still be requested with
+    the CRAB_useCurl environment variable (CRAB_useGoCurl selects gocurl as before).
+    curl is also used when an HTTP(S) proxy is configured in the environment, since
+    the native transport does not do tunneling; for an http:// url that is http_proxy.
+    """
+    envVars = ['CRAB_useCurl', 'CRAB_useGoCurl', 'https_proxy', 'HTTPS_PROXY']
+    if url and urlScheme(url) == 'http':
+        envVars += ['http_proxy', 'HTTP_PROXY']
+    for envVar in envVars:
+        if os.getenv(envVar):
+            return False
+    return True
+
+
+def urlScheme(url):
+    """ 'http' for an http:// URL, else 'https', which is also the default without a scheme """
+    return 'http' if url.startswith('http://') else 'https'
+
+
+def splitURL(url):
+    """
+    'https://cmsweb.cern.ch:8443/dbs/prod/global/DBSReader/datasets?dataset=/a/b/c'
+      -> ('cmsweb.cern.ch', 8443, '/dbs/prod/global/DBSReader/datasets?dataset=/a/b/c')
+    the https:// prefix is optional and the port defaults to 443, or to 80 for http://, see urlScheme
+    """
+    scheme = urlScheme(url)
+    if url.startswith(scheme + '://'):
+        url = url[len(scheme + '://'):]
+    if '/' in url:
+        hostport, path = url.split('/', 1)
+        path = '/' + path
+    else:
+        hostport, path = url, '/'
+    if ':' in hostport:
+        host, port = hostport.rsplit(':', 1)
+        port = int(port)
+    else:
+        host, port = hostport, 443 if scheme == 'https' else 80
+    return host, port, path
+
+
+def requestCompressionEnabled():
+    """
+    Compression of request bodies needs support on the server side, so it is only done
+    when asked for via the CRAB_compressRequests environment variable. Responses are always
+    compressed if the server is willing to.
+    """
+    return bool(os.getenv('CRAB_compressRequests'))
+
+
+def compressBody(body):
+    """ gzip a request body """
+    try:
+        return gzip.compress(body)
+    except AttributeError:
+        # python2
+        from io import BytesIO
+        buf = BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb') as fd:
+            fd.write(body)
+        return buf.getvalue()
+
+
+def decodePayload(headers, payload):
+    """ undo the Content-Encoding of a response body, headers is a list of (name, value) """
+    encoding = ''
+    for name, value in headers:
+        if name.lower() == 'content-encoding':
+            encoding = value.strip().lower()
+    if encoding in ['gzip', 'x-gzip']:
+        return zlib.decompress(payload, 16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        try:
+            return zlib.decompress(payload)
+        except zlib.error:
+            # some servers send raw deflate data without the zlib header
+            return zlib.decompress(payload, -zlib.MAX_WBITS)
+    return payload
+
+
+class _StreamDecoder(object):
+    """ undo the Content-Encoding of a response body given one chunk at a time, see decodePayload """
+
+    def __init__(self, headers):
+        encoding = ''
+        for name, value in headers:
+            if name.lower() == 'content-encoding':
+                encoding = value.strip().lower()
+        self.encoding = encoding
+        self.started = False
+        self.decompressor = None
+        if encoding in ['gzip', 'x-gzip']:
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self.decompressor = zlib.decompressobj()
+
+    def decode(self, chunk):
+        if self.decompressor is None:
+            return chunk
+        if self.encoding == 'deflate' and not self.started:
+            self.started = True
+            try:
+                return self.decompressor.decompress(chunk)
+            except zlib.error:
+                # some servers send raw deflate data without the zlib header
+                self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self.decompressor.decompress(chunk)
+
+    def flush(self):
+        return self.decompressor.flush() if self.decompressor is not None else b''
+
+
+def _copyBody(response, headers, stream):
+    """ write the decoded body of response to the binary file object stream, one chunk at a time """
+    decoder = _StreamDecoder(headers)
+    while True:
+        chunk = response.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        stream.write(decoder.decode(chunk))
+    stream.write(decoder.flush())
+
+
+def _exitCodeForException(ex):
+    """ map a python exception into the closest curl exit code """
+    if isinstance(ex, socket.timeout):
+        return CURL_OPERATION_TIMEDOUT
+    if isinstance(ex, ssl.SSLError):
+        return CURL_SSL_CONNECT_ERROR
+    if isinstance(ex, httpClient.HTTPException):
+        return CURL_RECV_ERROR
+    return CURL_COULDNT_CONNECT
+
+
+class HTTPSConnectionPool(object):
+    """
+    Thread safe pool of keep-alive HTTPS connections, and of plain HTTP ones for http:// URLs
+    like some schedd webdirs. A connection is checked out by one caller at a time and returned
+    to the pool once the response has been read.
+    """
+
+    def __init__(self, maxIdlePerHost=MAX_IDLE_PER_HOST):
+        self.maxIdlePerHost = maxIdlePerHost
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._contexts = {}
+
+    def _sslContext(self, cert, key, capath):
+        """ one SSL context per set of credentials, it holds the loaded proxy and CA path """
+        ctxKey = (cert, key, capath)
+        with self._lock:
+            ctx = self._contexts.get(ctxKey)
+            if ctx is None:
+                ctx = ssl.create_default_context(ssl.Purpose.SERVER_AUTH, capath=capath)
+                if cert:
+                    ctx.load_cert_chain(certfile=cert, keyfile=key or cert)
+                self._contexts[ctxKey] = ctx
+        return ctx
+
+    def _checkout(self, poolKey, timeout):
+        """ return (connection, reused) """
+        with self._lock:
+            idle = self._idle.get(poolKey)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        scheme, host, port, cert, key, capath = poolKey
+        if scheme == 'http':
+            return httpClient.HTTPConnection(host, port, timeout=timeout), False
+        try:
+            context = self._sslContext(cert, key, capath)
+        except (IOError, ssl.SSLError) as ex:
+            raise TransportError("Cannot use certificate %s and CA path %s: %s" % (cert, capath, ex),
+                                 CURL_SSL_CERTPROBLEM)
+        conn = httpClient.HTTPSConnection(host, port, timeout=timeout, context=context)
+        return conn, False
+
+    def _checkin(self, poolKey, conn):
+        with self._lock:
+            idle = self._idle.setdefault(poolKey, [])
+            if len(idle) < self.maxIdlePerHost:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def closeAll(self):
+        """ close all idle connections, e.g. when credentials have changed """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+            self._contexts = {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+    def request(self, verb, host, port, path, body=None, headers=None,
+                cert=None, key=None, capath=None, timeout=DEFAULT_TIMEOUT, stream=None, scheme='https'):
+        """
+        Execute one HTTP exchange and return the tuple (status, reason, headers, body)
+        where headers is the list of (name, value) pairs as sent by the server and body
+        is the response payload (bytes), already decompressed if the server sent it compressed.
+        If stream, a binary file object, is given, a body with status 200 is written there
+        as it arrives instead, and the returned body is empty.
+        With scheme 'http' the connection is not encrypted and the credentials are not used.
+        Raises TransportError if no HTTP response could be obtained.
+        """
+        poolKey = (scheme, host, port, cert, key, capath)
+        headers = dict(headers or {})
+        headers.setdefault('Accept-Encoding', 'gzip, deflate')
+        attempt = 0
+        while True:
+            conn, reused = self._checkout(poolKey, timeout)
+            sent = False
+            try:
+                conn.request(verb, path, body, headers)
+                sent = True
+                response = conn.getresponse()
+                if stream is not None and response.status == 200:
+                    stream.seek(0)
+                    stream.truncate()
+                    _copyBody(response, response.getheaders(), stream)
+                    payload = None
+                else:
+                    payload = response.read()
+            except zlib.error as ex:
+                conn.close()
+                raise TransportError("%s %s://%s:%s%s: cannot decode response: %s" % (verb, scheme, host, port, path, ex),
+                                     CURL_RECV_ERROR)
+            except (socket.error, httpClient.HTTPException) as ex:
+                conn.close()
+                exitCode = _exitCodeForException(ex)
+                # a connection which was idle in the pool may have been closed by the server
+                # in the meantime; in that case nothing was processed and we try once more.
+                # Once a request was sent the server may have processed it, so only requests
+                # which can safely be done twice are sent again
+                if reused and attempt == 0 and exitCode != CURL_OPERATION_TIMEDOUT and \
+                        (not sent or verb in IDEMPOTENT_VERBS):
+                    attempt += 1
+                    continue
+                raise TransportError("%s %s://%s:%s%s failed: %s" % (verb, scheme, host, port, path, ex), exitCode)
+            except Exception:
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(poolKey, conn)
+            respHeaders = response.getheaders()
+            if payload is None:
+                return response.status, response.reason, respHeaders, b''
+            try:
+                payload = decodePayload(respHeaders, payload)
+            except zlib.error as ex:
+                raise TransportError("%s %s://%s:%s%s: cannot decode response: %s" % (verb, scheme, host, port, path, ex),
+                                     CURL_RECV_ERROR)
+            return response.status, response.reason, respHeaders, payload
+
+
+## The process-wide connection pool.
+POOL = HTTPSConnectionPool()
+
+
+def formatResponseHeader(status, reason, headers):
+    """
+    Render status line and headers in the same way as curl -v does on stderr,
+    so that the text can be parsed by the same code (e.g. X-Error-Detail in crab.py)
+    """
+    lines = ["< HTTP/1.1 %s %s" % (status, reason)]
+    for name, value in headers:
+        lines.append("< %s: %s" % (name, value))
+    return "\n".join(lines) + "\n"
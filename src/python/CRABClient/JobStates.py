@@ -0,0 +1,290 @@
+# pylint: disable=consider-using-f-string
+"""
+Compact in-memory representation of the per-job information of a task, i.e. of the
+'nodes' dictionary of the status_cache written by the schedd:
+    {'1': {'State': 'finished', 'Retries': 0, 'SiteHistory': ['T2_CH_CERN'], 'WallDurations': [1234], ...}, ...}
+As nested python dictionaries this takes about 2KB per job. Here the values of each key are
+kept for all jobs in one column: numbers in arrays, strings utf-8 encoded in one buffer,
+and lists as a slice of such a column, which takes about ten times less memory.
+Values which do not fit (mixed types, dictionaries ...) are kept as python objects.
+
+JobStates is a read-only mapping jobid -> job information, the job information is again
+a read-only mapping built on access, so code written for the nested dictionaries keeps working:
+    jobs['12']['State'], jobs['12'].get('SiteHistory'), for jobid, info in jobs.items() ...
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import sys
+from array import array
+
+try:
+    from collections.abc import Mapping
+except ImportError:
+    from collections import Mapping  # pylint: disable=deprecated-class
+
+if sys.version_info >= (3, 0):
+    def _encode(value):
+        return value.encode('utf-8', 'surrogatepass')
+
+    def _decode(data):
+        return data.decode('utf-8', 'surrogatepass')
+else:
+    # python2 str are bytes already
+    def _encode(value):
+        return value
+
+    def _decode(data):
+        return str(data)
+
+# decoded strings are reused up to this number of different values per column,
+# so that e.g. the state or the site of 100k jobs are not 100k separate strings
+DECODE_CACHE_SIZE = 1000
+
+
+_KINDS = {int: 'int', float: 'float', str: 'str'}
+if sys.version_info < (3, 0):
+    _KINDS[long] = 'int'  # pylint: disable=undefined-variable
+
+
+def _kindOf(value):
+    """ how a value is stored: 'int', 'float', 'str', or 'obj' for anything else (bool included) """
+    return _KINDS.get(type(value), 'obj')
+
+
+class _Values(object):
+    """ a growing sequence of values of one kind, packed according to the kind """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.types = frozenset(t for t, k in _KINDS.items() if k == kind)
+        self.ends = None
+        self.decoded = None
+        if kind == 'int':
+            # 4 bytes per number, widened to 8 bytes the first time a number does not fit
+            self.data = array('i')
+        elif kind == 'float':
+            self.data = array('d')
+        elif kind == 'str':
+            self.data = bytearray()
+            self.ends = array('i')
+            self.decoded = {}
+        else:
+            self.data = []
+
+    def __len__(self):
+        return len(self.ends) if self.kind == 'str' else len(self.data)
+
+    def append(self, value):
+        """ returns False if the value does not fit in this sequence """
+        return self.extend((value,))
+
+    def extend(self, items):
+        """ returns False, leaving the sequence unchanged, if some of the items do not fit """
+        kind = self.kind
+        if kind == 'obj':
+            self.data.extend(items)
+            return True
+        if not self.types.issuperset(map(type, items)):
+            return False
+        if kind == 'str':
+            for item in items:
+                self.data.extend(_encode(item))
+                self.ends.append(len(self.data))
+            return True
+        length = len(self.data)
+        try:
+            self.data.extend(items)
+        except OverflowError:
+            del self.data[length:]
+            if self.data.typecode != 'i':
+                return False
+            self.data = array('l', self.data)
+            return self.extend(items)
+        return True
+
+    def get(self, i):
+        if self.kind != 'str':
+            return self.data[i]
+        start = self.ends[i-1] if i > 0 else 0
+        raw = bytes(self.data[start:self.ends[i]])
+        value = self.decoded.get(raw)
+        if value is None:
+            value = _decode(raw)
+            if len(self.decoded) < DECODE_CACHE_SIZE:
+                self.decoded[raw] = value
+        return value
+
+    def slice(self, start, end):
+        if self.kind in ['int', 'float', 'obj']:
+            return list(self.data[start:end])
+        return [self.get(i) for i in range(start, end)]
+
+
+class _Column(object):
+    """
+    The values of one key for all the jobs. Either one value per job (scalar column),
+    or a list per job (list column) whose elements are stored one after the other
+    and found via the end offset of each job. Jobs without the key get a placeholder.
+    """
+
+    PLACEHOLDERS = {'int': 0, 'float': 0.0, 'str': ''}
+
+    def __init__(self, isList, kind, numRows):
+        self.isList = isList
+        self.present = bytearray(numRows)  # 1 for the jobs which have this key
+        self.values = _Values(kind)
+        if isList:
+            self.ends = array('i', [0] * numRows)
+        else:
+            self.ends = None
+            for _ in range(numRows):
+                self.values.append(self.PLACEHOLDERS.get(kind))
+
+    @classmethod
+    def forValue(cls, value, numRows):
+        """ a new column for a key first seen with this value after numRows jobs """
+        if type(value) is list:  # pylint: disable=unidiomatic-typecheck
+            return cls(True, _kindOf(value[0]) if value else 'int', numRows)
+        return cls(False, _kindOf(value), numRows)
+
+    def add(self, value):
+        """ returns False if the value does not fit and the column must be converted with toObjects """
+        values = self.values
+        if not self.isList:
+            if not values.append(value):
+                return False
+            self.present.append(1)
+            return True
+        if type(value) is not list:  # pylint: disable=unidiomatic-typecheck
+            return False
+        if value and not len(values) and values.kind != _kindOf(value[0]):
+            # the lists seen so far were all empty, the kind was only a guess
+            self.values = values = _Values(_kindOf(value[0]))
+        if values.kind == 'obj':
+            return False
+        if not values.extend(value):
+            return False
+        self.present.append(1)
+        self.ends.append(len(values))
+        return True
+
+    def addMissing(self):
+        self.present.append(0)
+        if self.isList:
+            self.ends.append(self.ends[-1] if self.ends else 0)
+        else:
+            self.values.append(self.PLACEHOLDERS.get(self.values.kind))
+
+    def get(self, row):
+        if self.isList:
+            start = self.ends[row-1] if row > 0 else 0
+            return self.values.slice(start, self.ends[row])
+        return self.values.get(row)
+
+    def toObjects(self):
+        """ an equivalent scalar column with the values kept as python objects """
+        column = _Column(False, 'obj', 0)
+        column.present = self.present
+        column.values.data = [self.get(row) for row in range(len(self.present))]
+        return column
+
+
+class _JobView(Mapping):
+    """ the information of one job, read from the columns when accessed """
+
+    __slots__ = ['_table', '_row']
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        column = self._table.columns.get(key)
+        if column is None or not column.present[self._row]:
+            raise KeyError(key)
+        return column.get(self._row)
+
+    def __iter__(self):
+        row = self._row
+        return (key for key, column in self._table.columns.items() if column.present[row])
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class JobStates(Mapping):
+    """
+    Read-only mapping jobid -> job information, see the module documentation.
+    Build it with JobStates.fromNodes(statusCache['nodes']).
+    """
+
+    def __init__(self):
+        self.jobids = []
+        self.columns = {}
+        self._index = None
+
+    @classmethod
+    def fromNodes(cls, nodes):
+        """
+        Convert the nodes dictionary of a status_cache. The dictionary is emptied on the way,
+        so that the memory of the nested dictionaries is released while the columns grow.
+        The 'DagStatus' record, which is not a job, is dropped.
+        """
+        jobStates = cls()
+        nodes.pop('DagStatus', None)
+        for jobid in list(nodes):
+            jobStates.add(jobid, nodes.pop(jobid))
+        return jobStates
+
+    def add(self, jobid, info):
+        """ append one job, info being its dictionary from the status_cache """
+        row = len(self.jobids)
+        self.jobids.append(jobid)
+        self._index = None
+        for key, column in self.columns.items():
+            if key not in info:
+                column.addMissing()
+        for key, value in info.items():
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = _Column.forValue(value, row)
+            if not column.add(value):
+                column = self.columns[key] = column.toObjects()
+                column.add(value)
+
+    def _rowOf(self, jobid):
+        if self._index is None:
+            self._index = dict((j, row) for row, j in enumerate(self.jobids))
+        return self._index[jobid]
+
+    def __getitem__(self, jobid):
+        return _JobView(self, self._rowOf(jobid))
+
+    def __contains__(self, jobid):
+        try:
+            self._rowOf(jobid)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(self.jobids)
+
+    def __len__(self):
+        return len(self.jobids)
+
+    def items(self):  # pylint: disable=invalid-overridden-method
+        """ (jobid, job information) in the original order, without looking up each jobid """
+        return ((jobid, _JobView(self, row)) for row, jobid in enumerate(self.jobids))
+
+    def toDict(self):
+        """ the nested dictionaries, as they were in the status_cache, e.g. to serialize them """
+        return dict((jobid, dict(info.items())) for jobid, info in self.items())
+
+    def __repr__(self):
+        return repr(self.toDict())
@@ -7,7 +7,8 @@ from __future__ import division
 from __future__ import print_function
 
 import os
-import random
+import copy
+import time
 import json
 import re
 import tempfile
@@ -31,6 +32,10 @@ except ImportError:
     from http import HTTPStatus
 
 from CRABClient.ClientUtilities import execute_command
+from CRABClient.HTTPTransport import (POOL, TransportError, nativeTransportEnabled, splitURL, formatResponseHeader,
+                                      requestCompressionEnabled, compressBody, COMPRESS_MIN_SIZE)
+from CRABClient.RetryPolicy import RetryPolicy, getCircuitBreaker, parseRetryAfter
+from CRABClient.Timing import recordRequest
 from ServerUtilities import encodeRequest
 from CRABClient.ClientExceptions import RESTInterfaceException, ConfigurationException
 
@@ -42,6 +47,32 @@ except:  # pylint: disable=bare-except
 
 EnvironmentException = Exception
 
+## Results of the GET calls made via CRABRest during the current crab command.
+## Several commands query the same information more than once (e.g. getoutput, resubmit and
+## report run a muted status command after having already done their own 'task search'),
+## identical reads are served from here instead of going again to the server.
+REQUESTMEMO = {}
+## Only the reads which are repeated are kept, others can be large (e.g. filemetadata, data2):
+## the 'task' subresources below, e.g. read by ServerUtilities.getProxiedWebDir, and
+## the calls made with memoize=True
+MEMOIZED_TASK_SUBRESOURCES = ('search', 'webdir', 'webdirprx')
+
+
+def clearRequestMemo():
+    """
+    Forget all memoized GET results. To be called when a new crab command starts
+    (crab.py and CRABAPI do it) and whenever a request may have changed something on the server.
+    """
+    REQUESTMEMO.clear()
+
+
+def _memoKey(host, uri, data):
+    """ build a hashable key out of a CRABRest GET call """
+    if isinstance(data, dict):
+        data = json.dumps(data, sort_keys=True)
+    return (host, uri, str(data))
+
+
 def retriableError(http_code, curlExitCode):
     """
         checks if error is worth retrying
@@ -93,8 +124,11 @@ def parseResponseHeader(response):
 
 class HTTPRequests(dict):
     """
-    This code forks a subprocess which executes curl to communicate
-    with CRAB or other REST servers which returns JSON
+    This code communicates with CRAB or other REST servers which return JSON.
+    By default requests go through the in-process connection pool of HTTPTransport,
+    which keeps authenticated connections alive across calls. A subprocess which
+    executes curl (or gocurl) is forked instead if requested via environment, see
+    HTTPTransport.nativeTransportEnabled()
     """
 
     def __init__(self, hostname='localhost', localcert=None, localkey=None, contentType=None,
@@ -177,55 +211,90 @@ class HTTPRequests(dict):
             data = encodeRequest(data)
         self.logger.debug("Encoded data for curl request: %s", data)
 
-        fh, path = tempfile.mkstemp(dir='/tmp', prefix='crab_curlData')
-        os.close(fh)  # fh handle is for binary write and inconvenient to use
-        with open(path, 'w') as f:
-            f.write(data)
+        # the request body is handed over in memory: directly to the native transport, or via stdin to curl.
+        # Only gocurl needs it in a file
+        useNative = nativeTransportEnabled()
+        if not os.getenv('CRAB_useGoCurl'):
+            path = None
+        else:
+            fh, path = tempfile.mkstemp(dir='/tmp', prefix='crab_curlData')
+            os.close(fh)  # fh handle is for binary write and inconvenient to use
+            with open(path, 'w') as f:
+                f.write(data)
 
         if verb in ['GET', 'HEAD']:
             url = url + '?' + data
 
+        # command is only needed if the request is executed by forking curl (or gocurl)
         command = ''
-
-        # CRAB_useGoCurl env. variable is used to define how request should be executed
-        # If variable is set, then goCurl is used for command execution: https://github.com/vkuznet/gocurl
-        # Same variable is also used inside CRABServer, we should keep name changes (if any) synchronized
-        if os.getenv('CRAB_useGoCurl'):
-            command += '/cvmfs/cms.cern.ch/cmsmon/gocurl -verbose 2 -method {0}'.format(verb)
-            command += ' -header "User-Agent: %s"' % self['userAgent']
-            command += ' -header "Accept: */*"'
-            if self['Content-type']:
-                command += ' -header "Content-type: %s"' % self['Content-type']
-            command += ' -data "@%s"' % path
-            command += ' -cert "%s"' % self['cert']
-            command += ' -key "%s"' % self['key']
-            command += ' -capath "%s"' % caCertPath
-            command += ' -url "%s" | tee /dev/stderr ' % url
-        else:
-            command += 'curl -v -X {0}'.format(verb)
-            command += ' -H "User-Agent: %s"' % self['userAgent']
-            command += ' -H "Accept: */*"'
-            if self['Content-type']:
-                command += ' -H "Content-type: %s"' % self['Content-type']
-            command += ' --data @%s' % path
-            command += ' --cert "%s"' % self['cert']
-            command += ' --key "%s"' % self['key']
-            command += ' --capath "%s"' % caCertPath
-            command += ' "%s" | tee /dev/stderr ' % url
+        if not useNative:
+            # CRAB_useGoCurl env. variable is used to define how request should be executed
+            # If variable is set, then goCurl is used for command execution: https://github.com/vkuznet/gocurl
+            # Same variable is also used inside CRABServer, we should keep name changes (if any) synchronized
+            if os.getenv('CRAB_useGoCurl'):
+                command += '/cvmfs/cms.cern.ch/cmsmon/gocurl -verbose 2 -method {0}'.format(verb)
+                command += ' -header "User-Agent: %s"' % self['userAgent']
+                command += ' -header "Accept: */*"'
+                if self['Content-type']:
+                    command += ' -header "Content-type: %s"' % self['Content-type']
+                command += ' -data "@%s"' % path
+                command += ' -cert "%s"' % self['cert']
+                command += ' -key "%s"' % self['key']
+                command += ' -capath "%s"' % caCertPath
+                command += ' -url "%s" | tee /dev/stderr ' % url
+            else:
+                command += 'curl -v --compressed -X {0}'.format(verb)
+                command += ' -H "User-Agent: %s"' % self['userAgent']
+                command += ' -H "Accept: */*"'
+                if self['Content-type']:
+                    command += ' -H "Content-type: %s"' % self['Content-type']
+                command += ' --data @-'
+                command += ' --cert "%s"' % self['cert']
+                command += ' --key "%s"' % self['key']
+                command += ' --capath "%s"' % caCertPath
+                command += ' "%s" | tee /dev/stderr ' % url
 
         # retries this up at least 3 times, or up to self['retry'] times for range of exit codes
         # retries are counted AFTER 1st try, so call is made up to nRetries+1 times !
+        # wait time between attempts is decided by the RetryPolicy, and no attempt at all is made
+        # if previous requests (also from other HTTPRequests objects) found the host down
         nRetries = max(2, self['retry'])
+        policy = RetryPolicy()
+        breaker = getCircuitBreaker(self['host'])
+        startTime = time.time()
         for i in range(nRetries + 1):
-            curlLogger = self.logger if self['verbose'] else None
-            stdout, stderr, curlExitCode = execute_command(command=command, logger=curlLogger)
-            http_code, http_reason = parseResponseHeader(stderr)
+            if not breaker.allowRequest():
+                msg = "Too many consecutive failures contacting %s, will not try again for %d seconds." % \
+                      (self['host'], breaker.retryIn())
+                self.logger.info(msg)
+                if path:
+                    os.remove(path)
+                raise RESTInterfaceException(msg)
+            if useNative:
+                stdout, stderr, curlExitCode, http_code, http_reason = self.nativeRequest(verb, url, data, caCertPath)
+            else:
+                curlLogger = self.logger if self['verbose'] else None
+                stdout, stderr, curlExitCode = execute_command(command=command, logger=curlLogger,
+                                                               inputData=None if path else data)
+                http_code, http_reason = parseResponseHeader(stderr)
 
             if curlExitCode != 0 or http_code != 200:
-                if (i < 2) or (retriableError(http_code, curlExitCode) and (i < self['retry'])):
-                    sleeptime = 20 * (i + 1) + random.randint(-10, 10)
-                    msg = "Sleeping %s seconds after HTTP error.\nError:\n:%s" % (sleeptime, stderr)
+                retriable = retriableError(http_code, curlExitCode)
+                # only failures which indicate a problem on the server side (or no answer at all)
+                # count for the circuit breaker
+                if retriable or curlExitCode != 0 or http_code >= 500:
+                    breaker.recordFailure()
+                else:
+                    breaker.recordSuccess()
+                # the server understood the request and refused it, asking again will not help
+                clientError = 400 <= http_code < 500 and not retriable
+                sleeptime = None
+                if not clientError and ((i < 2) or (retriable and (i < self['retry']))):
+                    sleeptime = policy.delay(i + 1, parseRetryAfter(stderr))
+                if sleeptime is not None:
+                    msg = "Sleeping %.1f seconds after HTTP error.\nError:\n:%s" % (sleeptime, stderr)
                     self.logger.debug(msg)
+                    time.sleep(sleeptime)
                 else:
                     # this was the last retry
                     msg = "Fatal error trying to connect to %s using %s." % (url, data)
@@ -233,9 +302,13 @@ class HTTPRequests(dict):
                     msg += "\nHTTP code/reason = %s/%s ." % (http_code, http_reason)
                     msg += "  stdout:\n%s" % stdout
                     self.logger.info(msg)
-                    os.remove(path)
+                    recordRequest(verb, url, http_code, time.time() - startTime, len(data), len(stdout), i + 1)
+                    if path:
+                        os.remove(path)
                     raise RESTInterfaceException(stderr)
             else:
+                breaker.recordSuccess()
+                recordRequest(verb, url, http_code, time.time() - startTime, len(data), len(stdout), i + 1)
                 try:
                     curlResult = json.loads(stdout)
                     break
@@ -243,10 +316,45 @@ class HTTPRequests(dict):
                     msg = "Fatal error reading data from %s using %s: \n%s" % (url, data, ex)
                     raise Exception(msg)
                 finally:
-                    os.remove(path)
+                    if path:
+                        os.remove(path)
 
         return curlResult, http_code, http_reason
 
+    def nativeRequest(self, verb, url, data, caCertPath):
+        """
+        Execute the HTTP call via the shared connection pool.
+        Returns the same information that makeRequest extracts from a curl execution, i.e.
+        the 5-ple: stdout (body, as bytes for successful calls), stderr (text with the response header in curl -v format),
+        exit code (0 or the curl exit code matching the connection failure), HTTP code and reason.
+        As curl --data does, the payload is sent for every verb, form-encoded unless specified otherwise.
+        Large POST/PUT payloads are gzipped if CRAB_compressRequests is set, see HTTPTransport.
+        """
+        host, port, path = splitURL(url)
+        headers = {'User-Agent': self['userAgent'], 'Accept': '*/*',
+                   'Content-type': self['Content-type'] or 'application/x-www-form-urlencoded'}
+        body = data.encode('utf-8') if not isinstance(data, bytes) else data
+        if verb in ['POST', 'PUT'] and len(body) >= COMPRESS_MIN_SIZE and requestCompressionEnabled():
+            body = compressBody(body)
+            headers['Content-Encoding'] = 'gzip'
+        try:
+            http_code, http_reason, respHeaders, payload = POOL.request(
+                verb, host, port, path, body=body, headers=headers,
+                cert=self['cert'], key=self['key'], capath=caCertPath)
+        except TransportError as ex:
+            return '', str(ex), ex.exitCode, 9999, ''
+        stderr = formatResponseHeader(http_code, http_reason, respHeaders)
+        if http_code == 200:
+            # json.loads takes the bytes as they are, no need for a decoded copy of a possibly large body
+            stdout = payload
+        else:
+            stdout = payload.decode('utf-8', 'replace') if payload else ''
+            # same as curl | tee /dev/stderr, so that error details in the body reach the caller
+            stderr += stdout
+        if self['verbose']:
+            self.logger.debug("%s %s\n%s", verb, url, stderr)
+        return stdout, stderr, 0, http_code, http_reason
+
     @staticmethod
     def getCACertPath():
         """ Get the CA certificate path. It looks for it in the X509_CERT_DIR variable if present
@@ -286,20 +394,39 @@ class CRABRest:
     def getDbInstance(self):
         return self.uriNoApi.rstrip('/').split('/')[-1]
 
-    def get(self, api=None, data=None):
+    def get(self, api=None, data=None, memoize=None):
+        """
+        Identical GET calls made during the same crab command are only sent once to the server,
+        see REQUESTMEMO, if memoize is True or, by default, for the MEMOIZED_TASK_SUBRESOURCES.
+        Use memoize=False when polling for something which is expected to change.
+        The first caller gets the kept result itself and must not modify it, the next ones get copies.
+        """
         uri = self.uriNoApi + api
-        return self.server.get(uri, data)
+        if memoize is None:
+            memoize = api == 'task' and isinstance(data, dict) and data.get('subresource') in MEMOIZED_TASK_SUBRESOURCES
+        if not memoize:
+            return self.server.get(uri, data)
+        key = _memoKey(self.server['host'], uri, data)
+        if key not in REQUESTMEMO:
+            REQUESTMEMO[key] = self.server.get(uri, data)
+            return REQUESTMEMO[key]
+        self.server.logger.debug("Reusing result of previous identical request: GET %s %s", uri, data)
+        # hand out a copy, callers are free to modify what they get
+        return copy.deepcopy(REQUESTMEMO[key])
 
     def post(self, api=None, data=None):
         uri = self.uriNoApi + api
+        clearRequestMemo()
         return self.server.post(uri, data)
 
     def put(self, api=None, data=None):
         uri = self.uriNoApi + api
+        clearRequestMemo()
         return self.server.put(uri, data)
 
     def delete(self, api=None, data=None):
         uri = self.uriNoApi + api
+        clearRequestMemo()
         return self.server.delete(uri, data)
 
 
@@ -0,0 +1,136 @@
+# pylint: disable=consider-using-f-string
+"""
+Retry policy for the HTTP calls done by HTTPRequests:
+ - exponential backoff with jitter, starting from a short delay, so that a single transient
+   error costs a couple of seconds and many clients retrying at the same time do not all hit
+   the server again in the same instant
+ - the Retry-After hint sent by the server (e.g. with 429 and 503) is honored
+ - a per-host circuit breaker: after several consecutive failures the host is considered down
+   and further requests fail immediately for a while, instead of each one going through its
+   full retry sequence
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import re
+import time
+import random
+import threading
+from email.utils import parsedate_tz, mktime_tz
+
+# seconds, first delay is in [BASE_DELAY/2, BASE_DELAY], then it doubles at every attempt
+BASE_DELAY = 2
+# seconds, no computed delay is longer than this
+MAX_DELAY = 60
+# seconds, a Retry-After longer than this is not worth waiting for
+MAX_RETRY_AFTER = 300
+
+# consecutive failures which open the circuit for a host
+BREAKER_THRESHOLD = 5
+# seconds during which requests to a host with open circuit are refused
+BREAKER_COOLDOWN = 60
+
+
+def parseRetryAfter(header, now=None):
+    """
+    Extract the Retry-After value, in seconds, from a response header in curl -v format
+    (lines like '< Retry-After: 120'). The header value can be either a number of seconds
+    or an HTTP date. Returns None if not present or not understood.
+    """
+    match = re.search(r'^<?\s*Retry-After:\s*([^\r\n]+)', header or '', re.IGNORECASE | re.MULTILINE)
+    if not match:
+        return None
+    value = match.group(1).strip()
+    if value.isdigit():
+        return int(value)
+    parsed = parsedate_tz(value)
+    if not parsed:
+        return None
+    now = now if now is not None else time.time()
+    return max(0, int(mktime_tz(parsed) - now))
+
+
+class RetryPolicy(object):
+    """
+    Compute how long to wait before the next attempt
+    """
+
+    def __init__(self, baseDelay=BASE_DELAY, maxDelay=MAX_DELAY, maxRetryAfter=MAX_RETRY_AFTER):
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.maxRetryAfter = maxRetryAfter
+
+    def delay(self, attempt, retryAfter=None):
+        """
+        attempt: number of attempts already failed, starting from 1
+        retryAfter: seconds requested by the server, if any
+        returns: seconds to wait, or None if the server asked to wait for too long
+        """
+        if retryAfter is not None:
+            if retryAfter > self.maxRetryAfter:
+                return None
+            # a little jitter on top, so that clients told the same thing do not come back together
+            return retryAfter + random.uniform(0, self.baseDelay)
+        cap = min(self.maxDelay, self.baseDelay * 2 ** (attempt - 1))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+
+class CircuitBreaker(object):
+    """
+    Count consecutive failures towards one host. When they reach the threshold the circuit
+    opens and requests are refused until the cooldown has passed, then one request is let
+    through: if it succeeds the circuit closes again, otherwise it stays open for another cooldown.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.openedAt = None
+        self._lock = threading.Lock()
+
+    def allowRequest(self, now=None):
+        """ False if the circuit is open """
+        now = now if now is not None else time.time()
+        with self._lock:
+            if self.openedAt is None:
+                return True
+            if now - self.openedAt >= self.cooldown:
+                # half open: let this one go, a failure will reopen the circuit at once
+                self.openedAt = None
+                self.failures = self.threshold - 1
+                return True
+            return False
+
+    def recordSuccess(self):
+        with self._lock:
+            self.failures = 0
+            self.openedAt = None
+
+    def recordFailure(self, now=None):
+        now = now if now is not None else time.time()
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.openedAt = now
+
+    def retryIn(self, now=None):
+        """ seconds until requests are allowed again, 0 if the circuit is closed """
+        now = now if now is not None else time.time()
+        with self._lock:
+            if self.openedAt is None:
+                return 0
+            return max(0, int(self.cooldown - (now - self.openedAt)))
+
+
+## One circuit breaker per host, shared by all HTTPRequests objects in the process.
+BREAKERS = {}
+_breakersLock = threading.Lock()
+
+
+def getCircuitBreaker(host):
+    with _breakersLock:
+        if host not in BREAKERS:
+            BREAKERS[host] = CircuitBreaker()
+        return BREAKERS[host]
@@ -0,0 +1,91 @@
+# pylint: disable=consider-using-f-string
+"""
+Machine readable export of the per-job status of a task, one record per job:
+    ndjson  one JSON object per line, e.g. {"jobid": "12", "state": "finished", "exitcode": 0, ...}
+    csv     a header line with the field names, then one line per job
+Records are written one at a time in the order of the job table, so that the memory
+used does not grow with the number of jobs and the consumer can process them as they come.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import csv
+import json
+from collections import OrderedDict
+
+from CRABClient.StatusSummary import JobRow, translateJobStatus
+
+EXPORT_FORMATS = ['ndjson', 'csv']
+
+
+def _exitCode(row, _):
+    return int(row.exitcode) if row.exitcode.lstrip('-').isdigit() else None
+
+
+def _clusterId(_, info):
+    clusterIds = info.get('JobIds')
+    return clusterIds[-1] if clusterIds else None
+
+
+# field: function(JobRow, job information) returning the value, None if not known
+EXPORT_FIELDS = {
+    'jobid': lambda row, _: row.jobid,
+    'state': lambda row, _: row.state,
+    'site': lambda row, _: row.site or None,
+    'exitcode': _exitCode,
+    'walltime': lambda row, _: row.wall if row.hasWall else None,
+    'waste': lambda row, _: row.waste if row.hasWall else None,
+    'memory': lambda row, _: row.memory,
+    'cpu': lambda row, _: row.cpu,
+    'retries': lambda row, _: row.retries,
+    'restarts': lambda row, _: row.restarts,
+    'clusterid': _clusterId,
+}
+DEFAULT_EXPORT_FIELDS = ['jobid', 'state', 'site', 'exitcode', 'walltime', 'memory', 'retries']
+
+
+def parseExportFields(fields):
+    """ the list of fields from a comma separated string, raises ValueError for unknown ones """
+    fields = [field.strip().lower() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in EXPORT_FIELDS]
+    if unknown:
+        raise ValueError("unknown field(s) %s, known fields are: %s" % (', '.join(unknown), ', '.join(sorted(EXPORT_FIELDS))))
+    return fields
+
+
+def exportRecords(summary, fields, jobids=None):
+    """
+    Generator of one tuple of field values per job, in the order of the job table.
+      summary: the StatusSummary of the task
+      jobids: restrict to these jobs, all jobs if None
+    """
+    getters = [EXPORT_FIELDS[field] for field in fields]
+    jobStates = summary.jobStates
+    if jobids is None:
+        jobids = summary.sortedJobids()
+    for jobid in jobids:
+        info = jobStates[jobid]
+        row = JobRow(jobid, info, translateJobStatus(jobid, info['State'], summary.automaticSplitt), summary.numCores)
+        yield tuple(getter(row, info) for getter in getters)
+
+
+def exportStatus(stream, exportFormat, summary, fields=None, jobids=None):
+    """ write the records of exportRecords to a text stream, returns the number of jobs written """
+    fields = fields or DEFAULT_EXPORT_FIELDS
+    records = exportRecords(summary, fields, jobids)
+    numJobs = 0
+    if exportFormat == 'csv':
+        writer = csv.writer(stream, lineterminator='\n')
+        writer.writerow(fields)
+        for record in records:
+            writer.writerow(['' if value is None else value for value in record])
+            numJobs += 1
+    else:
+        encoder = json.JSONEncoder(separators=(',', ':'))
+        for record in records:
+            stream.write(encoder.encode(OrderedDict(zip(fields, record))))
+            stream.write('\n')
+            numJobs += 1
+    stream.flush()
+    return numJobs
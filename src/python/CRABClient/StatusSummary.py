@@ -0,0 +1,284 @@
+# pylint: disable=consider-using-f-string
+"""
+Aggregation of the per-job information in the status_cache of a task.
+All the views printed by crab status (overview, errors, job table, resource usage,
+site summary, sorted lists) are computed from one pass over the jobs, which matters
+for tasks with tens of thousands of jobs.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import math
+import random
+
+from CRABClient.ClientUtilities import jobidSortKey
+
+# the percentiles of a resource printed by crab status --sort
+PERCENTILES = (50, 90, 99)
+
+
+def translateJobStatus(jobid, state, automaticSplitt):
+    """ the state of a job as shown in the job table """
+    if state == 'cooloff':
+        state = 'toRetry'
+    if not automaticSplitt:
+        return state
+    if jobid.startswith('0-') and state in ('finished', 'failed'):
+        return 'no output'
+    elif '-' not in jobid and state == 'failed':
+        return 'rescheduled'
+    return state
+
+
+def percentiles(values, ranks=PERCENTILES):
+    """
+    Nearest-rank percentiles of a list of numbers, as a dictionary {rank: value},
+    plus 'count': the number of values. Empty if there are no values.
+    """
+    if not values:
+        return {}
+    positions = dict((rank, max(0, int(math.ceil(rank / 100 * len(values))) - 1)) for rank in ranks)
+    selected = select(values, positions.values())
+    result = dict((rank, selected[position]) for rank, position in positions.items())
+    result['count'] = len(values)
+    return result
+
+
+def select(values, positions):
+    """
+    The values which would be at the given positions of sorted(values), as a dictionary
+    {position: value}, found by quickselect in linear time on average, i.e. without sorting.
+    Only the parts of the list which hold some of the positions are partitioned again.
+    """
+    result = {}
+    # (part of the values, [(position in the part, position in values)])
+    pending = [(values, [(position, position) for position in set(positions)])]
+    while pending:
+        part, wanted = pending.pop()
+        pivot = random.choice(part)
+        lower = [value for value in part if value < pivot]
+        higher = [value for value in part if value > pivot]
+        numLowerOrEqual = len(part) - len(higher)
+        lowerWanted, higherWanted = [], []
+        for position, original in wanted:
+            if position < len(lower):
+                lowerWanted.append((position, original))
+            elif position < numLowerOrEqual:
+                result[original] = pivot
+            else:
+                higherWanted.append((position - numLowerOrEqual, original))
+        if lowerWanted:
+            pending.append((lower, lowerWanted))
+        if higherWanted:
+            pending.append((higher, higherWanted))
+    return result
+
+
+class ResourceStats(object):
+    """
+    Memory, runtime and CPU efficiency of the jobs which have run,
+    i.e. the numbers for the "Summary of run jobs" of crab status
+    """
+
+    def __init__(self):
+        self.memCount = 0
+        self.memMin = -1
+        self.memMax = 0
+        self.memSum = 0
+        self.runCount = 0
+        self.runMin = -1
+        self.runMax = 0
+        self.runSum = 0
+        self.cpuMin = -1
+        self.cpuMax = 0
+        self.cpuSum = 0
+        self.wallSum = 0
+
+    def add(self, row):
+        """ row: a JobRow """
+        wall = row.wall
+        if row.hasWall:
+            if (self.runMin == -1) or (wall < self.runMin):
+                self.runMin = wall
+            if row.forMetrics and wall > self.runMax:
+                self.runMax = wall
+        if row.forMetrics:
+            self.runSum += wall
+            self.runCount += 1
+            self.wallSum += row.waste + wall
+        if row.memory is not None:
+            mem = row.memory
+            if (self.memMin == -1) or (mem < self.memMin):
+                self.memMin = mem
+            if row.forMetrics:
+                if mem > self.memMax:
+                    self.memMax = mem
+                self.memSum += mem
+                self.memCount += 1
+        if row.cpu is not None:
+            if row.cpuTime is None:
+                # failed or finished without any wall time
+                if (self.cpuMin == -1) or row.cpu < self.cpuMin:
+                    self.cpuMin = row.cpu
+                if row.cpu > self.cpuMax:
+                    self.cpuMax = row.cpu
+            elif row.forMetrics:
+                self.cpuSum += row.cpuTime
+                if (self.cpuMin == -1) or row.cpu < self.cpuMin:
+                    self.cpuMin = row.cpu
+                if row.cpu > self.cpuMax:
+                    self.cpuMax = row.cpu
+
+
+class JobRow(object):
+    """ the line of one job in the crab status --long table, with numbers kept as numbers """
+
+    __slots__ = ['jobid', 'state', 'site', 'wall', 'hasWall', 'waste', 'memory', 'cpu', 'cpuTime',
+                 'retries', 'restarts', 'exitcode', 'forMetrics', 'clusterIds']
+
+    def __init__(self, jobid, info, state, numCores):
+        self.jobid = jobid
+        self.state = state
+        # exclude not-run and probe jobs from the metrics
+        self.forMetrics = state not in ['idle', 'running', 'unsubmitted'] and not jobid.startswith('0-')
+        siteHistory = info.get('SiteHistory')
+        self.site = siteHistory[-1] if siteHistory else ''
+        walls = info.get('WallDurations')
+        self.hasWall = bool(walls)
+        self.wall = walls[-1] if walls else 0
+        self.waste = sum(walls[:-1]) if walls else 0
+        rss = info.get('ResidentSetSize')
+        self.memory = rss[-1] / 1024 if rss else None
+        # cpu is the efficiency in %, cpuTime the cpu seconds per core, None if not known
+        self.cpu = None
+        self.cpuTime = None
+        if (state in ['toRetry', 'failed', 'finished']) and not self.wall:
+            self.cpu = 0
+        elif self.wall and ('TotalSysCpuTimeHistory' in info) and ('TotalUserCpuTimeHistory' in info):
+            cpu = info['TotalSysCpuTimeHistory'][-1] + info['TotalUserCpuTimeHistory'][-1]
+            self.cpuTime = cpu / float(numCores)
+            self.cpu = (cpu / float(self.wall * numCores)) * 100
+        self.retries = info.get('Retries', 0)
+        self.restarts = info.get('Restarts', 0)
+        if info['State'] in ['finished']:
+            self.exitcode = '0'
+        elif 'Error' in info:
+            self.exitcode = str(info['Error'][0])
+        else:
+            self.exitcode = 'Unknown'
+        self.clusterIds = info.get('JobIds', 'Unknown')
+
+
+class StatusSummary(object):
+    """
+    Everything crab status prints about the jobs, collected walking once over the status_cache nodes:
+      jobsPerStatus, jobList     as returned to CRABAPI users
+      states, statesPJ, statesTJ counts per state of main, probe and tail jobs
+      failedJobs                 list of (jobid, exit code, error message) for failed jobs,
+                                 exit code and message are None if not known
+      numJobs                    number of jobs, row(jobid) gives the JobRow of a job
+      resources                  ResourceStats of all the jobs
+      sites                      dictionary site: counters for the site summary
+    """
+
+    SITE_COUNTERS = ("Runtime", "Waste", "Running", "Success", "Failed", "Stageout")
+
+    def __init__(self, statusCacheInfo, automaticSplitt, numCores=1):
+        """ statusCacheInfo: the status_cache nodes, as a dictionary or as JobStates """
+        if isinstance(statusCacheInfo, dict):
+            # This record is no longer necessary and makes parsing more difficult.
+            statusCacheInfo.pop('DagStatus', None)
+        self.jobStates = statusCacheInfo
+        self.automaticSplitt = automaticSplitt
+        self.numCores = numCores
+        self.jobsPerStatus = {}
+        self.jobList = []
+        self.states = {}
+        self.statesPJ = {}
+        self.statesTJ = {}
+        self.failedProcessing = 0
+        self.failedJobs = []
+        self.resources = ResourceStats()
+        self.sites = {}
+        self.siteHistoryRetrieved = False
+        self._sortedJobids = None
+
+        for jobid, info in statusCacheInfo.items():
+            self._addJob(jobid, info, numCores)
+        self.numJobs = len(self.jobList)
+
+        self.numProbes = sum(self.statesPJ.values())
+        self.numUnpublishable = self.failedProcessing if self.numProbes > 0 else 0
+
+    def _addJob(self, jobid, info, numCores):
+        rawState = info['State']
+        self.jobsPerStatus[rawState] = self.jobsPerStatus.get(rawState, 0) + 1
+        self.jobList.append([rawState, jobid])
+
+        jobStatus = rawState if rawState != 'cooloff' else 'toRetry'
+        if jobid.startswith('0-'):
+            self.statesPJ[jobStatus] = self.statesPJ.get(jobStatus, 0) + 1
+        elif '-' in jobid:
+            self.statesTJ[jobStatus] = self.statesTJ.get(jobStatus, 0) + 1
+        else:
+            self.states[jobStatus] = self.states.get(jobStatus, 0) + 1
+            if jobStatus == 'failed':
+                self.failedProcessing += 1
+
+        if rawState == 'failed':
+            if 'Error' in info:
+                self.failedJobs.append((jobid, info['Error'][0], info['Error'][1]))
+            else:
+                self.failedJobs.append((jobid, None, None))
+
+        # rows are not kept, for large tasks they would take more memory than the job states
+        self.resources.add(JobRow(jobid, info, translateJobStatus(jobid, rawState, self.automaticSplitt), numCores))
+
+        siteHistory = info.get('SiteHistory')
+        if siteHistory:
+            self._addToSites(rawState, siteHistory, info['WallDurations'])
+
+    def _addToSites(self, state, siteHistory, walls):
+        self.siteHistoryRetrieved = True
+        curSite = siteHistory[-1]
+        curInfo = self._site(curSite)
+        for site, wall in zip(siteHistory[:-1], walls[:-1]):
+            info = self._site(site)
+            info['Failed'] += 1
+            info['Waste'] += wall
+        if state in ['failed', 'cooloff', 'held', 'killed'] or (state == 'idle' and curSite != 'Unknown'):
+            curInfo['Failed'] += 1
+            curInfo['Waste'] += walls[-1]
+        elif state == 'transferring':
+            curInfo['Stageout'] += 1
+            curInfo['Runtime'] += walls[-1]
+        elif state == 'running':
+            curInfo['Running'] += 1
+            curInfo['Runtime'] += walls[-1]
+        elif state == 'finished':
+            curInfo['Success'] += 1
+            curInfo['Runtime'] += walls[-1]
+
+    def _site(self, site):
+        if site not in self.sites:
+            self.sites[site] = dict.fromkeys(self.SITE_COUNTERS, 0)
+        return self.sites[site]
+
+    def sortedJobids(self):
+        """ all jobids in the order of the job table, sorted only once """
+        if self._sortedJobids is None:
+            self._sortedJobids = sorted(self.jobStates, key=jobidSortKey)
+        return self._sortedJobids
+
+    def row(self, jobid):
+        """ the JobRow of a job, built from its state when asked for """
+        info = self.jobStates[jobid]
+        return JobRow(jobid, info, translateJobStatus(jobid, info['State'], self.automaticSplitt), self.numCores)
+
+    def resourcesOf(self, jobids):
+        """ ResourceStats restricted to some jobs """
+        stats = ResourceStats()
+        for jobid in jobids:
+            stats.add(self.row(jobid))
+        return stats
@@ -0,0 +1,131 @@
+# pylint: disable=consider-using-f-string, unspecified-encoding
+"""
+Timing information collected while a crab command runs: duration of the main phases
+(proxy checks, version check, command execution ...), of every REST call with the bytes
+exchanged, of every forked command and of every file download.
+A summary is written to crab.log at the end of each command, and also to a JSON file
+if the CRAB_timingReport environment variable is set to the file name.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import os
+import json
+import time
+import threading
+
+## Everything collected since the last resetTimings()
+TIMINGS = {'start': time.time(), 'phases': [], 'requests': [], 'commands': [], 'downloads': []}
+_lock = threading.Lock()
+
+# how many of the slowest entries of each kind are listed in the summary
+SLOWEST = 5
+
+
+def resetTimings():
+    """ to be called when a new crab command starts """
+    with _lock:
+        TIMINGS['start'] = time.time()
+        for key in ['phases', 'requests', 'commands', 'downloads']:
+            TIMINGS[key] = []
+
+
+def _record(kind, entry):
+    with _lock:
+        TIMINGS[kind].append(entry)
+
+
+class timedPhase(object):
+    """
+    Context manager to time a block of code:
+        with timedPhase('status: unpickle status_cache'):
+            ...
+    """
+    def __init__(self, name):
+        self.name = name
+        self.startTime = None
+
+    def __enter__(self):
+        self.startTime = time.time()
+        return self
+
+    def __exit__(self, excType, excValue, tback):
+        _record('phases', {'name': self.name, 'start': round(self.startTime - TIMINGS['start'], 3),
+                           'seconds': round(time.time() - self.startTime, 3), 'failed': excType is not None})
+        return False
+
+
+def recordRequest(verb, url, httpCode, seconds, bytesSent, bytesReceived, attempts):
+    """ one REST call done by HTTPRequests, attempts counts the retries as well """
+    _record('requests', {'verb': verb, 'url': url.split('?')[0], 'httpCode': httpCode,
+                         'seconds': round(seconds, 3), 'bytesSent': bytesSent,
+                         'bytesReceived': bytesReceived, 'attempts': attempts})
+
+
+def recordCommand(command, seconds, exitCode):
+    """ one command forked by execute_command """
+    _record('commands', {'command': command[:100], 'seconds': round(seconds, 3), 'exitCode': exitCode})
+
+
+def recordDownload(url, httpCode, seconds, size, fromCache=False):
+    """ one file downloaded by curlGetFileFromURL """
+    _record('downloads', {'url': url, 'httpCode': httpCode, 'seconds': round(seconds, 3),
+                          'bytes': size, 'fromCache': fromCache})
+
+
+def timingSummary():
+    """
+    Return a dictionary with totals and slowest entries for each kind of operation,
+    together with the list of all timed phases
+    """
+    with _lock:
+        summary = {'totalSeconds': round(time.time() - TIMINGS['start'], 3),
+                   'phases': list(TIMINGS['phases'])}
+        for kind in ['requests', 'commands', 'downloads']:
+            entries = TIMINGS[kind]
+            totals = {'count': len(entries),
+                      'seconds': round(sum(e['seconds'] for e in entries), 3),
+                      'slowest': sorted(entries, key=lambda e: e['seconds'], reverse=True)[:SLOWEST]}
+            if kind == 'requests':
+                totals['bytesSent'] = sum(e['bytesSent'] for e in entries)
+                totals['bytesReceived'] = sum(e['bytesReceived'] for e in entries)
+                totals['retries'] = sum(e['attempts'] - 1 for e in entries)
+            if kind == 'downloads':
+                totals['bytes'] = sum(e['bytes'] for e in entries)
+                totals['fromCache'] = len([e for e in entries if e['fromCache']])
+            summary[kind] = totals
+    return summary
+
+
+def reportTimings(logger):
+    """
+    Write the timing summary to the log file (at debug level, so not on the screen)
+    and, if requested via CRAB_timingReport, as JSON to a file
+    """
+    summary = timingSummary()
+    msg = "Timing summary: %.2f seconds in total" % summary['totalSeconds']
+    for phase in summary['phases']:
+        msg += "\n  %-50s %8.2f s" % (phase['name'], phase['seconds'])
+    requests = summary['requests']
+    msg += "\n  %d REST calls in %.2f s (%d retries), %d bytes sent, %d bytes received" % \
+           (requests['count'], requests['seconds'], requests['retries'],
+            requests['bytesSent'], requests['bytesReceived'])
+    for req in requests['slowest']:
+        msg += "\n    %-6s %-60s %4s %8.2f s" % (req['verb'], req['url'], req['httpCode'], req['seconds'])
+    downloads = summary['downloads']
+    msg += "\n  %d file downloads in %.2f s (%d from local cache), %d bytes" % \
+           (downloads['count'], downloads['seconds'], downloads['fromCache'], downloads['bytes'])
+    commands = summary['commands']
+    msg += "\n  %d forked commands in %.2f s" % (commands['count'], commands['seconds'])
+    for cmd in commands['slowest']:
+        msg += "\n    %8.2f s  %s" % (cmd['seconds'], cmd['command'])
+    logger.debug(msg)
+
+    reportFile = os.getenv('CRAB_timingReport')
+    if reportFile:
+        try:
+            with open(reportFile, 'w') as fd:
+                json.dump(summary, fd, indent=2)
+        except (IOError, OSError) as ex:
+            logger.debug("Could not write timing report to %s: %s", reportFile, ex)
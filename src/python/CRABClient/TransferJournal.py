@@ -0,0 +1,106 @@
+# pylint: disable=consider-using-f-string
+"""
+Journal of the files retrieved by crab getoutput and getlog into a local directory, see Commands/remote_copy.py.
+It is a file in the destination directory with one JSON record per line, appended each time a transfer
+starts or ends, e.g.
+    {"file": "output_1.root", "state": "done", "size": 1234, "adler32": "0a1b2c3d", "time": 1700000000}
+The last record of a file tells its state. A file which is done in the journal and still has its size on
+disk is not transferred again by a later command, and a file whose transfer started and never ended is
+known to be incomplete even when its expected size is not known.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import os
+import json
+import time
+import threading
+
+from CRABClient.Adler32 import sameAdler32
+
+JOURNAL_NAME = '.transfers.journal'
+
+# states of a file in the journal
+STARTED = 'started'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class TransferJournal(object):
+    """
+    The journal of the directory `directory`. Records are read at creation, and
+    record() can be called from the transfer threads.
+    """
+
+    def __init__(self, directory, logger=None):
+        self.directory = directory
+        self.path = os.path.join(directory, JOURNAL_NAME)
+        self.logger = logger
+        self.records = {}  # file (path relative to directory): last record
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+        numLines = 0
+        with open(self.path) as fd:
+            for line in fd:
+                numLines += 1
+                try:
+                    record = json.loads(line)
+                    self.records[record['file']] = record
+                except (ValueError, KeyError, TypeError):
+                    # e.g. the last line written while the client was killed
+                    if self.logger:
+                        self.logger.debug("Ignoring the bad line %d of %s" % (numLines, self.path))
+        if numLines > 2 * len(self.records):
+            self._compact()
+
+    def _compact(self):
+        """ rewrite the journal with the last record of each file only """
+        tmpPath = self.path + '.tmp'
+        with open(tmpPath, 'w') as fd:
+            for record in self.records.values():
+                fd.write(json.dumps(record, sort_keys=True) + '\n')
+        os.rename(tmpPath, self.path)
+
+    def _relPath(self, localFilename):
+        return os.path.relpath(localFilename, self.directory)
+
+    def state(self, localFilename):
+        """ the state of a file in the journal, None if it is not there """
+        record = self.records.get(self._relPath(localFilename))
+        return record['state'] if record else None
+
+    def isDone(self, localFilename, size=None, adler32=None):
+        """
+        whether the file was retrieved by an earlier transfer, is still on disk with the same size,
+        and has the expected size and checksum when these are given. A file recorded without
+        a checksum is not done when one is expected, it has to be verified on disk first
+        """
+        record = self.records.get(self._relPath(localFilename))
+        if not record or record['state'] != DONE:
+            return False
+        if size and record.get('size') != size:
+            return False
+        if adler32 and not (record.get('adler32') and sameAdler32(record['adler32'], adler32)):
+            return False
+        try:
+            return os.path.getsize(localFilename) == record.get('size')
+        except OSError:
+            return False
+
+    def record(self, localFilename, state, size=None, adler32=None):
+        """ append a record for a file """
+        record = {'file': self._relPath(localFilename), 'state': state, 'time': int(time.time())}
+        if size is not None:
+            record['size'] = size
+        if adler32:
+            record['adler32'] = adler32
+        line = json.dumps(record, sort_keys=True) + '\n'
+        with self._lock:
+            self.records[record['file']] = record
+            with open(self.path, 'a') as fd:
+                fd.write(line)
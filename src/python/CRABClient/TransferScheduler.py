@@ -0,0 +1,367 @@
+# pylint: disable=consider-using-f-string
+"""
+Scheduler for the file transfers of crab getoutput and getlog, see Commands/remote_copy.py.
+A fixed number of worker threads take the transfers from a bounded queue and run the copy
+command of each of them as a subprocess. Threads are enough since the work is waiting for
+external commands, and they share the state of the transfers without any pickling.
+    scheduler = TransferScheduler(copyFiles, numWorkers=10, maxRetries=2)
+    scheduler.start()
+    for ...:
+        scheduler.submit(fileid, info, size, site)  # waits while the queue is full
+        scheduler.submitBatch([(fileid, info, size), ...], site)  # files copied together by one command
+    scheduler.wait()  # or scheduler.cancel(), e.g. at Ctrl-C
+    scheduler.transfers[fileid].state
+where copyFiles(scheduler, transfers) gets the transfers submitted together, returns those
+which were copied, and runs its commands with scheduler.runCommand so that cancel() can kill them.
+The transfers which failed go back to the queue after a delay, up to maxRetries times, unless
+copyFiles set their retry attribute to False.
+
+The SiteController of the scheduler limits the number of transfers running at the same time
+from each site, halving it when a transfer fails in a way worth a retry and increasing it again
+with each success, and measures the speed of the transfers from each site.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import os
+import sys
+import time
+import heapq
+import signal
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict, deque
+
+from CRABClient.Timing import recordCommand
+from CRABClient.RetryPolicy import RetryPolicy
+
+# states of a transfer
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# transfers waiting in the queue per worker, beyond that submit() waits
+QUEUE_PER_WORKER = 2
+# seconds, how often blocked threads look whether the transfers were cancelled
+POLL_INTERVAL = 0.5
+# seconds cancel() waits for the workers to notice that their commands were killed
+CANCEL_TIMEOUT = 10
+# seconds, delay before the first retry of a failed transfer, then it doubles
+RETRY_DELAY = 30
+MAX_RETRY_DELAY = 120
+
+# how runCommand starts a command in its own process group, see _kill
+if sys.version_info >= (3, 0):
+    NEW_PROCESS_GROUP = {'start_new_session': True}
+else:
+    NEW_PROCESS_GROUP = {'preexec_fn': os.setsid}
+
+# bytes read at a time from the output of a command which runCommand writes somewhere
+OUTPUT_BLOCK_SIZE = 1024 * 1024
+
+# bytes/second assumed for a site until a transfer from there is over, and the lowest speed ever assumed
+DEFAULT_SPEED = 250 * 1024.
+MIN_SPEED = 20 * 1024.
+# weight of the last transfer in the average speed of a site
+SPEED_WEIGHT = 0.3
+
+
+class Transfer(object):
+    """
+    one file to copy: fileid, info (the caller's description of the file), size in bytes (0 if not known),
+    the site it comes from, state, error, start and end time
+    """
+
+    __slots__ = ['fileid', 'info', 'size', 'site', 'state', 'error', 'started', 'ended', 'process', 'attempts', 'retry']
+
+    def __init__(self, fileid, info=None, size=0, site=None):
+        self.fileid = fileid
+        self.info = info
+        self.size = size or 0
+        self.site = site
+        self.state = PENDING
+        self.error = None
+        self.started = None
+        self.ended = None
+        self.process = None  # the command running for this transfer, see TransferScheduler.runCommand
+        self.attempts = 0
+        self.retry = True  # set to False by copyFiles when another attempt would fail the same way
+
+
+class SiteController(object):
+    """
+    Concurrency limit and average transfer speed (bytes/second of one transfer) of each site.
+    Not thread safe, the TransferScheduler calls it with its lock held.
+    """
+
+    def __init__(self, maxPerSite, defaultSpeed=DEFAULT_SPEED, minSpeed=MIN_SPEED):
+        self.maxPerSite = maxPerSite
+        self.defaultSpeed = defaultSpeed
+        self.minSpeed = minSpeed
+        self.limits = {}
+        self.running = {}
+        self.speeds = {}
+
+    def canStart(self, site):
+        return self.running.get(site, 0) < self.limits.get(site, self.maxPerSite)
+
+    def started(self, site):
+        self.running[site] = self.running.get(site, 0) + 1
+
+    def finished(self, site, copied, failed, numBytes=0, seconds=0):
+        """
+        a transfer from site is over, copied is the number of files copied and failed the number of
+        those which failed in a way worth trying again, e.g. a timeout, i.e. the site may be overloaded
+        """
+        self.running[site] -= 1
+        limit = self.limits.get(site, self.maxPerSite)
+        if failed:
+            self.limits[site] = max(1, limit // 2)
+        elif copied:
+            self.limits[site] = min(self.maxPerSite, limit + 1)
+        if numBytes > 0 and seconds > 0:
+            speed = numBytes / seconds
+            if site in self.speeds:
+                speed = SPEED_WEIGHT * speed + (1 - SPEED_WEIGHT) * self.speeds[site]
+            self.speeds[site] = speed
+
+    def speed(self, site):
+        return max(self.minSpeed, self.speeds.get(site, self.defaultSpeed))
+
+
+class TransferScheduler(object):
+    """
+    Run copyFiles(scheduler, transfers) for each submitted transfer or batch of transfers,
+    in numWorkers threads. See the module documentation.
+    """
+
+    def __init__(self, copyFiles, numWorkers=10, maxRetries=0, retryPolicy=None):
+        self.copyFiles = copyFiles
+        self.numWorkers = numWorkers
+        self.maxRetries = maxRetries
+        self.retryPolicy = retryPolicy or RetryPolicy(baseDelay=RETRY_DELAY, maxDelay=MAX_RETRY_DELAY)
+        self.controller = SiteController(numWorkers)
+        self.transfers = OrderedDict()  # fileid: Transfer, in the order of submission
+        self._maxQueued = QUEUE_PER_WORKER * numWorkers
+        self._queue = deque()  # batches of transfers
+        self._delayed = []  # heap of (time, sequence number, batch) of the transfers to retry
+        self._numRunning = 0
+        self._numRetries = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._cancelled = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.numWorkers):
+            thread = threading.Thread(target=self._work, name='transfer-%d' % i)
+            # never keep crab alive after the main thread is gone
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fileid, info=None, size=0, site=None):
+        """ queue a new transfer and return it, waiting while the queue is full """
+        return self.submitBatch([(fileid, info, size)], site)[0]
+
+    def submitBatch(self, files, site=None):
+        """
+        queue new transfers which are given together to copyFiles,
+        files is a list of (fileid, info) or (fileid, info, size)
+        """
+        batch = [Transfer(*file_, site=site) for file_ in files]
+        with self._changed:
+            for transfer in batch:
+                self.transfers[transfer.fileid] = transfer
+            while len(self._queue) >= self._maxQueued and not self._cancelled.is_set():
+                self._changed.wait(POLL_INTERVAL)
+            if self._cancelled.is_set():
+                for transfer in batch:
+                    transfer.state = CANCELLED
+            else:
+                self._queue.append(batch)
+                self._changed.notify_all()
+        return batch
+
+    def wait(self):
+        """ wait until all the submitted transfers, and their retries, are over """
+        with self._changed:
+            self._closed = True
+            self._changed.notify_all()
+        for thread in self._threads:
+            # with a timeout, so that Ctrl-C reaches the main thread also in python2
+            while thread.is_alive():
+                thread.join(POLL_INTERVAL)
+
+    def cancel(self):
+        """ stop giving out transfers, kill the commands which are running, and wait for the workers """
+        self._cancelled.set()
+        with self._changed:
+            for transfer in self.transfers.values():
+                if transfer.state == PENDING:
+                    transfer.state = CANCELLED
+                elif transfer.process is not None:
+                    _kill(transfer.process)
+            self._changed.notify_all()
+        deadline = time.time() + CANCEL_TIMEOUT
+        for thread in self._threads:
+            thread.join(max(deadline - time.time(), 0))
+
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def sleep(self, seconds):
+        """ time.sleep, but over as soon as the transfers are cancelled. Returns False if they were """
+        return not self._cancelled.wait(seconds)
+
+    def count(self, state):
+        with self._lock:
+            return sum(1 for transfer in self.transfers.values() if transfer.state == state)
+
+    def numRetries(self):
+        """ how many times failed transfers went back to the queue """
+        return self._numRetries
+
+    def speed(self, site):
+        """ the average speed, in bytes/second, of one transfer from site """
+        with self._lock:
+            return self.controller.speed(site)
+
+    def runCommand(self, transfers, command, output=None):
+        """
+        Same as ClientUtilities.execute_command(command), i.e. returns (stdout, stderr, exit code), but
+        the command runs in its own process group, so that cancel() can kill it together with its children.
+        transfers: the transfer, or list of transfers, the command is for
+        output: if given, an object whose write() gets the stdout of the command while it comes, e.g. the
+                file the command copies, then the stdout returned is empty
+        """
+        if isinstance(transfers, Transfer):
+            transfers = [transfers]
+        if self._cancelled.is_set():
+            return '', 'cancelled', -signal.SIGTERM
+        startTime = time.time()
+        # with output, stderr goes to a file, so that the command can never block on it while stdout is read
+        errFile = tempfile.TemporaryFile() if output is not None else None
+        # not holding the lock, which the other workers need, while the process starts
+        process = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=errFile or subprocess.PIPE, **NEW_PROCESS_GROUP)
+        with self._lock:
+            for transfer in transfers:
+                transfer.process = process
+            # cancel() sets the event before it looks for processes to kill with the lock held,
+            # so it either sees this process or is seen here
+            cancelled = self._cancelled.is_set()
+        if cancelled:
+            _kill(process)
+        try:
+            if output is None:
+                out, err = process.communicate()
+            else:
+                process.stdin.close()
+                while True:
+                    data = process.stdout.read(OUTPUT_BLOCK_SIZE)
+                    if not data:
+                        break
+                    output.write(data)
+                process.stdout.close()
+                process.wait()
+                errFile.seek(0)
+                out, err = b'', errFile.read()
+        except BaseException:
+            # e.g. output.write() failed, the command must not run on by itself
+            _kill(process)
+            raise
+        finally:
+            with self._lock:
+                for transfer in transfers:
+                    transfer.process = None
+            if errFile is not None:
+                errFile.close()
+        recordCommand(command, time.time() - startTime, process.returncode)
+        stdout = out.decode(encoding='UTF-8') if out else ''
+        stderr = err.decode(encoding='UTF-8', errors='replace') if err else ''
+        return stdout, stderr, process.returncode
+
+    def _next(self):
+        """
+        Wait for a batch which can start, i.e. whose site is below its concurrency limit, and return it
+        marked as running. Returns None when there is nothing left to do. Called with the lock held.
+        """
+        while not self._cancelled.is_set():
+            now = time.time()
+            while self._delayed and self._delayed[0][0] <= now:
+                self._queue.append(heapq.heappop(self._delayed)[2])
+            for batch in self._queue:
+                if self.controller.canStart(batch[0].site):
+                    self._queue.remove(batch)
+                    batch = [transfer for transfer in batch if transfer.state == PENDING]
+                    if not batch:
+                        break
+                    for transfer in batch:
+                        transfer.state = RUNNING
+                        transfer.attempts += 1
+                    self.controller.started(batch[0].site)
+                    self._numRunning += 1
+                    self._changed.notify_all()
+                    return batch
+            else:
+                # running transfers may still fail and be retried
+                if self._closed and not self._queue and not self._delayed and not self._numRunning:
+                    return None
+                timeout = POLL_INTERVAL
+                if self._delayed:
+                    timeout = min(timeout, max(self._delayed[0][0] - now, 0.01))
+                self._changed.wait(timeout)
+        return None
+
+    def _work(self):
+        while True:
+            with self._changed:
+                batch = self._next()
+            if batch is None:
+                return
+            started = time.time()
+            try:
+                copied = self.copyFiles(self, batch)
+            except Exception as ex:  # pylint: disable=broad-except
+                for transfer in batch:
+                    transfer.error = transfer.error or str(ex)
+                copied = []
+            ended = time.time()
+            with self._changed:
+                retry = []
+                for transfer in batch:
+                    transfer.started, transfer.ended = started, ended
+                    if transfer in copied:
+                        transfer.state = DONE
+                    elif self._cancelled.is_set():
+                        transfer.state = CANCELLED
+                    elif transfer.retry and transfer.attempts <= self.maxRetries:
+                        transfer.state = PENDING
+                        retry.append(transfer)
+                    else:
+                        transfer.state = FAILED
+                numBytes = sum(transfer.size for transfer in copied)
+                # a missing file or a permission error says nothing about how busy the site is
+                congested = sum(1 for transfer in batch if transfer not in copied and transfer.retry)
+                self.controller.finished(batch[0].site, len(copied), congested, numBytes, ended - started)
+                if retry:
+                    self._numRetries += len(retry)
+                    delay = self.retryPolicy.delay(max(transfer.attempts for transfer in retry))
+                    heapq.heappush(self._delayed, (ended + delay, self._numRetries, retry))
+                self._numRunning -= 1
+                self._changed.notify_all()
+
+
+def _kill(process):
+    """ terminate a process started by runCommand, with its children """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except OSError:
+        # already over
+        pass
@@ -6,6 +6,10 @@ This module contains the utility methods available for users.
 # pylint: disable=consider-using-f-string, unspecified-encoding, raise-missing-from
 
 import os
+import time
+import shutil
+import filecmp
+import hashlib
 import logging
 import json
 
@@ -20,6 +24,9 @@ from CRABClient.ClientUtilities import LOGLEVEL_MUTE, colors
 from CRABClient.ClientUtilities import execute_command
 from CRABClient.ClientExceptions import ClientException
 from CRABClient.ClientUtilities import getUsernameFromCRIC_wrapped
+from CRABClient.HTTPTransport import POOL, TransportError, nativeTransportEnabled, splitURL, urlScheme
+from CRABClient.Timing import recordDownload
+from CRABClient import __version__
 from WMCore.Configuration import Configuration
 
 def config():
@@ -66,13 +73,74 @@ def getUsername(proxyFile=None, logger=None):
     return username
 
 
-def curlGetFileFromURL(url, filename = None, proxyfilename = None, logger=None):
+def _fileCacheEntry(cacheDir, url):
+    """
+    Return (cachedFile, validators) for url in cacheDir. validators is a dictionary with
+    the ETag, Last-Modified and size of the cached copy, it is empty if there is no usable copy.
+    """
+    entry = os.path.join(cacheDir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+    cachedFile, metaFile = entry + '.data', entry + '.json'
+    validators = {}
+    try:
+        with open(metaFile) as fd:
+            validators = json.load(fd)
+        if validators.get('url') != url or os.path.getsize(cachedFile) != validators.get('size'):
+            validators = {}
+    except (IOError, OSError, ValueError):
+        validators = {}
+    return cachedFile, validators
+
+
+def _storeInFileCache(cacheDir, url, filename, etag=None, lastModified=None):
+    """ keep a copy of the just downloaded filename together with its validators """
+    cachedFile, _ = _fileCacheEntry(cacheDir, url)
+    metaFile = cachedFile[:-len('.data')] + '.json'
+    try:
+        if not os.path.isdir(cacheDir):
+            os.makedirs(cacheDir)
+        # replaced, not overwritten, so that the hard links to the old copy (see linkCachedFile) keep it
+        tmpname = "%s.%d" % (cachedFile, os.getpid())
+        shutil.copy2(filename, tmpname)
+        os.rename(tmpname, cachedFile)
+        with open(metaFile, 'w') as fd:
+            json.dump({'url': url, 'etag': etag, 'lastModified': lastModified,
+                       'size': os.path.getsize(cachedFile)}, fd)
+    except (IOError, OSError):
+        # the cache is only an optimization, but an older copy must not be taken for this one
+        for name in [metaFile, cachedFile + '.%d' % os.getpid()]:
+            if os.path.exists(name):
+                os.remove(name)
+
+
+def linkCachedFile(cacheDir, url, filename, target):
+    """
+    Make target a hard link to the cached copy of url, if it has the same content as the
+    just downloaded filename, so that target does not need space of its own.
+    Returns False if there is no such copy or it can not be linked, e.g. from another file system.
+    """
+    if not cacheDir:
+        return False
+    cachedFile, validators = _fileCacheEntry(cacheDir, url)
+    try:
+        if not validators or not filecmp.cmp(cachedFile, filename, shallow=False):
+            return False
+        if os.path.exists(target):
+            os.remove(target)
+        os.link(cachedFile, target)
+    except (IOError, OSError):
+        return False
+    return True
+
+
+def curlGetFileFromURL(url, filename = None, proxyfilename = None, logger=None, cacheDir=None):
     """
     Read the content of a URL into a file via curl
 
     url: the link you would like to retrieve
     filename: the local filename where the url is saved to. Defaults to the filename in the url
     proxyfilename: the x509 proxy certificate to be used in case auth is required
+    cacheDir: optional directory where a copy of the file is kept together with its ETag/Last-Modified,
+              the next download of the same url is conditional and an unchanged file is not transferred again
     returns: the exit code of the command if command failed, otherwise the HTTP code of the call
              note that curl exits with status 0 if the HTTP calls fail,
     """
@@ -80,28 +148,117 @@ def curlGetFileFromURL(url, filename = None, proxyfilename = None, logger=None):
     ## Path to certificates.
     capath = os.environ['X509_CERT_DIR'] if 'X509_CERT_DIR' in os.environ else "/etc/grid-security/certificates"
 
+    cachedFile, validators = _fileCacheEntry(cacheDir, url) if cacheDir else (None, {})
+
+    startTime = time.time()
+    if nativeTransportEnabled(url):
+        httpCode, fromCache = _getFileFromURL(url, filename, proxyfilename, capath, logger,
+                                              cacheDir, cachedFile, validators)
+    else:
+        httpCode, fromCache = _curlFileFromURL(url, filename, proxyfilename, capath, logger,
+                                               cacheDir, cachedFile, validators)
+    size = os.path.getsize(filename) if httpCode == 200 else 0
+    recordDownload(url, httpCode, time.time() - startTime, size, fromCache)
+
+    return httpCode
+
+
+def _curlFileFromURL(url, filename, proxyfilename, capath, logger, cacheDir, cachedFile, validators):
+    """
+    Download for curlGetFileFromURL by forking curl
+    returns: (HTTP code, True if the local cached copy was used)
+    """
     # send curl output to file and http_code to stdout
-    downloadCommand = 'curl -sS --capath %s --cert %s --key %s -o %s -w %%"{http_code}"' %\
+    downloadCommand = 'curl -sS --compressed --capath %s --cert %s --key %s -o %s -w %%"{http_code}"' %\
                       (capath, proxyfilename, proxyfilename, filename)
+    headerFile = filename + '.headers'
+    if cacheDir:
+        # keep the response headers, for the validators of the cached copy
+        downloadCommand += ' -D %s' % headerFile
+        # a conditional request only with the validators sent by the server, never with a local time
+        if validators.get('etag'):
+            downloadCommand += " -H 'If-None-Match: %s'" % validators['etag']
+        if validators.get('lastModified'):
+            downloadCommand += " -z '%s'" % validators['lastModified']
     downloadCommand += ' "%s"' % url
     if logger:
         logger.debug("Will execute:\n%s", downloadCommand)
     stdout, stderr, rc = execute_command(downloadCommand, logger=logger)
     errorDetails = ''
+    fromCache = False
+    respHeaders = {}
+    if os.path.exists(headerFile):
+        with open(headerFile) as fd:
+            for line in fd:
+                if ':' in line:
+                    name, value = line.split(':', 1)
+                    respHeaders[name.strip().lower()] = value.strip()
+        os.unlink(headerFile)
 
     if rc != 0:
-        os.unlink(filename)
+        if os.path.exists(filename):
+            os.unlink(filename)
         httpCode = 503
     else:
         httpCode = int(stdout)
-        if httpCode != 200:
+        if httpCode == 304 and validators:
+            if logger:
+                logger.debug("%s not modified, using cached copy", url)
+            shutil.copy2(cachedFile, filename)
+            httpCode, fromCache = 200, True
+        elif httpCode == 200:
+            if cacheDir and (respHeaders.get('etag') or respHeaders.get('last-modified')):
+                _storeInFileCache(cacheDir, url, filename, etag=respHeaders.get('etag'),
+                                  lastModified=respHeaders.get('last-modified'))
+        else:
             with open(filename) as f:
                 errorDetails = f.read()
             os.unlink(filename)
     if logger:
         logger.debug('exitcode: %s\nstdout: %s\nstderr: %s\nerror details: %s', rc, stdout, stderr, errorDetails)
-	
-    return httpCode
+
+    return httpCode, fromCache
+
+
+def _getFileFromURL(url, filename, proxyfilename, capath, logger, cacheDir, cachedFile, validators):
+    """
+    Download for curlGetFileFromURL using the in-process HTTP(S) transport
+    returns: (HTTP code, True if the local cached copy was used)
+    """
+    host, port, path = splitURL(url)
+    headers = {'User-Agent': 'CRABClient/%s' % __version__, 'Accept': '*/*'}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('lastModified'):
+        headers['If-Modified-Since'] = validators['lastModified']
+    try:
+        # the body goes to the file as it arrives, sandboxes and logs can be large
+        with open(filename, 'wb') as fd:
+            httpCode, _, respHeaders, payload = POOL.request('GET', host, port, path, headers=headers, stream=fd,
+                                                             cert=proxyfilename, key=proxyfilename, capath=capath,
+                                                             scheme=urlScheme(url))
+    except TransportError as ex:
+        if logger:
+            logger.debug('GET %s failed: %s', url, ex)
+        os.unlink(filename)
+        return 503, False
+    respHeaders = dict((name.lower(), value) for name, value in respHeaders)
+    if httpCode == 304 and validators:
+        if logger:
+            logger.debug("%s not modified, using cached copy", url)
+        shutil.copy2(cachedFile, filename)
+        return 200, True
+    if httpCode != 200:
+        if logger:
+            logger.debug('GET %s returned %s\nerror details: %s', url, httpCode, payload)
+        os.unlink(filename)
+        return httpCode, False
+    if cacheDir and (respHeaders.get('etag') or respHeaders.get('last-modified')):
+        _storeInFileCache(cacheDir, url, filename, etag=respHeaders.get('etag'),
+                          lastModified=respHeaders.get('last-modified'))
+    if logger:
+        logger.debug('GET %s returned %d bytes', url, os.path.getsize(filename))
+    return httpCode, False
 
 
 def getLumiListInValidFiles(dataset, dbsurl='phys03'):
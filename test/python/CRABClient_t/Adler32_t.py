@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+Adler32_t.py
+"""
+
+import io
+import os
+import zlib
+import tempfile
+import unittest
+
+from CRABClient.Adler32 import Adler32, sameAdler32, streamAdler32, fileAdler32, commandAdler32
+
+
+class Adler32Test(unittest.TestCase):
+
+    def setUp(self):
+        self.data = os.urandom(300000)
+        self.expected = '%08x' % (zlib.adler32(self.data) & 0xffffffff)
+        fd, self.path = tempfile.mkstemp()
+        os.write(fd, self.data)
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def testAdler32(self):
+        self.assertEqual(Adler32().hexdigest(), '00000001')
+        self.assertEqual(streamAdler32(io.BytesIO(b'Wikipedia')), ('11e60398', 9))
+        self.assertEqual(streamAdler32(io.BytesIO(self.data), blockSize=7000), (self.expected, len(self.data)))
+        self.assertEqual(fileAdler32(self.path), self.expected)
+
+    def testWrite(self):
+        output = io.BytesIO()
+        checksum = Adler32(output=output)
+        for i in range(0, len(self.data), 7000):
+            checksum.write(self.data[i:i + 7000])
+        self.assertEqual(checksum.hexdigest(), self.expected)
+        self.assertEqual(output.getvalue(), self.data)
+
+    def testSameAdler32(self):
+        # WMCore writes the checksums with '%x', without the leading zeros
+        self.assertTrue(sameAdler32('00a1b2c3', 'a1b2c3'))
+        self.assertTrue(sameAdler32('0A1B2C3D', '0a1b2c3d'))
+        self.assertFalse(sameAdler32('00a1b2c3', 'a1b2c30'))
+
+    def testCommand(self):
+        self.assertEqual(commandAdler32('cat %s' % self.path, blockSize=4096), (self.expected, len(self.data), '', 0))
+        _, size, stderr, exitCode = commandAdler32('cat %s.missing' % self.path)
+        self.assertEqual(size, 0)
+        self.assertIn('No such file', stderr)
+        self.assertNotEqual(exitCode, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
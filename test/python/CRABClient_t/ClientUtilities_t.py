@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+ClientUtilities_t.py
+"""
+
+import random
+import unittest
+from functools import cmp_to_key
+
+from CRABClient.ClientUtilities import compareJobids, jobidSortKey, JobidIndex
+
+
+class JobidIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.jobids = [str(i) for i in range(1, 21)] + ['0-1', '0-2', '0-10', '3-1', '3-2', '12-1', '0']
+        random.Random(1).shuffle(self.jobids)
+
+    def testSortKey(self):
+        self.assertEqual(sorted(self.jobids, key=jobidSortKey),
+                         sorted(self.jobids, key=cmp_to_key(compareJobids)))
+
+    def testIndex(self):
+        index = JobidIndex(self.jobids + ['5', 7])
+        self.assertEqual(len(index), len(self.jobids))
+        self.assertEqual(list(index)[:4], ['0-1', '0-2', '0-10', '0'])
+        self.assertIn('3-2', index)
+        self.assertIn(7, index)
+        self.assertNotIn('21', index)
+        self.assertEqual(index.missing(['1', '21', '3-3']), ['21', '3-3'])
+        self.assertEqual(index.between('18', '3-1'), ['18', '19', '20', '3-1'])
+        self.assertEqual(index.toRanges(), '0-20; probe/tail jobs 0-1,0-2,0-10,3-1,3-2,12-1')
+        self.assertEqual(JobidIndex(['1', '2', '3', '7', '9', '10']).toRanges(separator=', ', maxRanges=2),
+                         '1-3, 7 ... and 2 more')
+
+    def testRangesWithTailJobs(self):
+        # the tail job 1-3 must not read like the range of jobs 1 to 3
+        self.assertEqual(JobidIndex(['1', '3', '1-3']).toRanges(), '1,3; probe/tail jobs 1-3')
+        self.assertEqual(JobidIndex(['1', '2', '3', '1-3']).toRanges(), '1-3; probe/tail jobs 1-3')
+        self.assertEqual(JobidIndex(['0-1', '0-2']).toRanges(), 'probe/tail jobs 0-1,0-2')
+        self.assertEqual(JobidIndex(['1', '2', '5', '0-1', '1-1']).toRanges(maxRanges=3),
+                         '1-2,5; probe/tail jobs 0-1 ... and 1 more')
+
+
+if __name__ == '__main__':
+    unittest.main()
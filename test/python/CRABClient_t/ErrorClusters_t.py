@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+ErrorClusters_t.py
+"""
+
+import unittest
+
+from CRABClient.ErrorClusters import ErrorClusters, normalizeErrorMessage, jobidRanges
+
+
+class ErrorClustersTest(unittest.TestCase):
+
+    def testNormalize(self):
+        self.assertEqual(normalizeErrorMessage("could not open /store/data/Run2024A/file_12.root on host node7.cern.ch"),
+                         "could not open <path> on host <host>")
+        self.assertEqual(normalizeErrorMessage("Fatal Exception: std::bad_alloc at event 37983"),
+                         "Fatal Exception: std::bad_alloc at event <n>")
+        self.assertEqual(normalizeErrorMessage("stage-out to T2_CH_CERN failed after 12.5 s, see root://eos.cern.ch//eos/x"),
+                         "stage-out to T2_CH_CERN failed after <n> s, see <url>")
+
+    def testJobidRanges(self):
+        self.assertEqual(jobidRanges(['3', '1', '2', '7', '10', '11', '0-1', '2-1']), '1-3, 7, 10-11; probe/tail jobs 0-1, 2-1')
+        self.assertEqual(jobidRanges([str(i) for i in range(1, 40, 2)], maxRanges=3), '1, 3, 5 ... and 17 more')
+
+    def testClusters(self):
+        failedJobs = [(str(i), 8001, "std::bad_alloc at event %d" % i) for i in range(1, 101)]
+        failedJobs += [('101', 8021, "file not found"), ('102', 8021, "file not found"),
+                       ('103', 8021, "permission denied"), ('104', None, None)]
+        errors = ErrorClusters(failedJobs)
+        self.assertEqual(errors.unknown, 1)
+        self.assertEqual(errors.exitCodes(), [8001, 8021])
+        self.assertEqual(errors.exitCodes(byCode=True), [8001, 8021])
+        self.assertEqual(errors.numClusters(8001), 1)
+        cluster = errors.topClusters(8001)[0]
+        self.assertEqual(cluster.message(), "std::bad_alloc at event <n>")
+        self.assertEqual(cluster.jobids[:3], ['1', '2', '3'])
+        top = errors.topClusters(8021)
+        self.assertEqual([(c.message(), len(c.jobids)) for c in top], [("file not found", 2), ("permission denied", 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
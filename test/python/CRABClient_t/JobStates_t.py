@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+JobStates_t.py
+"""
+
+import copy
+import json
+import unittest
+
+from CRABClient.JobStates import JobStates
+
+
+class JobStatesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = {
+            'DagStatus': {'SubDagStatus': {}},
+            '1': {'State': 'finished', 'Retries': 0, 'JobIds': ['123.0'], 'SiteHistory': ['T2_CH_CERN'],
+                  'WallDurations': [100], 'ResidentSetSize': [2048000]},
+            '2': {'State': 'failed', 'Retries': 2, 'JobIds': ['124.0', '124.1'], 'SiteHistory': ['T2_IT_Pisa', 'T2_CH_CERN'],
+                  'WallDurations': [50, 200], 'Error': [8021, 'file not found', {}]},
+            '3': {'State': 'idle', 'Retries': 0, 'JobIds': [], 'SiteHistory': [], 'WallDurations': []},
+        }
+
+    def testMapping(self):
+        expected = copy.deepcopy(self.nodes)
+        del expected['DagStatus']
+        jobs = JobStates.fromNodes(self.nodes)
+        self.assertEqual(self.nodes, {})
+        self.assertEqual(len(jobs), 3)
+        self.assertEqual(list(jobs), ['1', '2', '3'])
+        self.assertIn('2', jobs)
+        self.assertNotIn('4', jobs)
+        self.assertEqual(jobs['2']['SiteHistory'], ['T2_IT_Pisa', 'T2_CH_CERN'])
+        self.assertEqual(jobs['2']['Error'], [8021, 'file not found', {}])
+        self.assertIsNone(jobs['1'].get('Error'))
+        self.assertNotIn('ResidentSetSize', jobs['3'])
+        self.assertEqual(jobs.toDict(), expected)
+        self.assertEqual(json.loads(json.dumps(jobs.toDict())), expected)
+
+    def testMixedValues(self):
+        """ values which do not fit in a packed column are kept as they are """
+        self.nodes['3']['Retries'] = 2**70
+        self.nodes['3']['WallDurations'] = [1.5]
+        self.nodes['3']['SiteHistory'] = 'Unknown'
+        self.nodes['3']['Flag'] = True
+        self.nodes['1']['ResidentSetSize'] = [2**40]
+        expected = copy.deepcopy(self.nodes)
+        del expected['DagStatus']
+        jobs = JobStates.fromNodes(self.nodes)
+        self.assertEqual(jobs.toDict(), expected)
+        self.assertIs(jobs['3']['Flag'], True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,514 @@
+#!/usr/bin/env python
+# encoding: utf-8
+# pylint: disable=consider-using-f-string, invalid-name
+"""
+LocalCRABServer.py
+
+A self-contained stand-in for CRABServer and for the schedd webdir, to run client commands
+and benchmarks on a laptop without network and without the WMCore REST test harness.
+Only the python standard library and the openssl executable (for a throw-away certificate) are needed.
+
+It answers over HTTPS on localhost to:
+  /crabserver/<instance>/info               subresources version, delegatedn
+  /crabserver/<instance>/task               subresources search, webdir, webdirprx, status, type
+  /crabserver/<instance>/workflow           GET data2, logs2, publicationstatus, report2
+                                            POST/PUT/DELETE (submit, resubmit2, proceed, kill)
+  /crabserver/<instance>/filemetadata       GET
+  /crabserver/<instance>/fileusertransfers  GET
+  /web/<taskname>/<file>                    status_cache.pkl, AutomaticSplitting/DagLog0.txt, job logs
+with canned data for one task whose size is chosen by the caller, e.g. 100k jobs.
+Webdir files carry an ETag and conditional requests get 304 until the task progresses.
+
+Use from a test or benchmark:
+    server = LocalCRABServer(numJobs=100000)
+    server.start()
+    os.environ['X509_CERT_DIR'] = server.caDir
+    CRABClient.Emulator.setEmulator('rest', server.restFactory())
+    ... run commands, with server.proxyFile as proxy ...
+    server.stop()
+
+or standalone:
+    python LocalCRABServer.py --jobs 100000 --port 8443
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+import os
+import sys
+import ssl
+import gzip
+import json
+import time
+import shutil
+import pickle
+import random
+import hashlib
+import tempfile
+import threading
+import subprocess
+from io import BytesIO
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qsl, unquote
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qsl
+    from urllib import unquote
+
+from CRABClient.RestInterfaces import CRABRest
+
+TASKNAME = '240101_000000:crabuser_crab_localtest'
+USERNAME = 'crabuser'
+
+SITES = ['T2_CH_CERN', 'T2_DE_DESY', 'T2_IT_Pisa', 'T2_US_Nebraska', 'T2_US_Wisconsin', 'T1_US_FNAL',
+         'T2_FR_GRIF', 'T2_UK_London_IC', 'T2_ES_CIEMAT', 'T3_US_FNALLPC']
+# (state, weight) of the jobs in a freshly generated task
+STATES = [('finished', 50), ('running', 20), ('idle', 10), ('failed', 10), ('transferring', 5),
+          ('cooloff', 3), ('unsubmitted', 2)]
+# exit codes and error messages of failed jobs, the messages embed job specific parts on purpose
+ERRORS = [(8021, "FileReadError: could not open /store/data/Run2024A/file_%(n)d.root on host node%(h)d.cern.ch"),
+          (50664, "Not retrying job due to wall clock limit (job automatically killed on the worker node)"),
+          (60324, "Failure in stage-out to %(site)s: gfal-copy exited with status 70 after %(n)d seconds"),
+          (8001, "Fatal Exception: std::bad_alloc at event %(n)d"),
+          (90000, "Post-processing failed: file metadata upload attempt %(h)d of job %(n)d timed out")]
+
+
+def makeStatusCache(numJobs, seed=0, automaticSplitting=False, now=None):
+    """
+    Build a status_cache content with numJobs jobs, in the same format which is written by the
+    schedd: {'overallDagStatus': ..., 'nodes': {jobid: {'State': ..., ...}}}.
+    The job times are in the last hours before now (default: the current time), so the same
+    numJobs, seed and now always give the same content.
+    With automaticSplitting, five probe jobs 0-1 ... 0-5 and some tail jobs N-M are added.
+    """
+    rng = random.Random(seed)
+    now = int(time.time()) if now is None else now
+    population = []
+    for state, weight in STATES:
+        population.extend([state] * weight)
+    nodes = {}
+
+    def makeJob(state, clusterId):
+        info = {'State': state, 'Retries': 0, 'Restarts': 0, 'JobIds': [], 'SiteHistory': [],
+                'WallDurations': [], 'ResidentSetSize': [], 'TotalSysCpuTimeHistory': [],
+                'TotalUserCpuTimeHistory': [], 'SubmitTimes': [], 'StartTimes': [], 'EndTimes': []}
+        if state == 'unsubmitted':
+            return info
+        info['Retries'] = rng.choice([0, 0, 0, 0, 1, 1, 2, 3])
+        info['Restarts'] = rng.choice([0, 0, 0, 0, 0, 1])
+        for attempt in range(info['Retries'] + 1):
+            info['JobIds'].append('%d.%d' % (clusterId, attempt))
+            info['SubmitTimes'].append(now - 7200 + attempt * 600)
+            if state == 'idle' and attempt == info['Retries']:
+                break
+            site = rng.choice(SITES)
+            wall = rng.randint(60, 36000)
+            info['SiteHistory'].append(site)
+            info['WallDurations'].append(wall)
+            info['ResidentSetSize'].append(rng.randint(200, 2500) * 1024)
+            info['TotalSysCpuTimeHistory'].append(int(wall * rng.uniform(0.01, 0.05)))
+            info['TotalUserCpuTimeHistory'].append(int(wall * rng.uniform(0.2, 0.95)))
+            info['StartTimes'].append(now - 7000 + attempt * 600)
+            info['EndTimes'].append(now - 7000 + attempt * 600 + wall)
+        if state in ['failed', 'cooloff']:
+            exitCode, template = rng.choice(ERRORS)
+            site = info['SiteHistory'][-1] if info['SiteHistory'] else 'Unknown'
+            info['Error'] = [exitCode, template % {'n': rng.randint(1, 100000), 'h': rng.randint(1, 999), 'site': site},
+                             {}]
+        return info
+
+    for i in range(1, numJobs + 1):
+        nodes[str(i)] = makeJob(rng.choice(population), 1000000 + i)
+    if automaticSplitting:
+        for i in range(1, 6):
+            nodes['0-%d' % i] = makeJob('finished', 900000 + i)
+        for i in range(1, max(1, numJobs // 100) + 1):
+            nodes['1-%d' % i] = makeJob(rng.choice(population), 2000000 + i)
+
+    return {'overallDagStatus': 'RUNNING', 'nodes': nodes}
+
+
+def advanceStatusCache(statusCache, fraction=0.1, seed=0):
+    """
+    Move a fraction of the jobs one step forward (idle -> running -> transferring -> finished,
+    cooloff -> idle), as it happens between two refreshes of the status_cache on the schedd
+    returns: the number of jobs which changed state
+    """
+    rng = random.Random(seed)
+    nextState = {'unsubmitted': 'idle', 'idle': 'running', 'running': 'transferring',
+                 'transferring': 'finished', 'cooloff': 'idle'}
+    changed = 0
+    for info in statusCache['nodes'].values():
+        if info['State'] in nextState and rng.random() < fraction:
+            info['State'] = nextState[info['State']]
+            changed += 1
+    if all(info['State'] in ['finished', 'failed'] for info in statusCache['nodes'].values()):
+        statusCache['overallDagStatus'] = 'COMPLETED'
+    return changed
+
+
+def makeTaskRow(webdir, automaticSplitting=False):
+    """ the columns of a 'task search' answer, values are strings as returned by the server """
+    row = {
+        'tm_taskname': TASKNAME, 'tm_task_status': 'SUBMITTED', 'tm_task_command': 'SUBMIT',
+        'tm_username': USERNAME, 'tm_user_webdir': webdir, 'clusterid': '1234567',
+        'tm_schedd': 'crab3@vocms0199.cern.ch', 'tm_collector': 'cmsgwms-collector-global.cern.ch',
+        'tw_name': 'crab-prod-tw01', 'tm_publication': 'T', 'tm_maxmemory': '2000',
+        'tm_maxjobruntime': '1315', 'tm_numcores': '1',
+        'tm_split_algo': 'Automatic' if automaticSplitting else 'FileBased',
+        'tm_output_lfn': '/store/user/%s' % USERNAME, 'tm_asyncdest': 'T2_CH_CERN',
+        'tm_start_time': time.strftime('%Y-%m-%d %H:%M:%S.000000', time.gmtime(time.time() - 86400)),
+        'tm_task_warnings': '[]', 'tm_task_failure': '',
+        'tm_transfer_container': 'None', 'tm_transfer_rule': 'None', 'tm_publish_rule': 'None',
+        'tm_output_dataset': "['/GenericTTbar/%s-localtest-00000000000000000000000000000000/USER']" % USERNAME,
+        'tm_input_dataset': '/GenericTTbar/HC-CMSSW_9_2_6_91X_mcRun1_realistic_v2-v2/AODSIM',
+        'tm_save_logs': 'T', 'tm_transfer_outputs': 'T', 'tm_edm_outfiles': "['output.root']",
+        'tm_tfile_outfiles': '[]', 'tm_outfiles': '[]', 'tm_scriptexe': 'None',
+        'tm_dbs_url': 'https://cmsweb.cern.ch/dbs/prod/global/DBSReader',
+        'tm_publish_dbs_url': 'https://cmsweb.cern.ch/dbs/prod/phys03/DBSWriter',
+        'tm_job_type': 'Analysis', 'tm_user_role': '', 'tm_user_group': '',
+    }
+    columns = sorted(row)
+    return {'desc': {'columns': columns}, 'result': [row[c] for c in columns]}
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """ dispatch the requests to the LocalCRABServer the HTTP server belongs to """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, verb):
+        parsed = urlparse(self.path)
+        body = b''
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            body = self.rfile.read(length)
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.GzipFile(fileobj=BytesIO(body)).read()
+        query = parsed.query if verb in ['GET', 'HEAD'] else body.decode('utf-8')
+        args = {}
+        for name, value in parse_qsl(query, keep_blank_values=True):
+            if name == 'jobids':  # can be repeated
+                args.setdefault(name, []).append(value)
+            else:
+                args[name] = value
+        server = self.server.crabServer
+        server.hits[verb] = server.hits.get(verb, 0) + 1
+        try:
+            code, headers, payload = server.handle(verb, unquote(parsed.path), args, dict(self.headers.items()))
+        except Exception as ex:  # pylint: disable=broad-except
+            code, headers, payload = 500, {'X-Error-Detail': 'Server error', 'X-Error-Info': str(ex)}, b''
+        server.responses[code] = server.responses.get(code, 0) + 1
+        self.send_response(code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if verb != 'HEAD':
+            self.wfile.write(payload)
+
+
+class LocalCRABServer(object):
+    """
+    One CRABServer REST + schedd webdir on localhost, serving the data of one synthetic task.
+    With secure=False it talks plain HTTP, like the schedds whose webdir is an http:// URL.
+    """
+
+    def __init__(self, numJobs=1000, port=0, seed=0, automaticSplitting=False, instance='prod', secure=True):
+        self.numJobs = numJobs
+        self.port = port
+        self.seed = seed
+        self.automaticSplitting = automaticSplitting
+        self.instance = instance
+        self.secure = secure
+        self.taskname = TASKNAME
+        self.hits = {}  # verb: number of requests
+        self.responses = {}  # HTTP code: number of responses
+        self.workDir = None
+        self.caDir = None
+        self.proxyFile = None
+        self._httpd = None
+        self._thread = None
+        self._statusCache = None
+        self._statusCachePickle = None
+        self._statusCacheETag = None
+        self._lock = threading.Lock()
+
+    @property
+    def host(self):
+        """ what the client is given as server name, i.e. what goes in self.serverurl """
+        return 'localhost:%d' % self.port
+
+    @property
+    def webdir(self):
+        return '%s://%s/web/%s' % ('https' if self.secure else 'http', self.host, self.taskname)
+
+    def start(self):
+        """ create the certificates and serve requests from a daemon thread """
+        self.workDir = tempfile.mkdtemp(prefix='crab_localserver-')
+        certFile, keyFile = self._makeCertificate()
+        self._httpd = _ThreadingHTTPServer(('localhost', self.port), _Handler)
+        self._httpd.crabServer = self
+        self.port = self._httpd.server_address[1]
+        if self.secure and hasattr(ssl, 'SSLContext') and hasattr(ssl, 'PROTOCOL_TLS_SERVER'):
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certFile, keyFile)
+            self._httpd.socket = context.wrap_socket(self._httpd.socket, server_side=True)
+        elif self.secure:
+            self._httpd.socket = ssl.wrap_socket(self._httpd.socket, certfile=certFile,  # pylint: disable=no-member
+                                                 keyfile=keyFile, server_side=True)
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+        if self.workDir:
+            shutil.rmtree(self.workDir, ignore_errors=True)
+            self.workDir = None
+
+    def _makeCertificate(self):
+        """
+        A self signed certificate for localhost. caDir can be used as X509_CERT_DIR and proxyFile
+        (certificate and key in one file) as user proxy: the server does not check client certificates
+        """
+        certFile = os.path.join(self.workDir, 'localhost.pem')
+        keyFile = os.path.join(self.workDir, 'localhost.key')
+        command = ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '2',
+                   '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost',
+                   '-keyout', keyFile, '-out', certFile]
+        subprocess.check_call(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.caDir = os.path.join(self.workDir, 'certificates')
+        os.mkdir(self.caDir)
+        certHash = subprocess.check_output(['openssl', 'x509', '-hash', '-noout', '-in', certFile])
+        shutil.copy(certFile, os.path.join(self.caDir, certHash.decode('utf-8').strip() + '.0'))
+        self.proxyFile = os.path.join(self.workDir, 'proxy.pem')
+        with open(self.proxyFile, 'wb') as proxy:
+            for name in [certFile, keyFile]:
+                with open(name, 'rb') as fd:
+                    proxy.write(fd.read())
+        os.chmod(self.proxyFile, 0o600)
+        return certFile, keyFile
+
+    def restFactory(self):
+        """
+        A CRABRest class which talks to this server whatever hostname it is created with,
+        to be injected with CRABClient.Emulator.setEmulator('rest', ...)
+        """
+        localServer = self
+
+        class LocalCRABRest(CRABRest):
+            """ CRABRest bound to the LocalCRABServer """
+            def __init__(self, hostname='localhost', localcert=None, localkey=None,
+                         retry=0, logger=None, verbose=False, userAgent=None):
+                CRABRest.__init__(self, hostname=localServer.host, localcert=localcert or localServer.proxyFile,
+                                  localkey=localkey or localServer.proxyFile, retry=retry,
+                                  logger=logger, verbose=verbose, userAgent=userAgent)
+                self.setDbInstance(localServer.instance)
+
+            def setDbInstance(self, dbInstance='prod'):
+                CRABRest.setDbInstance(self, localServer.instance)
+
+        return LocalCRABRest
+
+    def statusCache(self):
+        """ the status_cache content, generated at first use """
+        with self._lock:
+            if self._statusCache is None:
+                self._statusCache = makeStatusCache(self.numJobs, self.seed, self.automaticSplitting)
+                self._statusCachePickle = None
+            return self._statusCache
+
+    def advance(self, fraction=0.1):
+        """ let the task progress, the next download of status_cache.pkl gets the new content """
+        statusCache = self.statusCache()
+        with self._lock:
+            self.seed += 1
+            changed = advanceStatusCache(statusCache, fraction, self.seed)
+            self._statusCachePickle = None
+        return changed
+
+    def _statusCacheFile(self):
+        self.statusCache()
+        with self._lock:
+            if self._statusCachePickle is None:
+                # protocol 2 can be read by python2 clients as well
+                self._statusCachePickle = pickle.dumps(self._statusCache, protocol=2)
+                self._statusCacheETag = '"%s"' % hashlib.sha1(self._statusCachePickle).hexdigest()
+            return self._statusCachePickle, self._statusCacheETag
+
+    def handle(self, verb, path, args, headers):
+        """ returns (HTTP code, response headers, body) """
+        prefix = '/crabserver/%s/' % self.instance
+        if path.startswith(prefix):
+            api = path[len(prefix):].strip('/')
+            method = getattr(self, '_api_%s' % api, None)
+            if method is None:
+                return self._error(404, 'No such API: %s' % api)
+            result = method(verb, args)
+            if isinstance(result, tuple):
+                return result
+            payload = json.dumps(result).encode('utf-8')
+            return 200, {'Content-Type': 'application/json'}, payload
+        if path.startswith('/web/%s/' % self.taskname):
+            return self._webdirFile(path[len('/web/%s/' % self.taskname):], headers)
+        return self._error(404, 'Not found: %s' % path)
+
+    @staticmethod
+    def _error(code, info):
+        return code, {'X-Error-Detail': 'Invalid input parameter' if code == 400 else 'Not found',
+                      'X-Error-Info': info, 'X-Error-Id': '0' * 32}, b''
+
+    def _api_info(self, verb, args):
+        subresource = args.get('subresource')
+        if subresource == 'version':
+            return {'result': [['.*']]}
+        if subresource == 'delegatedn':
+            return {'result': [{'services': []}]}
+        return {'result': [{'crabserver': 'LocalCRABServer', 'instance': self.instance}]}
+
+    def _api_task(self, verb, args):
+        subresource = args.get('subresource')
+        if args.get('workflow') != self.taskname:
+            return self._error(400, "Task %s not found" % args.get('workflow'))
+        if subresource == 'search':
+            return makeTaskRow(self.webdir, self.automaticSplitting)
+        if subresource in ['webdir', 'webdirprx']:
+            return {'result': [self.webdir]}
+        if subresource == 'status':
+            row = makeTaskRow(self.webdir, self.automaticSplitting)
+            return {'result': [dict(zip(row['desc']['columns'], row['result']))]}
+        if subresource == 'type':
+            return {'result': ['Analysis']}
+        return self._error(400, "Invalid subresource %s" % subresource)
+
+    def _fileInfo(self, jobid, fileType):
+        """ one entry of the file lists returned by workflow data2/logs2 and by filemetadata """
+        rng = random.Random('%s-%s-%s' % (self.seed, jobid, fileType))
+        if fileType == 'LOG':
+            lfn = '/store/user/%s/GenericTTbar/localtest/000000_000000/0000/log/cmsRun_%s.log.tar.gz' % (USERNAME, jobid)
+        else:
+            lfn = '/store/user/%s/GenericTTbar/localtest/000000_000000/0000/output_%s.root' % (USERNAME, jobid)
+        return {'jobid': jobid, 'lfn': lfn, 'tmplfn': lfn.replace('/store/user/', '/store/temp/user/'),
+                'pfn': 'davs://eoscms.cern.ch:443/eos/cms' + lfn, 'pnn': 'T2_CH_CERN', 'type': fileType,
+                'size': rng.randint(10 ** 5, 10 ** 9),
+                'checksum': {'adler32': '%08x' % rng.getrandbits(32), 'cksum': str(rng.getrandbits(31)), 'md5': 'asda'}}
+
+    def _finishedJobs(self, args):
+        nodes = self.statusCache()['nodes']
+        jobids = args['jobids'] if 'jobids' in args else sorted(nodes, key=lambda j: [int(x) for x in j.split('-')])
+        limit = int(args.get('limit', -1))
+        finished = [j for j in jobids if j in nodes and nodes[j]['State'] in ['finished', 'transferring']]
+        return finished if limit < 0 else finished[:limit]
+
+    def _api_workflow(self, verb, args):
+        if verb != 'GET':
+            # submit, resubmit2, proceed, kill: accepted and nothing else
+            return {'result': [{'result': 'ok', 'RequestName': self.taskname}]}
+        subresource = args.get('subresource')
+        if subresource in ['data2', 'logs2']:
+            fileType = 'LOG' if subresource == 'logs2' else 'EDM'
+            return {'result': [self._fileInfo(j, fileType) for j in self._finishedJobs(args)]}
+        if subresource == 'publicationstatus':
+            finished = len([i for i in self.statusCache()['nodes'].values() if i['State'] == 'finished'])
+            return {'result': [{'status': {'published': finished // 2, 'publishing': finished // 4,
+                                           'not_published': finished - finished // 2 - finished // 4,
+                                           'publication_failed': 0},
+                                'failure_reasons': {}}]}
+        if subresource == 'report2':
+            return {'result': [{'runsAndLumis': {}}]}
+        return self._error(400, "Invalid subresource %s" % subresource)
+
+    def _api_filemetadata(self, verb, args):
+        fileType = args.get('filetype', 'EDM')
+        result = []
+        for jobid in self._finishedJobs(args):
+            info = self._fileInfo(jobid, fileType)
+            result.append(json.dumps({'taskname': self.taskname, 'jobid': jobid, 'outdataset': '/GenericTTbar/%s-localtest/USER' % USERNAME,
+                                      'lfn': info['lfn'], 'type': fileType, 'location': info['pnn'], 'filestate': 'FINISHED',
+                                      'size': info['size'], 'checksum': info['checksum'], 'inevents': 1000,
+                                      'runlumi': {'1': {str(int(jobid.split('-')[-1])): '1000'}}}))
+        return {'result': result}
+
+    def _api_fileusertransfers(self, verb, args):
+        columns = ['tm_id', 'tm_username', 'tm_taskname', 'tm_destination', 'tm_destination_lfn',
+                   'tm_source', 'tm_source_lfn', 'tm_filesize', 'tm_publish', 'tm_jobid',
+                   'tm_job_retry_count', 'tm_type', 'tm_transfer_state', 'tm_publication_state']
+        rows = []
+        for jobid in self._finishedJobs(args):
+            info = self._fileInfo(jobid, 'EDM')
+            rows.append([hashlib.sha1(info['lfn'].encode('utf-8')).hexdigest(), USERNAME, self.taskname,
+                         'T2_CH_CERN', info['lfn'], info['pnn'], info['tmplfn'], info['size'], 1,
+                         jobid, 0, 'output', 3, 1])
+        return {'desc': {'columns': columns}, 'result': rows}
+
+    def _webdirFile(self, name, headers):
+        if name == 'status_cache.pkl':
+            content, etag = self._statusCacheFile()
+            if headers.get('If-None-Match') == etag:
+                return 304, {'ETag': etag}, b''
+            return 200, {'ETag': etag, 'Content-Type': 'application/octet-stream'}, content
+        if name == 'AutomaticSplitting/DagLog0.txt':
+            lines = ['%s PreDAG: header' % time.strftime('%Y-%m-%d %H:%M:%S')] * 6
+            lines[1] = 'x PreDAG: average throughput of probe jobs: 12.3 events/s'
+            lines[4] = 'x PreDAG: average event size: 45678 bytes'
+            lines[5] = 'x PreDAG: splitting into jobs of 2000 events'
+            return 200, {'Content-Type': 'text/plain'}, '\n'.join(lines).encode('utf-8')
+        if name.startswith('job_out.') and name.endswith('.txt'):
+            return 200, {'Content-Type': 'text/plain'}, ('log of %s\n' % name).encode('utf-8')
+        return self._error(404, 'Not found: %s' % name)
+
+
+def main():
+    """ run the server in the foreground, e.g. for benchmarks of a crab client pointed to it """
+    from optparse import OptionParser  # pylint: disable=deprecated-module
+    parser = OptionParser(usage="%prog [--jobs N] [--port P] [--automatic]")
+    parser.add_option('--jobs', dest='jobs', type='int', default=100000, help="number of jobs in the task")
+    parser.add_option('--port', dest='port', type='int', default=8443, help="port to listen on")
+    parser.add_option('--seed', dest='seed', type='int', default=0, help="seed for the synthetic data")
+    parser.add_option('--automatic', dest='automatic', action='store_true', default=False,
+                      help="generate a task with automatic splitting (probe and tail jobs)")
+    options, _ = parser.parse_args()
+    server = LocalCRABServer(numJobs=options.jobs, port=options.port, seed=options.seed,
+                             automaticSplitting=options.automatic)
+    server.start()
+    print("LocalCRABServer for task %s with %d jobs listening on %s" % (server.taskname, server.numJobs, server.host))
+    print("  export X509_CERT_DIR=%s X509_USER_PROXY=%s" % (server.caDir, server.proxyFile))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
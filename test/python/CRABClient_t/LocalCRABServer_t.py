@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+LocalCRABServer_t.py
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import CRABClient.Emulator
+from CRABClient.ClientUtilities import cmd_exist
+from CRABClient.ClientUtilities import getColumn, server_info, getTaskDBInfo
+from CRABClient.UserUtilities import curlGetFileFromURL, linkCachedFile
+from CRABClient.RestInterfaces import clearRequestMemo
+
+from LocalCRABServer import LocalCRABServer, makeStatusCache
+
+
+class LocalCRABServerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalCRABServer(numJobs=200).start()
+        cls.oldCertDir = os.environ.get('X509_CERT_DIR')
+        os.environ['X509_CERT_DIR'] = cls.server.caDir
+        CRABClient.Emulator.setEmulator('rest', cls.server.restFactory())
+
+    @classmethod
+    def tearDownClass(cls):
+        CRABClient.Emulator.clearEmulators()
+        if cls.oldCertDir is None:
+            del os.environ['X509_CERT_DIR']
+        else:
+            os.environ['X509_CERT_DIR'] = cls.oldCertDir
+        cls.server.stop()
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def testStatusCache(self):
+        statusCache = makeStatusCache(1000, seed=3, automaticSplitting=True, now=1700000000)
+        self.assertEqual(statusCache, makeStatusCache(1000, seed=3, automaticSplitting=True, now=1700000000))
+        nodes = statusCache['nodes']
+        self.assertEqual(len([j for j in nodes if '-' not in j]), 1000)
+        self.assertEqual(len([j for j in nodes if j.startswith('0-')]), 5)
+        for info in nodes.values():
+            if info['State'] == 'failed':
+                self.assertEqual(len(info['Error']), 3)
+
+    def testRestAPIs(self):
+        crabserver = CRABClient.Emulator.getEmulator('rest')(hostname='cmsweb.cern.ch')
+        self.assertEqual(server_info(crabserver, subresource='version'), ['.*'])
+        dictresult, status, _ = crabserver.get(api='task', data={'subresource': 'search',
+                                                                 'workflow': self.server.taskname})
+        self.assertEqual(status, 200)
+        self.assertEqual(getColumn(dictresult, 'tm_user_webdir'), self.server.webdir)
+        dictresult, _, _ = crabserver.get(api='workflow', data={'subresource': 'data2', 'limit': 3,
+                                                                'workflow': self.server.taskname})
+        self.assertEqual(len(dictresult['result']), 3)
+        dictresult, _, _ = crabserver.delete(api='workflow', data={'workflow': self.server.taskname})
+        self.assertEqual(dictresult['result'][0]['result'], 'ok')
+
+    def testRequestMemo(self):
+        clearRequestMemo()
+        crabserver = CRABClient.Emulator.getEmulator('rest')(hostname='cmsweb.cern.ch')
+        search = {'subresource': 'search', 'workflow': self.server.taskname}
+        data = {'subresource': 'data2', 'limit': 3, 'workflow': self.server.taskname}
+        numGets = self.server.hits.get('GET', 0)
+        first, _, _ = crabserver.get(api='task', data=search)
+        second, _, _ = crabserver.get(api='task', data=search)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        self.assertEqual(self.server.hits['GET'], numGets + 1)
+        # large answers which are not asked again are not kept
+        for _ in range(2):
+            crabserver.get(api='workflow', data=data)
+        self.assertEqual(self.server.hits['GET'], numGets + 3)
+        clearRequestMemo()
+
+    def testTaskInfoCache(self):
+        crabserver = CRABClient.Emulator.getEmulator('rest')(hostname='cmsweb.cern.ch')
+        numGets = self.server.hits.get('GET', 0)
+        for ttl, numRequests in [(None, 1), (None, 1), (0, 2)]:
+            clearRequestMemo()
+            dictresult, status, _ = getTaskDBInfo(crabserver, self.server.taskname, self.tmpDir, ttl=ttl)
+            self.assertEqual(status, 200)
+            self.assertEqual(getColumn(dictresult, 'tm_user_webdir'), self.server.webdir)
+            # within the TTL from the cache in the project directory, with ttl=0 always from the server
+            self.assertEqual(self.server.hits['GET'], numGets + numRequests)
+
+    def testWebdirFiles(self):
+        self._checkWebdirFiles(self.server)
+
+    def testWebdirFilesOverHTTP(self):
+        server = LocalCRABServer(numJobs=50, secure=False).start()
+        try:
+            self.assertTrue(server.webdir.startswith('http://'))
+            self._checkWebdirFiles(server)
+        finally:
+            server.stop()
+
+    def testWebdirFilesWithCurl(self):
+        if not cmd_exist('curl'):
+            self.skipTest('curl is not available')
+        os.environ['CRAB_useCurl'] = '1'
+        try:
+            self._checkWebdirFiles(self.server)
+        finally:
+            del os.environ['CRAB_useCurl']
+
+    def testLinkCachedFile(self):
+        url = self.server.webdir + '/status_cache.pkl'
+        localFile = os.path.join(self.tmpDir, 'status_cache.pkl')
+        cacheDir = os.path.join(self.tmpDir, 'cache')
+        snapshot = os.path.join(self.tmpDir, 'snapshot.pkl')
+        self.assertFalse(linkCachedFile(cacheDir, url, localFile, snapshot))
+        self.assertEqual(curlGetFileFromURL(url, localFile, self.server.proxyFile, cacheDir=cacheDir), 200)
+        with open(localFile, 'rb') as fd:
+            oldContent = fd.read()
+        self.assertTrue(linkCachedFile(cacheDir, url, localFile, snapshot))
+        self.assertEqual(os.stat(snapshot).st_nlink, 2)
+        # the cache moves on with the task, the linked copy keeps what was downloaded then
+        self.assertTrue(self.server.advance(0.5) > 0)
+        self.assertEqual(curlGetFileFromURL(url, localFile, self.server.proxyFile, cacheDir=cacheDir), 200)
+        self.assertEqual(os.stat(snapshot).st_nlink, 1)
+        with open(snapshot, 'rb') as fd:
+            self.assertEqual(fd.read(), oldContent)
+        # not a copy of the file just downloaded
+        with open(localFile, 'ab') as fd:
+            fd.write(b'x')
+        self.assertFalse(linkCachedFile(cacheDir, url, localFile, snapshot))
+
+    def _checkWebdirFiles(self, server):
+        url = server.webdir + '/status_cache.pkl'
+        localFile = os.path.join(self.tmpDir, 'status_cache.pkl')
+        cacheDir = os.path.join(self.tmpDir, 'cache')
+        self.assertEqual(curlGetFileFromURL(url, localFile, server.proxyFile, cacheDir=cacheDir), 200)
+        with open(localFile, 'rb') as fd:
+            self.assertEqual(pickle.load(fd), server.statusCache())
+        # unchanged: the server answers 304 and the file comes from the local cache
+        os.remove(localFile)
+        notModified = server.responses.get(304, 0)
+        self.assertEqual(curlGetFileFromURL(url, localFile, server.proxyFile, cacheDir=cacheDir), 200)
+        self.assertEqual(server.responses.get(304, 0), notModified + 1)
+        with open(localFile, 'rb') as fd:
+            self.assertEqual(pickle.load(fd), server.statusCache())
+        # the task progresses and the new content arrives
+        self.assertTrue(server.advance(0.5) > 0)
+        self.assertEqual(curlGetFileFromURL(url, localFile, server.proxyFile, cacheDir=cacheDir), 200)
+        self.assertEqual(server.responses.get(304, 0), notModified + 1)
+        with open(localFile, 'rb') as fd:
+            self.assertEqual(pickle.load(fd), server.statusCache())
+        self.assertEqual(curlGetFileFromURL(server.webdir + '/nothere.txt', localFile,
+                                            server.proxyFile), 404)
+        self.assertFalse(os.path.exists(localFile))
+
+
+if __name__ == '__main__':
+    unittest.main()
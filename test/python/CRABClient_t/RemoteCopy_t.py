@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+RemoteCopy_t.py
+
+remote_copy with a fake gfal-copy, which copies file:// sources and fails for the files named bad*
+"""
+
+import os
+import shutil
+import logging
+import tempfile
+import unittest
+
+from CRABClient.Adler32 import fileAdler32
+from CRABClient.TransferJournal import TransferJournal
+import CRABClient.Commands.remote_copy as remoteCopyModule
+from CRABClient.Commands.remote_copy import remote_copy
+
+FAKE_GFAL_COPY = """#!/bin/bash
+# one line per command: the number of sources and whether -K was given
+# without arguments, e.g. from cmd_exist, there is nothing to do
+[ $# -eq 0 ] && exit 1
+checksum=no
+args=()
+while [ $# -gt 0 ]; do
+  case "$1" in
+    -v) shift;;
+    -K) checksum=yes; shift 2;;
+    -T|-t) shift 2;;
+    *) args+=("$1"); shift;;
+  esac
+done
+n=${#args[@]}
+dst="${args[$((n-1))]}"
+echo "$((n-1)) $checksum" >> %(calls)s
+rc=0
+for ((i=0; i<n-1; i++)); do
+  src="${args[$i]}"
+  case "$(basename $src)" in
+    bad*) echo "gfal-copy error: 2 (No such file or directory) - $src: source does not exist" >&2; rc=2; continue;;
+  esac
+  cp "${src#file://}" "${dst#file://}"
+done
+exit $rc
+"""
+
+
+class Options(object):
+
+    def __init__(self, destination, files, nparallel, checksum):
+        self.destination = destination
+        self.inputdict = files
+        self.nparallel = nparallel
+        self.checksum = checksum
+        self.waittime = None
+        self.command = 'GFAL'
+
+
+class RemoteCopyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'source')
+        self.destination = os.path.join(self.directory, 'destination')
+        binDir = os.path.join(self.directory, 'bin')
+        for path in [self.source, self.destination, binDir]:
+            os.mkdir(path)
+        self.calls = os.path.join(self.directory, 'calls')
+        with open(os.path.join(binDir, 'gfal-copy'), 'w') as fd:
+            fd.write(FAKE_GFAL_COPY % {'calls': self.calls})
+        os.chmod(os.path.join(binDir, 'gfal-copy'), 0o755)
+        self.oldPath = os.environ['PATH']
+        # only the fake gfal-copy, not a gfal-cat of the system
+        os.environ['PATH'] = binDir + ':/bin:/usr/bin'
+        self.oldMaxRetries = remoteCopyModule.MAX_RETRIES
+        remoteCopyModule.MAX_RETRIES = 0
+        self.logger = logging.getLogger('RemoteCopyTest')
+        self.logger.addHandler(logging.NullHandler())
+
+    def tearDown(self):
+        os.environ['PATH'] = self.oldPath
+        remoteCopyModule.MAX_RETRIES = self.oldMaxRetries
+        shutil.rmtree(self.directory)
+
+    def _files(self, names, withSize=True, checksums=None):
+        """ the file descriptions which getoutput gives to remote_copy """
+        files = []
+        for i, name in enumerate(names):
+            path = os.path.join(self.source, name)
+            if not name.startswith('bad'):
+                with open(path, 'w') as fd:
+                    fd.write('x' * (100 + i))
+            myfile = {'pfn': 'file://' + path, 'pnn': 'T2_CH_CERN'}
+            if withSize:
+                myfile['size'] = 100 + i
+            if checksums is not None and not name.startswith('bad'):
+                myfile['checksum'] = {'adler32': checksums.get(name) or fileAdler32(path)}
+            files.append(myfile)
+        return files
+
+    def _copy(self, files, nparallel=2, checksum=None):
+        command = remote_copy.__new__(remote_copy)
+        command.logger = self.logger
+        command.options = Options(self.destination, files, nparallel, checksum)
+        return command()
+
+    def _calls(self):
+        with open(self.calls) as fd:
+            return [line.split() for line in fd]
+
+    def testBatches(self):
+        names = ['output_%d.root' % i for i in range(1, 21)]
+        # the server checksum of output_5.root is the one without leading zeros
+        checksums = {'output_3.root': 'deadbeef'}
+        files = self._files(names, checksums=checksums)
+        files[4]['checksum']['adler32'] = files[4]['checksum']['adler32'].lstrip('0')
+        succeeded, failed = self._copy(files, checksum='ADLER32')
+        # 20 files for 2 threads: 2 batches of 10 files, all copied with -K
+        self.assertEqual(sorted(self._calls()), [['10', 'yes'], ['10', 'yes']])
+        self.assertEqual(len(succeeded), 19)
+        self.assertEqual(list(failed), ['output_3.root'])
+        self.assertIn('wrong Adler32 checksum', failed['output_3.root'])
+        self.assertFalse(os.path.exists(os.path.join(self.destination, 'output_3.root')))
+
+    def testJournalWithoutChecksum(self):
+        names = ['output_%d.root' % i for i in range(1, 5)]
+        files = self._files(names, checksums={})
+        self._copy(files, nparallel=1)
+        self.assertEqual(self._calls(), [['4', 'no']])
+        # damaged after a retrieval without --checksum, with the same size
+        with open(os.path.join(self.destination, 'output_2.root'), 'w') as fd:
+            fd.write('y' * 101)
+        succeeded, failed = self._copy(files, nparallel=1, checksum='ADLER32')
+        # only the damaged file is copied again, the others are verified on disk
+        self.assertEqual(self._calls(), [['4', 'no'], ['1', 'yes']])
+        self.assertEqual((list(succeeded), failed), (['output_2.root'], {}))
+        journal = TransferJournal(self.destination)
+        for myfile, name in zip(files, names):
+            localFilename = os.path.join(self.destination, name)
+            self.assertTrue(journal.isDone(localFilename, myfile['size'], myfile['checksum']['adler32']))
+
+    def testBadFileInBatch(self):
+        names = ['output_1.root', 'bad_2.root', 'output_3.root', 'output_4.root']
+        succeeded, failed = self._copy(self._files(names), nparallel=1)
+        self.assertEqual(self._calls(), [['4', 'no']])
+        self.assertEqual(sorted(succeeded), ['output_1.root', 'output_3.root', 'output_4.root'])
+        # the error is the one about this file, from the output of the command for the whole batch
+        self.assertEqual(list(failed), ['bad_2.root'])
+        self.assertIn('source does not exist', failed['bad_2.root'])
+        for name in succeeded:
+            self.assertTrue(os.path.isfile(os.path.join(self.destination, name)))
+
+    def testUnknownSize(self):
+        names = ['output_%d.root' % i for i in range(1, 5)]
+        succeeded, failed = self._copy(self._files(names, withSize=False), nparallel=1)
+        # without the size a truncated file can not be told from a complete one in a batch
+        self.assertEqual(self._calls(), [['1', 'no']] * 4)
+        self.assertEqual((len(succeeded), failed), (4, {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
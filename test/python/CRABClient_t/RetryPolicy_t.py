@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+RetryPolicy_t.py
+"""
+
+import unittest
+
+from CRABClient.RetryPolicy import RetryPolicy, CircuitBreaker, parseRetryAfter
+
+
+class RetryPolicyTest(unittest.TestCase):
+
+    def testParseRetryAfter(self):
+        header = "< HTTP/1.1 503 Service Unavailable\n< Retry-After: 120\n< Content-Length: 0\n"
+        self.assertEqual(parseRetryAfter(header), 120)
+        header = "< HTTP/1.1 429 Too Many Requests\n< retry-after: Thu, 01 Jan 1970 00:01:40 GMT\n"
+        self.assertEqual(parseRetryAfter(header, now=40), 60)
+        self.assertEqual(parseRetryAfter("< HTTP/1.1 503 Service Unavailable\n"), None)
+        self.assertEqual(parseRetryAfter(None), None)
+
+    def testDelay(self):
+        policy = RetryPolicy(baseDelay=2, maxDelay=10, maxRetryAfter=100)
+        for attempt, (low, high) in enumerate([(1, 2), (2, 4), (4, 8), (5, 10), (5, 10)], 1):
+            delay = policy.delay(attempt)
+            self.assertTrue(low <= delay <= high, "attempt %d: %s" % (attempt, delay))
+        self.assertTrue(30 <= policy.delay(1, retryAfter=30) <= 32)
+        self.assertEqual(policy.delay(1, retryAfter=101), None)
+
+    def testCircuitBreaker(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=10)
+        for _ in range(2):
+            breaker.recordFailure(now=0)
+        self.assertTrue(breaker.allowRequest(now=1))
+        breaker.recordFailure(now=1)
+        self.assertFalse(breaker.allowRequest(now=2))
+        self.assertEqual(breaker.retryIn(now=2), 9)
+        # after the cooldown one request goes through, and one more failure opens the circuit again
+        self.assertTrue(breaker.allowRequest(now=11))
+        breaker.recordFailure(now=11)
+        self.assertFalse(breaker.allowRequest(now=12))
+        self.assertTrue(breaker.allowRequest(now=21))
+        breaker.recordSuccess()
+        breaker.recordFailure(now=22)
+        self.assertTrue(breaker.allowRequest(now=22))
+
+
+if __name__ == '__main__':
+    unittest.main()
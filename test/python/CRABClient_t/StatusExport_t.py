@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+StatusExport_t.py
+"""
+
+import io
+import json
+import unittest
+
+from CRABClient.JobStates import JobStates
+from CRABClient.StatusSummary import StatusSummary
+from CRABClient.StatusExport import exportStatus, parseExportFields
+
+
+class StatusExportTest(unittest.TestCase):
+
+    def setUp(self):
+        nodes = {
+            'DagStatus': {},
+            '10': {'State': 'idle', 'Retries': 0, 'JobIds': [], 'SiteHistory': [], 'WallDurations': []},
+            '2': {'State': 'failed', 'Retries': 2, 'JobIds': ['124.0', '124.1'], 'SiteHistory': ['T2_IT_Pisa', 'T2_CH_CERN'],
+                  'WallDurations': [50, 200], 'ResidentSetSize': [3072000], 'Error': [8021, 'file not found', {}]},
+            '1': {'State': 'finished', 'Retries': 0, 'JobIds': ['123.0'], 'SiteHistory': ['T2_CH_CERN'],
+                  'WallDurations': [100], 'ResidentSetSize': [2048000]},
+        }
+        self.summary = StatusSummary(JobStates.fromNodes(nodes), automaticSplitt=False)
+
+    def testNdjson(self):
+        stream = io.StringIO() if str is not bytes else io.BytesIO()
+        self.assertEqual(exportStatus(stream, 'ndjson', self.summary), 3)
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([r['jobid'] for r in records], ['1', '2', '10'])
+        self.assertEqual(records[1], {'jobid': '2', 'state': 'failed', 'site': 'T2_CH_CERN', 'exitcode': 8021,
+                                      'walltime': 200, 'memory': 3000, 'retries': 2})
+        self.assertEqual(records[2]['site'], None)
+        self.assertEqual(records[2]['walltime'], None)
+        waste = [json.loads(line) for line in self._export('ndjson', ['jobid', 'waste']).splitlines()]
+        self.assertEqual([r['waste'] for r in waste], [0, 50, None])
+
+    def _export(self, fmt, fields):
+        stream = io.StringIO() if str is not bytes else io.BytesIO()
+        exportStatus(stream, fmt, self.summary, fields)
+        return stream.getvalue()
+
+    def testCsv(self):
+        stream = io.StringIO() if str is not bytes else io.BytesIO()
+        fields = parseExportFields('jobid, exitcode,waste,clusterid')
+        exportStatus(stream, 'csv', self.summary, fields, jobids=['2', '10'])
+        self.assertEqual(stream.getvalue().splitlines(),
+                         ['jobid,exitcode,waste,clusterid', '2,8021,50,124.1', '10,,,'])
+        self.assertRaises(ValueError, parseExportFields, 'jobid,color')
+
+
+if __name__ == '__main__':
+    unittest.main()
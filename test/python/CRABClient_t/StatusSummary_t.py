@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+StatusSummary_t.py
+"""
+
+import unittest
+
+from CRABClient.StatusSummary import StatusSummary, percentiles, select
+
+
+def job(state, sites=(), walls=(), rss=None, error=None):
+    info = {'State': state, 'SiteHistory': list(sites), 'WallDurations': list(walls)}
+    if rss:
+        info['ResidentSetSize'] = [rss * 1024]
+    if walls:
+        info['TotalSysCpuTimeHistory'] = [0]
+        info['TotalUserCpuTimeHistory'] = [walls[-1] // 2]
+    if error:
+        info['Error'] = error
+    return info
+
+
+class StatusSummaryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.nodes = {
+            'DagStatus': {},
+            '1': job('finished', ['T2_CH_CERN'], [100], rss=1000),
+            '2': job('failed', ['T2_IT_Pisa', 'T2_CH_CERN'], [50, 200], rss=3000, error=[8021, 'file not found']),
+            '3': job('running', ['T2_DE_DESY'], [10], rss=500),
+            '4': job('cooloff'),
+            '10': job('failed'),
+            '0-1': job('finished', ['T2_CH_CERN'], [30]),
+            '1-1': job('idle'),
+        }
+
+    def testCounts(self):
+        summary = StatusSummary(self.nodes, automaticSplitt=True)
+        self.assertNotIn('DagStatus', self.nodes)
+        self.assertEqual(summary.jobsPerStatus, {'finished': 2, 'failed': 2, 'running': 1, 'cooloff': 1, 'idle': 1})
+        self.assertEqual(summary.states, {'finished': 1, 'failed': 2, 'running': 1, 'toRetry': 1})
+        self.assertEqual(summary.statesPJ, {'finished': 1})
+        self.assertEqual(summary.statesTJ, {'idle': 1})
+        self.assertEqual(summary.numProbes, 1)
+        self.assertEqual(summary.numUnpublishable, 2)
+        self.assertEqual(sorted(summary.failedJobs), [('10', None, None), ('2', 8021, 'file not found')])
+        self.assertEqual(summary.sortedJobids(), ['0-1', '1', '2', '3', '4', '10', '1-1'])
+        self.assertEqual(summary.row('2').state, 'rescheduled')
+        self.assertEqual(summary.row('0-1').state, 'no output')
+
+    def testResourcesAndSites(self):
+        summary = StatusSummary(self.nodes, automaticSplitt=False)
+        row = summary.row('2')
+        self.assertEqual((row.site, row.wall, row.waste, row.memory, row.exitcode), ('T2_CH_CERN', 200, 50, 3000, '8021'))
+        self.assertEqual(row.cpu, 50)
+        resources = summary.resources
+        # the running job counts for the minima only, the probe job for nothing but the minima
+        self.assertEqual((resources.memCount, resources.memMin, resources.memMax), (2, 500, 3000))
+        self.assertEqual((resources.runCount, resources.runMin, resources.runMax), (4, 10, 200))
+        self.assertEqual(summary.resourcesOf(['1']).memMax, 1000)
+        self.assertEqual(summary.sites['T2_CH_CERN'], {'Runtime': 130, 'Waste': 200, 'Running': 0,
+                                                      'Success': 2, 'Failed': 1, 'Stageout': 0})
+        self.assertEqual(summary.sites['T2_IT_Pisa']['Failed'], 1)
+
+    def testPercentiles(self):
+        self.assertEqual(percentiles([]), {})
+        self.assertEqual(percentiles(list(range(100, 0, -1))), {50: 50, 90: 90, 99: 99, 'count': 100})
+        self.assertEqual(percentiles([7, 3]), {50: 3, 90: 7, 99: 7, 'count': 2})
+
+    def testSelect(self):
+        values = [5, 1, 4, 1, 5, 9, 2, 6, 5, 3]
+        self.assertEqual(select(values, range(len(values))), dict(enumerate(sorted(values))))
+        self.assertEqual(select(values, [0, 9, 9]), {0: 1, 9: 9})
+
+
+if __name__ == '__main__':
+    unittest.main()
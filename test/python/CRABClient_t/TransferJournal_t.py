@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+TransferJournal_t.py
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from CRABClient.TransferJournal import TransferJournal, JOURNAL_NAME, STARTED, DONE, FAILED
+
+
+class TransferJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.directory, 'log'))
+        self.done = os.path.join(self.directory, 'log', 'cmsRun_1.log.tar.gz')
+        self.partial = os.path.join(self.directory, 'output_2.root')
+        for path in [self.done, self.partial]:
+            with open(path, 'w') as fd:
+                fd.write('x' * 10)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def testJournal(self):
+        journal = TransferJournal(self.directory)
+        for path in [self.done, self.partial]:
+            journal.record(path, STARTED)
+        journal.record(self.done, DONE, 10, '0a1b2c3d')
+        journal.record(self.partial, FAILED)
+        with open(os.path.join(self.directory, JOURNAL_NAME), 'a') as fd:
+            fd.write('{"file": "output_3.ro')
+
+        journal = TransferJournal(self.directory)
+        self.assertEqual(journal.state(self.done), DONE)
+        self.assertEqual(journal.state(self.partial), FAILED)
+        self.assertEqual(journal.state(os.path.join(self.directory, 'output_3.root')), None)
+        self.assertTrue(journal.isDone(self.done, 10, '0a1b2c3d'))
+        self.assertTrue(journal.isDone(self.done, 10, 'a1b2c3d'))
+        self.assertFalse(journal.isDone(self.done, 10, 'ffffffff'))
+        self.assertFalse(journal.isDone(self.partial))
+        with open(self.done, 'a') as fd:
+            fd.write('x')
+        self.assertFalse(journal.isDone(self.done))
+        # compacted to the last record of each file
+        with open(os.path.join(self.directory, JOURNAL_NAME)) as fd:
+            self.assertEqual(len(fd.readlines()), 2)
+
+    def testWithoutChecksum(self):
+        journal = TransferJournal(self.directory)
+        # recorded without checksum, e.g. by a transfer without --checksum
+        journal.record(self.done, DONE, 10)
+        self.assertTrue(journal.isDone(self.done, 10))
+        self.assertFalse(journal.isDone(self.done, 10, '0a1b2c3d'))
+
+
+if __name__ == '__main__':
+    unittest.main()
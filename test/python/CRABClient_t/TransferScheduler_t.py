@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+TransferScheduler_t.py
+"""
+
+import io
+import time
+import threading
+import unittest
+
+from CRABClient.RetryPolicy import RetryPolicy
+from CRABClient.TransferScheduler import TransferScheduler, SiteController, DONE, FAILED, CANCELLED
+
+
+class TransferSchedulerTest(unittest.TestCase):
+
+    def testTransfers(self):
+        def copyFiles(scheduler, transfers):
+            command = '; '.join(transfer.info for transfer in transfers)
+            _, stderr, _ = scheduler.runCommand(transfers, command)
+            for transfer in transfers:
+                transfer.error = transfer.fileid if transfer.fileid in stderr.split() else None
+            return [transfer for transfer in transfers if not transfer.error]
+        scheduler = TransferScheduler(copyFiles, numWorkers=3)
+        scheduler.start()
+        for i in range(20):
+            scheduler.submit('file%d' % i, 'true' if i % 5 else 'echo file%d >&2' % i)
+        scheduler.submitBatch([('bulk%d' % i, 'echo bulk%d >&2' % i if i == 2 else 'true') for i in range(5)])
+        scheduler.wait()
+        self.assertEqual(list(scheduler.transfers)[:2], ['file0', 'file1'])
+        self.assertEqual((scheduler.count(DONE), scheduler.count(FAILED)), (20, 5))
+        self.assertEqual(scheduler.transfers['file5'].error, 'file5')
+        self.assertEqual(scheduler.transfers['bulk2'].state, FAILED)
+        self.assertEqual(scheduler.transfers['bulk3'].state, DONE)
+
+    def testRetries(self):
+        def copyFiles(_, transfers):
+            transfer = transfers[0]
+            transfer.retry = transfer.info != 'permanent'
+            return transfers if transfer.info == 'flaky' and transfer.attempts == 2 else []
+        scheduler = TransferScheduler(copyFiles, numWorkers=2, maxRetries=1,
+                                      retryPolicy=RetryPolicy(baseDelay=0.01, maxDelay=0.01))
+        scheduler.start()
+        for info in ['flaky', 'permanent', 'broken']:
+            scheduler.submit(info, info, size=100, site='T2_CH_CERN')
+        scheduler.wait()
+        self.assertEqual([(t.state, t.attempts) for t in scheduler.transfers.values()],
+                         [(DONE, 2), (FAILED, 1), (FAILED, 2)])
+        self.assertEqual(scheduler.numRetries(), 2)
+
+    def testPermanentErrors(self):
+        def copyFiles(_, transfers):
+            for transfer in transfers:
+                transfer.retry = False
+            return []
+        scheduler = TransferScheduler(copyFiles, numWorkers=4, maxRetries=1)
+        scheduler.start()
+        for i in range(6):
+            scheduler.submit('missing%d' % i, site='T2_CH_CERN')
+        scheduler.wait()
+        self.assertEqual(scheduler.count(FAILED), 6)
+        # the site is not slowed down for files which are not there
+        self.assertTrue(scheduler.controller.canStart('T2_CH_CERN'))
+        self.assertEqual(scheduler.controller.limits.get('T2_CH_CERN', 4), 4)
+
+    def testSiteController(self):
+        controller = SiteController(4, defaultSpeed=1000., minSpeed=100.)
+        for _ in range(4):
+            self.assertTrue(controller.canStart('T2_A'))
+            controller.started('T2_A')
+        self.assertFalse(controller.canStart('T2_A'))
+        self.assertTrue(controller.canStart('T2_B'))
+        controller.finished('T2_A', 0, 1)
+        controller.finished('T2_A', 1, 0, numBytes=20, seconds=1)
+        self.assertEqual(controller.limits['T2_A'], 3)
+        self.assertEqual(controller.speed('T2_A'), 100.)
+        self.assertEqual(controller.speed('T2_B'), 1000.)
+        controller.finished('T2_A', 1, 0, numBytes=10000, seconds=1)
+        self.assertAlmostEqual(controller.speed('T2_A'), 3014.)
+
+    def testCommandOutput(self):
+        output = io.BytesIO()
+        scheduler = TransferScheduler(None)
+        transfer = scheduler.submit('file1')
+        stdout, stderr, returncode = scheduler.runCommand(transfer, 'printf data; echo error >&2', output=output)
+        self.assertEqual((stdout, stderr, returncode), ('', 'error\n', 0))
+        self.assertEqual(output.getvalue(), b'data')
+        self.assertIsNone(transfer.process)
+
+    def testCancel(self):
+        started = threading.Event()
+
+        def copyFiles(scheduler, transfers):
+            started.set()
+            _, _, returncode = scheduler.runCommand(transfers, 'sleep 30')
+            return transfers if returncode == 0 else []
+        scheduler = TransferScheduler(copyFiles, numWorkers=2)
+        scheduler.start()
+        for i in range(4):
+            scheduler.submit('file%d' % i)
+        started.wait(10)
+        start = time.time()
+        scheduler.cancel()
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(scheduler.count(CANCELLED), 4)
+        self.assertFalse(scheduler.sleep(10))
+
+
+if __name__ == '__main__':
+    unittest.main()